@@ -0,0 +1,225 @@
+"""
+Synthetic pages and stored stock items shaped like the imported sources, so
+the benchmarks run offline without recorded pages. Recorded pages can be
+used instead, see load_pages.
+"""
+
+import json
+import random
+from decimal import Decimal
+from pathlib import Path
+
+from stocks.lib.constants import ImportSource, PageCurrencies, StockDataKey
+
+# sources of the import, stories are fetched from tradingview
+PAGE_SOURCES = [source.name for source in ImportSource] + ["tradingview"]
+
+DEFAULT_CURRENCIES: PageCurrencies = {"dataCurrency": "EUR", "salesCurrency": "EUR"}
+
+WORDS = [
+    "Aktie",
+    "Kurs",
+    "Umsatz",
+    "Quartal",
+    "Prognose",
+    "Analyst",
+    "Dividende",
+    "Markt",
+    "Gewinn",
+    "Index",
+]
+
+# rows of the fundamentals tables and a generator of their values
+BOERSE_DE_TABLES = {
+    "Umsatz und Ergebnis": [
+        ("Umsatzerlöse in Mio.", lambda r: german_number(r.uniform(500, 90000))),
+        ("EBIT in Mio.", lambda r: german_number(r.uniform(-500, 9000))),
+        ("Ergebnis/Aktie", lambda r: german_number(r.uniform(-2, 25))),
+        ("Dividende", lambda r: german_number(r.uniform(0, 8))),
+        ("Dividendenrendite", lambda r: f"{german_number(r.uniform(0, 6))} %"),
+        ("KGV", lambda r: german_number(r.uniform(5, 40))),
+    ],
+    "Bilanz": [
+        ("Buchwert/Aktie", lambda r: german_number(r.uniform(5, 150))),
+        ("Cashflow/Aktie", lambda r: german_number(r.uniform(1, 30))),
+        ("Eigenkapitalquote", lambda r: f"{german_number(r.uniform(10, 70))} %"),
+        ("Anzahl der Aktien", lambda r: german_number(r.uniform(50, 3000))),
+        ("Anzahl der Mitarbeiter", lambda r: f"{r.randint(1000, 300000):,}".replace(",", ".")),
+    ],
+}
+
+FNET_GUV_TABLES = {
+    "Die GuV": [
+        ("Umsatz", lambda r: german_number(r.uniform(500, 90000))),
+        ("Ergebnis vor Steuer (EBT)", lambda r: german_number(r.uniform(-500, 9000))),
+        ("Gewinn je Aktie (unverwässert, nach Steuern)", lambda r: f"{german_number(r.uniform(-2, 25))} EUR"),
+        ("Dividende je Aktie", lambda r: f"{german_number(r.uniform(0, 8))} EUR"),
+    ],
+    "Die Bilanz": [
+        ("Gesamt­verbindlichkeiten", lambda r: german_number(r.uniform(100, 50000))),
+        ("Eigenkapitalquote", lambda r: f"{german_number(r.uniform(10, 70))} %"),
+        ("Personal am Jahresende", lambda r: f"{r.randint(1000, 300000):,}".replace(",", ".")),
+    ],
+}
+
+FNET_ESTIMATION_TABLES = {
+    "Schätzungen": [
+        ("Umsatzerlöse", lambda r: f"{german_number(r.uniform(500, 90000))} Mio."),
+        ("Ergebnis je Aktie", lambda r: f"{german_number(r.uniform(-2, 25))} EUR"),
+        ("Dividende je Aktie", lambda r: f"{german_number(r.uniform(0, 8))} EUR"),
+        ("KGV", lambda r: german_number(r.uniform(5, 40))),
+        ("Marktkapitalisierung", lambda r: f"{german_number(r.uniform(1, 500))} Mrd."),
+    ],
+}
+
+
+def german_number(value: float) -> str:
+    # 1234.5 -> 1.234,50
+    return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def page_chrome(rng: random.Random, links: int) -> tuple[str, str]:
+    # scripts, styles, navigation and footer around the content
+    head = (
+        "<html><head><title>Aktie</title>"
+        + "".join(f'<script>var s{i} = "{sentence(rng, 30)}";</script>' for i in range(30))
+        + "".join(f"<style>.c{i}{{color:#{i:03}}}</style>" for i in range(30))
+        + "</head><body><nav>"
+        + "".join(f'<div><a href="/n/{i}">{sentence(rng, 3)}</a></div>' for i in range(links))
+        + "</nav>"
+    )
+    foot = (
+        "<footer>"
+        + "".join(f'<ul><li><a href="/f/{i}">{sentence(rng, 4)}</a></li></ul>' for i in range(links))
+        + "</footer></body></html>"
+    )
+    return head, foot
+
+
+def fundamentals_table(rng: random.Random, rows: list, columns: list[str]) -> str:
+    header = "".join(f"<th>{col}</th>" for col in ["", *columns])
+    body = "".join(
+        "<tr><td>"
+        + label
+        + "</td>"
+        + "".join(f"<td>{value(rng)}</td>" for _ in columns)
+        + "</tr>"
+        for label, value in rows
+    )
+    return f"<table><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def noise_table(rng: random.Random) -> str:
+    # quotes, peers and news tables every page has around the fundamentals
+    rows = "".join(
+        f"<tr><td>{sentence(rng, 2)}</td><td>{german_number(rng.uniform(1, 500))}</td>"
+        f"<td>{german_number(rng.uniform(-5, 5))} %</td></tr>"
+        for _ in range(rng.randint(3, 12))
+    )
+    return f"<table><tr><th>Name</th><th>Kurs</th><th>Änderung</th></tr>{rows}</table>"
+
+
+def fundamentals_page(
+    rng: random.Random, tables: dict[str, list], columns: list[str], noise: int
+) -> str:
+    head, foot = page_chrome(rng, 400)
+    content = "".join(noise_table(rng) for _ in range(noise // 2))
+    for title, rows in tables.items():
+        content += f"<h2>{title}</h2><div>{fundamentals_table(rng, rows, columns)}</div>"
+    content += "".join(noise_table(rng) for _ in range(noise - noise // 2))
+    return f"{head}<main>{content}</main>{foot}"
+
+
+def boerse_de_page(rng: random.Random) -> str:
+    columns = [str(year) for year in range(2015, 2024)] + ["2024e", "2025e", "2026e"]
+    return fundamentals_page(rng, BOERSE_DE_TABLES, columns, 14)
+
+
+def fnet_guv_page(rng: random.Random) -> str:
+    columns = [str(year) for year in range(2023, 2016, -1)]
+    return fundamentals_page(rng, FNET_GUV_TABLES, columns, 8)
+
+
+def fnet_estimation_page(rng: random.Random) -> str:
+    columns = [f"{year}e" for year in range(2024, 2029)]
+    return fundamentals_page(rng, FNET_ESTIMATION_TABLES, columns, 6)
+
+
+def tradingview_page(rng: random.Random) -> str:
+    head, foot = page_chrome(rng, 600)
+    article = "".join(f"<p>{sentence(rng, 60)}</p>" for _ in range(12))
+    return (
+        f'{head}<div aria-label="Main content"><div><h1>{sentence(rng, 6)}</h1></div>'
+        f"<article>{article}</article></div>{foot}"
+    )
+
+
+PAGE_GENERATORS = {
+    ImportSource.boerse_de.name: boerse_de_page,
+    ImportSource.fnet_guv.name: fnet_guv_page,
+    ImportSource.fnet_estimation.name: fnet_estimation_page,
+    "tradingview": tradingview_page,
+}
+
+
+def synthetic_pages(count: int, seed: int = 1) -> dict[str, list[str]]:
+    rng = random.Random(seed)
+    return {
+        source: [generate(rng) for _ in range(count)]
+        for source, generate in PAGE_GENERATORS.items()
+    }
+
+
+def load_pages(directory: Path) -> dict[str, list[str]]:
+    """
+    Loads recorded pages named <source>_<name>.html, for example
+    boerse_de_DE0007164600.html or tradingview_story1.html.
+    """
+    pages: dict[str, list[str]] = {source: [] for source in PAGE_SOURCES}
+    for path in sorted(directory.glob("*.html")):
+        source = next(
+            (s for s in PAGE_SOURCES if path.name.startswith(f"{s}_")), None
+        )
+        if source is not None:
+            pages[source].append(path.read_text(encoding="utf-8"))
+    return pages
+
+
+def load_currencies(directory: Path | None) -> PageCurrencies:
+    # currencies answered by the llm for the recorded pages
+    if directory is not None and (directory / "currencies.json").exists():
+        return json.loads((directory / "currencies.json").read_text())
+    return DEFAULT_CURRENCIES
+
+
+def synthetic_stock_items(rng: random.Random) -> list[dict]:
+    """
+    Stored items of one stock as returned by fetch_stock_data, with gaps the
+    completion has to fill.
+    """
+    first_year = rng.randint(2010, 2016)
+    items = []
+    for year in range(first_year, 2029):
+        item: dict = {"Year": Decimal(year)}
+        values = {
+            StockDataKey.SALES.value: f"{rng.randint(500, 90000) * 1000000} EUR",
+            StockDataKey.EARNINGS_PER_SHARE.value: f"{rng.uniform(-2, 25):.2f} EUR",
+            StockDataKey.BOOK_PER_SHARE.value: f"{rng.uniform(5, 150):.2f} EUR",
+            StockDataKey.CASHFLOW_PER_SHARE.value: f"{rng.uniform(1, 30):.2f} EUR",
+            StockDataKey.DIVIDEND_PER_SHARE.value: f"{rng.uniform(0, 8):.2f} EUR",
+            StockDataKey.DIVIDEND_YIELD.value: f"{rng.uniform(0, 6):.2f}%",
+            StockDataKey.EQUITY_RATIO.value: f"{rng.uniform(10, 70):.2f}%",
+            StockDataKey.KGV.value: Decimal(f"{rng.uniform(5, 40):.2f}"),
+            StockDataKey.STOCK_COUNT.value: Decimal(rng.randint(50, 3000) * 1000000),
+            StockDataKey.EMPLOYEE_COUNT.value: Decimal(rng.randint(1000, 300000)),
+        }
+        for key, value in values.items():
+            # most stocks miss some values in some years
+            if rng.random() < 0.8:
+                item[key] = value
+        items.append(item)
+    return items
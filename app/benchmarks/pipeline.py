@@ -0,0 +1,303 @@
+"""
+Measure time and peak memory of the import and read stages on stored pages
+and a synthetic workload, and compare them against a stored baseline.
+
+Stages of the fundamentals pages (boerse.de, finanzen.net):
+  parse      pd.read_html and the table titles
+  match      find_table_entries
+  match_cached  LayoutCache.table_entries, matched once per table layout
+  normalize  create_stock_df
+  items      dataframe_to_items
+TradingView story pages:
+  story      extract_story_text
+Synthetic workload of stored stock items per ISIN:
+  complete        complete_stock_df
+  serialize       stock_df_to_csv
+  complete_rows   complete_stock_rows, the pandas-free read path
+  serialize_rows  stock_rows_to_csv
+  screen_items    screen_items of the screen table
+  screen          ScreenIndex.screen on the index of all screen items
+
+python -m benchmarks.pipeline [--pages <directory>] [--isins 1000]
+python -m benchmarks.pipeline --write-baseline
+
+The stored baseline was recorded on the synthetic pages, pass another
+--baseline when benchmarking recorded pages. Stage outputs are compared by
+digest, so a faster stage returning other data is reported too. Digests are
+only compared for the inputs of the baseline, results keep the parameters
+they were generated with.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+from stocks.import_stocks_data import (
+    create_stock_df,
+    parse_page,
+    read_page_tables,
+    titles_from_html,
+)
+from stocks.lib.constants import PageCurrencies
+from stocks.lib.data_completer import complete_stock_df, stock_df_to_csv
+from stocks.lib.stock_rows import complete_stock_rows, stock_rows_to_csv
+from stocks.lib.data_helper import dataframe_to_items
+from stocks.lib.screener import ScreenIndex, parse_screen_query, screen_items
+from stocks.lib.story_scraper import extract_story_text
+from stocks.lib.table_helper import LayoutCache, find_table_entries
+
+from .fixtures import (
+    load_currencies,
+    load_pages,
+    synthetic_pages,
+    synthetic_stock_items,
+)
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+# year of the serialized csv window, fixed to keep the output comparable
+CSV_YEAR = 2024
+# queries of the screen stage
+SCREEN_QUERIES = [
+    {"filter": "KGV<12,DividendYield>3,EarningsPerShare@+1>EarningsPerShare"},
+    {"filter": "KBV<1.5,EquityRatio>30", "sort": "-DividendYield"},
+    {"sort": "KGV", "limit": "500"},
+]
+
+StageResult = dict[str, Any]
+
+
+def tables_and_titles(page_html: bytes) -> tuple[list[pd.DataFrame], str]:
+    page = parse_page(page_html)
+    return read_page_tables(page), titles_from_html(page)
+
+
+def measure(
+    fn: Callable[[Any], Any], inputs: list, repeat: int
+) -> tuple[list, StageResult]:
+    """
+    Runs fn on every input, returns its outputs with the time per input of
+    the fastest run and the highest traced memory of a single call.
+    """
+    outputs = [fn(value) for value in inputs]
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in inputs:
+            fn(value)
+        best = min(best, time.perf_counter() - start)
+
+    peak = 0
+    for value in inputs:
+        tracemalloc.start()
+        fn(value)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return outputs, {
+        "inputs": len(inputs),
+        "ms": round(best * 1000 / max(len(inputs), 1), 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def digest(values: list) -> str:
+    # fingerprint of the stage outputs, changes if a stage returns other data
+    return hashlib.sha256(repr(values).encode()).hexdigest()[:16]
+
+
+def page_stages(
+    pages: list[str], currencies: PageCurrencies, repeat: int
+) -> dict[str, StageResult]:
+    results: dict[str, StageResult] = {}
+
+    # pages are fetched as utf-8 bytes
+    page_bytes = [page.encode("utf-8") for page in pages]
+    parsed, results["parse"] = measure(tables_and_titles, page_bytes, repeat)
+    dfs_list = [dfs for dfs, _ in parsed]
+
+    metadata, results["match"] = measure(find_table_entries, dfs_list, repeat)
+    results["match"]["digest"] = digest(metadata)
+    # pages of a source share their layouts, same entries as matching
+    cached, results["match_cached"] = measure(
+        LayoutCache(persistent=False).table_entries, dfs_list, repeat
+    )
+    results["match_cached"]["digest"] = digest(cached)
+
+    normalize_inputs = list(zip(metadata, dfs_list))
+    stock_dfs, results["normalize"] = measure(
+        lambda value: create_stock_df(currencies, value[0], value[1]),
+        normalize_inputs,
+        repeat,
+    )
+    results["normalize"]["digest"] = digest(
+        [None if df is None else df.to_csv() for df in stock_dfs]
+    )
+
+    # items are yielded lazily, as [item, year] for a digest comparable to lists
+    items, results["items"] = measure(
+        lambda df: [list(entry) for entry in dataframe_to_items(df)], stock_dfs, repeat
+    )
+    results["items"]["digest"] = digest(items)
+    return results
+
+
+def story_stage(pages: list[str], repeat: int) -> StageResult:
+    texts, result = measure(extract_story_text, pages, repeat)
+    result["digest"] = digest(texts)
+    return result
+
+
+def workload_stages(isins: int, repeat: int, seed: int) -> dict[str, StageResult]:
+    rng = random.Random(seed)
+    stored_items = [synthetic_stock_items(rng) for _ in range(isins)]
+
+    results: dict[str, StageResult] = {}
+    completed, results["complete"] = measure(complete_stock_df, stored_items, repeat)
+    results["complete"]["digest"] = digest([df.to_csv() for df in completed])
+
+    csvs, results["serialize"] = measure(
+        lambda df: stock_df_to_csv(df, CSV_YEAR), completed, repeat
+    )
+    results["serialize"]["digest"] = digest(csvs)
+
+    rows, results["complete_rows"] = measure(complete_stock_rows, stored_items, repeat)
+    csvs, results["serialize_rows"] = measure(
+        lambda value: stock_rows_to_csv(value[0], value[1], CSV_YEAR), rows, repeat
+    )
+    # same csv as the pandas path
+    results["serialize_rows"]["digest"] = digest(csvs)
+
+    isin_items = [(f"DE{i:010d}", items) for i, items in enumerate(stored_items)]
+    screened, results["screen_items"] = measure(
+        lambda value: screen_items(value[0], value[1], 0), isin_items, repeat
+    )
+    results["screen_items"]["digest"] = digest(screened)
+
+    index = ScreenIndex()
+    index.add_items([item for items in screened for item in items])
+    queries = [parse_screen_query(query, CSV_YEAR) for query in SCREEN_QUERIES]
+    positions, results["screen"] = measure(index.screen, queries, repeat)
+    results["screen"]["digest"] = digest([index.isins[p].tolist() for p in positions])
+    return results
+
+
+def run(args) -> dict[str, StageResult]:
+    if args.pages is not None:
+        pages = load_pages(args.pages)
+    else:
+        pages = synthetic_pages(args.count, args.seed)
+    currencies = load_currencies(args.pages)
+
+    # parameters the inputs were generated with
+    page_params: dict[str, Any] = {"count": args.count, "seed": args.seed}
+    if args.pages is not None:
+        page_params = {"pages": str(args.pages)}
+    workload_params = {"isins": args.isins, "seed": args.seed}
+
+    results: dict[str, StageResult] = {}
+    for source in ["boerse_de", "fnet_guv", "fnet_estimation"]:
+        if len(pages[source]):
+            for stage, result in page_stages(
+                pages[source], currencies, args.repeat
+            ).items():
+                results[f"{source}.{stage}"] = {**result, "params": page_params}
+    if len(pages["tradingview"]):
+        results["tradingview.story"] = {
+            **story_stage(pages["tradingview"], args.repeat),
+            "params": page_params,
+        }
+
+    for stage, result in workload_stages(args.isins, args.repeat, args.seed).items():
+        results[f"workload.{stage}"] = {**result, "params": workload_params}
+    return results
+
+
+def compare(
+    results: dict[str, StageResult],
+    baseline: dict[str, StageResult],
+    tolerance: float,
+) -> list[str]:
+    # stages slower, bigger or with other output than in the baseline
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ms"] > base["ms"] * (1 + tolerance):
+            regressions.append(f"{name}: {base['ms']} ms -> {result['ms']} ms")
+        if result["peak_kib"] > base["peak_kib"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {base['peak_kib']} KiB -> {result['peak_kib']} KiB peak"
+            )
+        # outputs are only comparable on the same inputs
+        if (
+            "digest" in base
+            and result["inputs"] == base["inputs"]
+            and result.get("params") == base.get("params")
+            and result.get("digest") != base["digest"]
+        ):
+            regressions.append(f"{name}: output changed")
+    return regressions
+
+
+def print_results(results: dict[str, StageResult], baseline: dict[str, StageResult]):
+    print(f"{'stage':<28}{'inputs':>7}{'ms':>11}{'base ms':>11}{'peak KiB':>11}{'base KiB':>11}")
+    for name, result in results.items():
+        base = baseline.get(name, {})
+        print(
+            f"{name:<28}{result['inputs']:>7}{result['ms']:>11.3f}"
+            f"{base.get('ms', float('nan')):>11.3f}{result['peak_kib']:>11.1f}"
+            f"{base.get('peak_kib', float('nan')):>11.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--pages",
+        type=Path,
+        help="recorded pages named <source>_<name>.html, synthetic pages if not set",
+    )
+    parser.add_argument("--count", type=int, default=5, help="synthetic pages per source")
+    parser.add_argument("--isins", type=int, default=1000, help="stocks of the workload")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="allowed slowdown and memory growth against the baseline",
+    )
+    parser.add_argument("--write-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.write_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print_results(results, results)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    print_results(results, baseline)
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print("Regression:", regression)
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
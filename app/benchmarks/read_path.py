@@ -0,0 +1,74 @@
+"""
+Compare cold start and peak RSS of the pandas read path with the pandas-free
+read path of get_stocks_data. Each path runs in a fresh interpreter, which
+imports the modules of the handler and writes the csv of one synthetic stock.
+
+python -m benchmarks.read_path [--runs 5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import json, random, resource, sys, time
+start = time.perf_counter()
+{imports}
+imported = time.perf_counter()
+from benchmarks.fixtures import synthetic_stock_items
+data = synthetic_stock_items(random.Random(1))
+run = time.perf_counter()
+{run}
+done = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "run_ms": (done - run) * 1000,
+    "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}}))
+"""
+
+PATHS = {
+    # handler modules with the pandas completion
+    "pandas": (
+        "import stocks.lib.data\n"
+        "from stocks.lib.data_completer import complete_stock_df, stock_df_to_csv",
+        "stock_df_to_csv(complete_stock_df(data), 2024)",
+    ),
+    "rows": (
+        "import stocks.get_stocks_data\n"
+        "from stocks.lib.stock_rows import complete_stock_rows, stock_rows_to_csv",
+        "stock_rows_to_csv(*complete_stock_rows(data), 2024)",
+    ),
+}
+
+
+def run_child(imports: str, run: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(imports=imports, run=run)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'path':<8}{'import ms':>11}{'run ms':>9}{'max RSS MiB':>13}")
+    for name, (imports, run) in PATHS.items():
+        results = [run_child(imports, run) for _ in range(args.runs)]
+        print(
+            f"{name:<8}"
+            f"{statistics.median(r['import_ms'] for r in results):>11.1f}"
+            f"{statistics.median(r['run_ms'] for r in results):>9.2f}"
+            f"{statistics.median(r['max_rss_kib'] for r in results) / 1024:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
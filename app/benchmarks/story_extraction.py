@@ -0,0 +1,91 @@
+"""
+Compare story text extraction of the full page parse with the main content
+only parse of story_scraper.extract_story_text on stored TradingView pages.
+
+python -m benchmarks.story_extraction <page.html | directory> ...
+"""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from bs4 import BeautifulSoup
+
+from stocks.lib.story_scraper import extract_story_text
+
+
+# previous implementation, parses the whole page
+def extract_story_text_full_parse(story_data: str) -> str | None:
+    page_parser = BeautifulSoup(story_data, "html.parser")
+    story_article = page_parser.select_one("div[aria-label='Main content'] article")
+    if story_article is None or story_article.text == "":
+        story_article = page_parser.select_one("div[aria-label='Main content'] script")
+
+    if story_article is not None and story_article.text != "":
+        return story_article.text
+
+    return None
+
+
+def find_pages(paths: list[str]) -> list[Path]:
+    pages: list[Path] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            pages.extend(sorted(path.rglob("*.html")))
+        else:
+            pages.append(path)
+    return pages
+
+
+def measure(extract: Callable[[str], str | None], pages: list[str], repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            extract(page)
+    duration = (time.perf_counter() - start) / repeat
+
+    peak = 0
+    for page in pages:
+        tracemalloc.start()
+        extract(page)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return duration, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("paths", nargs="+", help="stored story pages or directories")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = [p.read_text(encoding="utf-8") for p in find_pages(args.paths)]
+    if not len(pages):
+        raise SystemExit("No pages found")
+
+    # both implementations have to return the same text
+    mismatches = sum(
+        extract_story_text(p) != extract_story_text_full_parse(p) for p in pages
+    )
+
+    print(f"pages: {len(pages)}, total size: {sum(map(len, pages))} chars")
+    print(f"text mismatches: {mismatches}")
+    for name, extract in [
+        ("full parse", extract_story_text_full_parse),
+        ("main content", extract_story_text),
+    ]:
+        duration, peak = measure(extract, pages, args.repeat)
+        print(
+            f"{name:>12}: {duration * 1000:8.1f} ms per run, "
+            f"{peak / 1024:8.0f} KiB peak per page"
+        )
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os
+from datetime import datetime, timezone
+
+from .lib.scheduler import fetch_due_import_jobs
+from .lib.work_queue import ImportMessage, SqsWorkQueue, WorkQueue
+from .lib.metrics import instrumented
+from .lib.profiling import profiled
+
+
+@instrumented
+@profiled
+def handler(event, context):
+    queue = SqsWorkQueue(os.environ["IMPORT_QUEUE_URL"])
+    count = int(os.environ.get("IMPORT_DISPATCH_COUNT", "4"))
+    dispatch_imports(queue, count)
+
+
+def dispatch_imports(queue: WorkQueue, count: int) -> list[ImportMessage]:
+    jobs = fetch_due_import_jobs(count)
+    now = datetime.now(timezone.utc).timestamp()
+    messages: list[ImportMessage] = []
+    for stock_isin, sources in jobs:
+        message: ImportMessage = {"ISIN": stock_isin, "dispatched_at": now}
+        if sources is not None:
+            message["sources"] = sources
+        messages.append(message)
+
+    queue.send_messages(messages)
+    print(f"Dispatched {len(messages)} imports:", messages)
+    return messages
@@ -0,0 +1,43 @@
+from .lib.changes import (
+    ChangesException,
+    changes_to_csv,
+    encode_page_token,
+    parse_changes_query,
+)
+from .lib.data import query_changed_stocks
+from .lib.metrics import count, instrumented
+from .lib.profiling import profiled
+
+
+@instrumented
+@profiled
+def handler(event, context):
+    # since=1717200000&limit=500&next=<X-Next-Token of the previous page>
+    query = event.get("queryStringParameters") or {}
+    try:
+        changes_query = parse_changes_query(query)
+    except ChangesException as e:
+        return bad_request(str(e))
+
+    items, last_key = query_changed_stocks(
+        changes_query.since, changes_query.limit, changes_query.start_key
+    )
+    count("changed_stocks", len(items))
+
+    headers = {"Content-Type": "text/csv"}
+    # more changes after this page
+    if last_key is not None:
+        headers["X-Next-Token"] = encode_page_token(last_key)
+    return {
+        "statusCode": 200,
+        "headers": headers,
+        "body": changes_to_csv(items),
+    }
+
+
+def bad_request(message: str):
+    return {
+        "statusCode": 400,
+        "headers": {"Content-Type": "text/plain"},
+        "body": message,
+    }
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+from .lib.screener import (
+    ScreenException,
+    current_screen_index,
+    parse_screen_query,
+    screen_to_csv,
+)
+from .lib.metrics import count, instrumented, span
+from .lib.profiling import profiled
+
+
+@instrumented
+@profiled
+def handler(event, context):
+    # filter=KGV<12,DividendYield>3&sort=-DividendYield&limit=50&year=2024
+    query = event.get("queryStringParameters") or {}
+    try:
+        screen_query = parse_screen_query(query, datetime.now(timezone.utc).year)
+    except ScreenException as e:
+        return bad_request(str(e))
+
+    with span("index"):
+        index = current_screen_index()
+    with span("screen"):
+        positions = index.screen(screen_query)
+    count("screened_stocks", len(index.isins))
+    count("returned_stocks", len(positions))
+
+    return {
+        "statusCode": 200,
+        "headers": {"Content-Type": "text/csv"},
+        "body": screen_to_csv(index, positions, screen_query),
+    }
+
+
+def bad_request(message: str):
+    return {
+        "statusCode": 400,
+        "headers": {"Content-Type": "text/plain"},
+        "body": message,
+    }
@@ -1,33 +1,69 @@
-import io
-import csv
-
-from .lib.data import fetch_stock_meta, add_stock_meta
-from .lib.stories import stories_sentiment
+from .lib.data import record_stock_demand
+from .lib.stories import stories_sentiment, stories_to_csv
+from .lib.sentiment_series import (
+    SENTIMENT_INTERVALS,
+    parse_series_day,
+    sentiment_series,
+    sentiment_series_to_csv,
+)
 from .lib.function import invoke_import_stocks_story
+from .lib.metrics import debug, instrumented
+from .lib.profiling import profiled
 
 
+@instrumented
+@profiled
 def handler(event, context):
-    stock_isin = event["queryStringParameters"]["ISIN"]
+    query = event["queryStringParameters"]
+    stock_isin = query["ISIN"]
+
+    # stories by default, view=series for the sentiment counts of
+    # from=2024-01-01&to=2024-06-30&interval=week
+    from_day = query.get("from")
+    to_day = query.get("to")
+    interval = query.get("interval", "day")
+    try:
+        from_day = parse_series_day(from_day) if from_day is not None else None
+        to_day = parse_series_day(to_day) if to_day is not None else None
+    except ValueError:
+        return bad_request("Invalid date, use format YYYY-MM-DD")
+    if interval not in SENTIMENT_INTERVALS:
+        return bad_request(f"Invalid interval, use one of {SENTIMENT_INTERVALS}")
 
-    # check if stock in meta table
-    meta_item = fetch_stock_meta(stock_isin)
+    # count read, unknown stocks are added to meta table
+    meta_item = record_stock_demand(stock_isin)
     if meta_item is None:
         print("Adding new stock entry:", stock_isin)
-        add_stock_meta(stock_isin)
         # trigger import function
         invoke_import_stocks_story(stock_isin)
     else:
-        print("Stock entry found:", meta_item)
-
-    stories = stories_sentiment(stock_isin)
+        debug("Stock entry found:", meta_item)
 
-    # write csv
-    output_csv = io.StringIO()
-    stories.to_csv(output_csv, decimal=",", quoting=csv.QUOTE_ALL, sep=";")
-    csv_string = output_csv.getvalue()
+    if query.get("view") == "series":
+        # precomputed sentiment counts
+        series = sentiment_series(stock_isin, from_day, to_day, interval)
+        csv_string = sentiment_series_to_csv(series, interval)
+    else:
+        csv_string = stories_csv(stock_isin)
 
     return {
         "statusCode": 200,
         "headers": {"Content-Type": "text/csv"},
         "body": csv_string,
     }
+
+
+def stories_csv(stock_isin: str) -> str:
+    stories = stories_sentiment(stock_isin)
+    if stories is None:
+        return ""
+
+    return stories_to_csv(stories)
+
+
+def bad_request(message: str):
+    return {
+        "statusCode": 400,
+        "headers": {"Content-Type": "text/plain"},
+        "body": message,
+    }
@@ -1,98 +1,350 @@
 import os
-import requests
 import json
-from bs4 import BeautifulSoup
-from io import StringIO
+import lxml.html
+from io import BytesIO, StringIO
 import pandas as pd
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, InternalServerError, RateLimitError
 import traceback
+from datetime import datetime, timezone
+from decimal import Decimal
 from typing import Any
 
-from .lib.constants import SYSTEM_PROMPT_TABLES, StockDataKey, PageCurrencies
-from .lib.data import fetch_oldest_stock_meta, update_last_import, update_stock_data
-from .lib.helper import find_curr, text_currency_to_float
-from .lib.url import search_boerse_de_url, search_fnet_estimation_url, search_fnet_guv_url
-from .lib.data_helper import dataframe_to_items
-from .lib.table_helper import find_table_entries
-
-
+from .lib.constants import (
+    SYSTEM_PROMPT_TABLES,
+    ImportSource,
+    PageCurrencies,
+    SourceStatus,
+    StockDataKey,
+    StockMetaFields,
+)
+from .lib.data import (
+    UnknownStockException,
+    fetch_stock_data,
+    mark_stock_changed,
+    update_last_import,
+    update_screen_built,
+    update_source_status,
+    update_stock_data,
+)
+from .lib.lease import import_lease
+from .lib.scheduler import fetch_next_stock_metas, next_source_status
+from .lib.screener import update_changed_stock_screen, update_stock_screen
+from .lib.stock_rows import complete_stock_rows
+from .lib.helper import find_curr, parse_value, text_currency_to_float
+from .lib.url import search_boerse_de_url, search_fnet_urls
+from .lib.data_helper import dataframe_to_items, diff_stock_item
+from .lib.table_helper import layout_cache
+from .lib.work_queue import ImportMessage
+from .lib.provider import call_provider, provider_request, provider_timeout
+from .lib.metrics import count, debug, instrumented, span
+from .lib.profiling import profiled
+
+# openai errors worth another try
+OPENAI_RETRY_ON = (APIConnectionError, InternalServerError, RateLimitError)
+
+
+# stocks tried by a scheduled import if the first ones are busy
+IMPORT_CANDIDATES = 5
+
+
+@instrumented
+@profiled
 def handler(event, context):
-    stock_isin = None
+    # import jobs from the import queue
+    if event is not None and "Records" in event:
+        return handle_queue_records(event["Records"])
+
     if (
         event is None
         or "queryStringParameters" not in event
         or "ISIN" not in event["queryStringParameters"]
     ):
-        stock_isin = fetch_oldest_stock_meta()
+        stock_isins = fetch_next_stock_metas(IMPORT_CANDIDATES)
+        if not len(stock_isins):
+            raise Exception("Could not find ISIN")
+
+        # skip stocks another importer is working on
+        for stock_isin in stock_isins:
+            if import_stock(stock_isin):
+                return
+        print("All candidates are imported by other workers:", stock_isins)
     else:
         # import this
-        stock_isin = event["queryStringParameters"]["ISIN"]
+        import_stock(event["queryStringParameters"]["ISIN"])
 
-    if stock_isin is None:
-        raise Exception("Could not find ISIN")
 
+def handle_queue_records(records: list[dict]):
+    # failed messages are retried by the queue, see ReportBatchItemFailures
+    failures = []
+    for record in records:
+        try:
+            message: ImportMessage = json.loads(record["body"])
+            import_stock(
+                message["ISIN"], message.get("dispatched_at"), message.get("sources")
+            )
+        except Exception as e:
+            print("Error processing import message:", record["body"])
+            print(e)
+            traceback.print_tb(e.__traceback__)
+            failures.append({"itemIdentifier": record["messageId"]})
+
+    return {"batchItemFailures": failures}
+
+
+def import_stock(
+    stock_isin: str,
+    dispatched_at: float | None = None,
+    sources: list[str] | None = None,
+) -> bool:
+    """
+    Imports the stock while holding its import lease, only the given sources
+    if set. Returns False if the stock was skipped because another importer
+    is working on it, it was imported after the job was dispatched or it is
+    not known.
+    """
+    try:
+        with import_lease(stock_isin) as meta_item:
+            if meta_item is None:
+                print("Stock is imported by another worker:", stock_isin)
+                return False
+
+            if dispatched_at is not None:
+                if sources is None:
+                    last_import = meta_item.get(StockMetaFields.last_import.name, 0)
+                    if float(last_import) > dispatched_at:
+                        print("Stock was imported after dispatch:", stock_isin)
+                        return False
+                else:
+                    # sources retried after dispatch
+                    statuses = meta_item.get(StockMetaFields.source_status.name, {})
+                    sources = [
+                        source
+                        for source in sources
+                        if source not in statuses
+                        or float(statuses[source]["at"]) <= dispatched_at
+                    ]
+                    if not len(sources):
+                        print("Sources were imported after dispatch:", stock_isin)
+                        return False
+
+            run_import(stock_isin, meta_item, sources)
+            return True
+    except UnknownStockException:
+        # no meta item, the lease would add one
+        print("Stock is not known:", stock_isin)
+        return False
+
+
+def run_import(stock_isin: str, meta_item: dict, sources: list[str] | None = None):
     scrappey_key = os.environ["SCRAPPEY_API_KEY"]
     openai_key = os.environ["OPENAI_API_KEY"]
 
-    print("Start importing stock", stock_isin)
+    # all sources on a regular import, failed ones on a retry
+    full_import = sources is None
+    if sources is None:
+        sources = [source.name for source in ImportSource]
+    print("Start importing stock", stock_isin, sources)
+
+    source_urls = search_source_urls(stock_isin, meta_item, sources)
+    # current values, only changes are written
+    stored_items = stored_stock_items(stock_isin)
+    initial_items = {year: dict(item) for year, item in stored_items.items()}
+    source_status: dict[str, SourceStatus] = dict(
+        meta_item.get(StockMetaFields.source_status.name, {})
+    )
+    for source in sources:
+        url = source_urls.get(source)
+        if url is None:
+            continue
 
-    # boerse.de
-    boerse_de_url = search_boerse_de_url(stock_isin)
-    process_import(scrappey_key, boerse_de_url, stock_isin, openai_key)
+        now = datetime.now(timezone.utc).timestamp()
+        try:
+            source_changed = process_import(
+                scrappey_key, url, stock_isin, openai_key, stored_items
+            )
+            source_status[source] = next_source_status(None, True, now, source_changed)
+            count(f"{source}_changed", source_changed)
+        except Exception as e:
+            print("Error importing:", url)
+            print(e)
+            traceback.print_tb(e.__traceback__)
+            count(f"{source}_failures")
+            source_status[source] = next_source_status(
+                source_status.get(source), False, now
+            )
+
+    # sources can write over each other, changed is what the import left
+    changed = sum(
+        len(diff_stock_item(initial_items.get(year, {}), item))
+        for year, item in stored_items.items()
+    )
+    count("changed_values", changed)
+    debug("Source status:", source_status)
+    if full_import:
+        # reads counted before the import started
+        seen_demand = int(meta_item.get(StockMetaFields.demand_count.name, 0))
+        update_last_import(stock_isin, changed > 0, source_status, seen_demand)
+    else:
+        update_source_status(stock_isin, source_status)
+    if changed > 0:
+        mark_stock_changed(stock_isin, StockMetaFields.data_changed_at.name)
 
-    # finanzen.net GUV
-    f_net_guv_url = search_fnet_guv_url(stock_isin)
-    if f_net_guv_url is not None:
-        process_import(scrappey_key, f_net_guv_url, stock_isin, openai_key)
+    # screen items of stocks imported before the screener existed too
+    screen_built = meta_item.get(StockMetaFields.screen_built.name, False)
+    if changed > 0 or not screen_built:
+        refresh_stock_screen(stock_isin, initial_items, stored_items, screen_built)
 
-    # finanzen.net Estimation
-    f_net_estimation_url = search_fnet_estimation_url(stock_isin)
-    if f_net_estimation_url is not None:
-        process_import(scrappey_key, f_net_estimation_url, stock_isin, openai_key)
 
-    update_last_import(stock_isin)
+def ordered_stock_items(items: dict[int, dict]) -> list[dict]:
+    return [{**items[year], "Year": Decimal(year)} for year in sorted(items)]
 
 
-def process_import(scrappey_key: str, url: str, stock_isin: str, openai_key: str):
+def refresh_stock_screen(
+    stock_isin: str,
+    initial_items: dict[int, dict],
+    stored_items: dict[int, dict],
+    screen_built: bool,
+):
+    # the imported values are stored already, a failed refresh is repeated
+    # by the next import of the stock
     try:
-        page_html = fetch_html(scrappey_key, url)
-        process_html(stock_isin, openai_key, page_html)
+        with span("screen"):
+            if screen_built:
+                # only years whose screen values changed by the import
+                written = update_changed_stock_screen(
+                    stock_isin,
+                    ordered_stock_items(initial_items),
+                    ordered_stock_items(stored_items),
+                )
+            else:
+                years, columns = complete_stock_rows(ordered_stock_items(stored_items))
+                written = update_stock_screen(stock_isin, years, columns)
+                update_screen_built(stock_isin)
+        count("screen_years", written)
     except Exception as e:
-        print("Error importing:", url)
+        print("Error updating screen items:", stock_isin)
         print(e)
         traceback.print_tb(e.__traceback__)
+        count("screen_failures")
+        if screen_built:
+            update_screen_built(stock_isin, False)
+
 
+def search_source_urls(
+    stock_isin: str, meta_item: dict, sources: list[str]
+) -> dict[str, str | None]:
+    source_urls: dict[str, str | None] = {}
+    # boerse.de
+    if ImportSource.boerse_de.name in sources:
+        source_urls[ImportSource.boerse_de.name] = search_boerse_de_url(stock_isin)
 
-def process_html(stock_isin: str, openai_key: str, page_html: str):
-    stock_dfs = pd.read_html(StringIO(page_html), decimal=",", thousands=".")
-    page_tables = tables_from_dfs(stock_dfs)
-    page_titles = titles_from_html(page_html)
-    currencies = fetch_currencies(openai_key, page_tables, page_titles)
-    #tables_metadata = fetch_tables_metadata(openai_key, page_tables)
-    tables_metadata = find_table_entries(stock_dfs)
-    stock_df = create_stock_df(currencies, tables_metadata, stock_dfs)
+    # finanzen.net GUV and Estimation
+    if (
+        ImportSource.fnet_guv.name in sources
+        or ImportSource.fnet_estimation.name in sources
+    ):
+        try:
+            f_net_guv_url, f_net_estimation_url = search_fnet_urls(
+                stock_isin, meta_item
+            )
+        except Exception as e:
+            # search failed, import the known urls and search on the next import
+            print("Error searching fnet urls:", e)
+            count("fnet_url_search_failures")
+            f_net_guv_url = meta_item.get(StockMetaFields.fnet_guv_url.name)
+            f_net_estimation_url = meta_item.get(
+                StockMetaFields.fnet_estimation_url.name
+            )
+        source_urls[ImportSource.fnet_guv.name] = f_net_guv_url
+        source_urls[ImportSource.fnet_estimation.name] = f_net_estimation_url
+
+    return source_urls
+
+
+def process_import(
+    scrappey_key: str,
+    url: str,
+    stock_isin: str,
+    openai_key: str,
+    stored_items: dict[int, dict],
+) -> int:
+    with span("fetch"):
+        page_html = fetch_html(scrappey_key, url)
+    return process_html(stock_isin, openai_key, page_html, stored_items)
+
+
+def process_html(
+    stock_isin: str, openai_key: str, page_html: bytes, stored_items: dict[int, dict]
+) -> int:
+    with span("parse"):
+        page = parse_page(page_html)
+        stock_dfs = read_page_tables(page)
+        page_tables = tables_from_dfs(stock_dfs)
+        page_titles = titles_from_html(page)
+        # the tree is not held during the llm call
+        del page
+    with span("llm"):
+        currencies = fetch_currencies(openai_key, page_tables, page_titles)
+    with span("match"):
+        #tables_metadata = fetch_tables_metadata(openai_key, page_tables)
+        tables_metadata = layout_cache.table_entries(stock_dfs)
+    with span("normalize"):
+        stock_df = create_stock_df(currencies, tables_metadata, stock_dfs)
     if stock_df is not None:
-        persist_df(stock_df, stock_isin)
+        with span("persist"):
+            return persist_df(stock_df, stock_isin, stored_items)
+    return 0
+
+
+def parse_page(page_html: bytes) -> lxml.html.HtmlElement:
+    # one lxml tree of the page for its tables and titles, no decoded copy
+    return lxml.html.fromstring(
+        page_html, parser=lxml.html.HTMLParser(encoding="utf-8")
+    )
+
+
+def read_page_tables(page: lxml.html.HtmlElement) -> list[pd.DataFrame]:
+    # only the outer tables are serialized again for pandas, nested tables
+    # are part of them like pandas finds them in the page
+    tables = page.xpath("//table[not(ancestor::table)]")
+    if not len(tables):
+        raise ValueError("No tables found")
+    tables_html = b"".join(
+        lxml.html.tostring(table, encoding="utf-8", with_tail=False)
+        for table in tables
+    )
+    # the stubs only allow text buffers
+    return pd.read_html(
+        BytesIO(tables_html),  # type: ignore[arg-type]
+        decimal=",",
+        thousands=".",
+        encoding="utf-8",
+    )
 
 
-def fetch_html(api_key: str, source_url: str) -> str:
+def fetch_html(api_key: str, source_url: str) -> bytes:
     print("Scraping url", source_url)
 
     url = f"https://publisher.scrappey.com/api/v1?key={api_key}"
     headers = {"Content-Type": "application/json"}
     data = {"cmd": "request.get", "url": source_url, "requestType": "request"}
 
-    response = requests.post(url, headers=headers, json=data)
+    response = provider_request("scrappey", "POST", url, headers=headers, json=data)
 
     # Handle the response
-    if response.status_code == 200:
-        response_content = response.json()
-        if "solution" in response_content:
-            html = response_content["solution"]["response"]
-            print("Page html size:", len(html))
-            return html
+    if response.status_code != 200:
+        raise Exception(f"Cant fetch html, status: {response.status_code}")
+
+    # decoded from the bytes of the response, no text copy of the payload
+    response_content = json.loads(response.content)
+    if "solution" not in response_content:
+        raise Exception(f"Cant fetch html: {response_content["data"]}")
 
-    raise Exception(f"Cant fetch html: {response_content["data"]}")
+    # the page is kept as utf-8 bytes only, its str is dropped once encoded
+    html = response_content.pop("solution")["response"].encode("utf-8")
+    del response_content
+    count("page_bytes", len(html))
+    return html
 
 
 def format_df_rows(d: pd.DataFrame):
@@ -108,22 +360,28 @@ def tables_from_dfs(dfs) -> str:
         f'<table id="{i}">\n{format_df_rows(df)}</table>' for i, df in enumerate(dfs)
     ]
     tables = "\n".join(rows_dfs)
-    print("Extracted tables:", tables)
+    debug("Extracted tables:", tables)
     return tables
 
 
-def titles_from_html(page_html: str) -> str:
-    page_parser = BeautifulSoup(page_html, "html.parser")
-    html_tables_titles = page_parser.select("h2:has(+ * table), h2:has(+ table)")
+def titles_from_html(page: lxml.html.HtmlElement) -> str:
+    # h2 followed by a table or an element with a table, the lxml tree is not
+    # held by python objects like a soup of the whole page
+    html_tables_titles = page.xpath(
+        "//h2[following-sibling::*[1][self::table or .//table]]"
+    )
     html_tables_titles_str = ""
     for col in html_tables_titles:
-        html_tables_titles_str += f"\n{str(col)}"
-    print("Extracted page titles:", html_tables_titles_str)
+        html_tables_titles_str += (
+            f"\n{lxml.html.tostring(col, encoding='unicode', with_tail=False)}"
+        )
+    debug("Extracted page titles:", html_tables_titles_str)
     return html_tables_titles_str
 
 
 def fetch_currencies(api_key: str, page_tables: str, page_titles: str) -> PageCurrencies | None:
-    client = OpenAI(api_key=api_key)
+    # retries are done by the provider layer
+    client = OpenAI(api_key=api_key, timeout=provider_timeout("openai"), max_retries=0)
 
     prompt = f"""
     Following document between TEXTSTART and TEXTEND contains tables with stock fundamentals. Extract the currencies to this format:
@@ -141,7 +399,9 @@ def fetch_currencies(api_key: str, page_tables: str, page_titles: str) -> PageCu
     TEXTEND
     """
 
-    response_body_cur = client.chat.completions.create(
+    response_body_cur = call_provider(
+        "openai",
+        client.chat.completions.create,
         messages=[
             {
                 "role": "user",
@@ -149,6 +409,7 @@ def fetch_currencies(api_key: str, page_tables: str, page_titles: str) -> PageCu
             }
         ],
         model="gpt-3.5-turbo",
+        retry_on=OPENAI_RETRY_ON,
     )
     content = response_body_cur.choices[0].message.content
     if content is None:
@@ -159,13 +420,15 @@ def fetch_currencies(api_key: str, page_tables: str, page_titles: str) -> PageCu
 
 
 def fetch_tables_metadata(api_key: str, page_tables: str) -> str | None:
-    client = OpenAI(api_key=api_key)
+    client = OpenAI(api_key=api_key, timeout=provider_timeout("openai"), max_retries=0)
 
     prompt = f"""
     {page_tables}
     """
 
-    response_body = client.chat.completions.create(
+    response_body = call_provider(
+        "openai",
+        client.chat.completions.create,
         messages=[
             {
                 "role": "system",
@@ -179,9 +442,10 @@ def fetch_tables_metadata(api_key: str, page_tables: str) -> str | None:
         model="ft:gpt-3.5-turbo-0125:personal::9IEIVkmH:ckpt-step-27",
         max_tokens=500,
         temperature=0.8,
+        retry_on=OPENAI_RETRY_ON,
     )
     table_data = response_body.choices[0].message.content
-    print("Extracted table data:", table_data)
+    debug("Extracted table data:", table_data)
     return table_data
 
 
@@ -219,7 +483,10 @@ def read_table_row(
                 if multiply:
                     mrdStr = "Mrd."
                     # multiply mrd numbers
-                    if isinstance(formatted_data, str) and mrdStr in formatted_data:
+                    if (
+                        isinstance(formatted_data, str)
+                        and parse_value(formatted_data).unit == mrdStr
+                    ):
                         formatted_data = formatted_data.replace(mrdStr, "").strip()
                         formatted_data = int(
                             text_currency_to_float(formatted_data) * 1000000000
@@ -308,18 +575,36 @@ def create_stock_df(
 
     complete_df: pd.DataFrame | None = None
     for df in formatted_dfs:
-        print("Formatted DF:", df)
+        debug("Formatted DF:", df)
         if not df.empty:
             if complete_df is None:
                 complete_df = df
             else:
                 complete_df = complete_df.merge(df, on="Year", how="outer")
 
-    print("Stock dataframe:", complete_df)
+    debug("Stock dataframe:", complete_df)
     return complete_df               
 
 
-def persist_df(stock_df: pd.DataFrame, stock_isin: str):
-    items = dataframe_to_items(stock_df)
-    for [item, year] in items:
-        update_stock_data(stock_isin, year, item)
+def stored_stock_items(stock_isin: str) -> dict[int, dict]:
+    return {int(item["Year"]): item for item in fetch_stock_data(stock_isin)}
+
+
+def persist_df(
+    stock_df: pd.DataFrame, stock_isin: str, stored_items: dict[int, dict]
+) -> int:
+    """
+    Writes changed values of the stock and returns how many changed. Stored
+    items are updated with the written values.
+    """
+    changed = 0
+    for item, year in dataframe_to_items(stock_df):
+        stored_item = stored_items.setdefault(year, {})
+        changed_item = diff_stock_item(stored_item, item)
+        # skip unchanged years
+        if not changed_item:
+            continue
+        update_stock_data(stock_isin, year, changed_item)
+        stored_item.update(changed_item)
+        changed += len(changed_item)
+    return changed
@@ -1,13 +1,23 @@
 from .lib.news_sentiment import set_news_sentiment
+from .lib.constants import StockMetaFields
+from .lib.sentiment_series import build_sentiment_series
 from .lib.data import (
+    fetch_stock_meta,
+    update_sentiment_series_built,
     fetch_oldest_stock_story_meta,
     add_stock_stories,
     update_last_story_import,
     fetch_stock_story_urls,
+    mark_stock_changed,
 )
-from .lib.story_scraper import fetch_stories
+from .lib.story_scraper import fetch_stories, search_stock_symbol
+from .lib.story_archive import archive_old_stories
+from .lib.metrics import count, instrumented, span
+from .lib.profiling import profiled
 
 
+@instrumented
+@profiled
 def handler(event, context):
     stock_isin = None
     if (
@@ -25,13 +35,34 @@ def handler(event, context):
 
     print("Start importing stocks stories for:", stock_isin)
     try:
+        meta_item = fetch_stock_meta(stock_isin) or {}
         old_stories = fetch_stock_story_urls(stock_isin)
-        stories = fetch_stories(stock_isin, old_stories)
-        add_stock_stories(stories)
+        with span("fetch"):
+            tradingview_symbol = search_stock_symbol(stock_isin, meta_item)
+            stories = fetch_stories(stock_isin, old_stories, tradingview_symbol)
+        count("stories", len(stories))
+        with span("persist"):
+            add_stock_stories(stories)
 
         # update sentiment for stock
         print("Start sentiment categorization for:", stock_isin)
-        set_news_sentiment(stock_isin)
+        with span("llm"):
+            categorized = set_news_sentiment(stock_isin)
+        # new stories or sentiments are listed by the change feed
+        if len(stories) or categorized:
+            mark_stock_changed(stock_isin, StockMetaFields.stories_changed_at.name)
+
+        # stories categorized before the sentiment series existed
+        if meta_item and not meta_item.get(
+            StockMetaFields.sentiment_series_built.name
+        ):
+            build_sentiment_series(stock_isin)
+            update_sentiment_series_built(stock_isin)
+
+        # bodies of old categorized stories move to the archive
+        with span("archive"):
+            archived = archive_old_stories(stock_isin)
+        count("archived_stories", archived)
     finally:
         # also in case of errors update the timestamp so we move to the next one
         update_last_story_import(stock_isin)
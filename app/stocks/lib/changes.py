@@ -0,0 +1,98 @@
+"""
+Feed of the stocks whose fundamentals or stories changed since a timestamp,
+read from the change feed index of the meta table, so a sync reads only the
+changed stocks:
+
+  since=1717200000&limit=500&next=<token of the previous page>
+
+Stocks are listed by their last change, a stock changed again while a sync
+pages through the feed moves behind the pages already read. A sync keeps the
+last changed_at it read as since of the next sync.
+"""
+
+import base64
+import binascii
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Mapping, NamedTuple, Sequence
+
+from .constants import StockMetaFields
+
+CHANGES_LIMIT = 500
+CHANGES_MAX_LIMIT = 1000
+
+# columns of the feed, in this order
+CHANGES_FIELDS = [
+    "ISIN",
+    StockMetaFields.changed_at.name,
+    StockMetaFields.data_changed_at.name,
+    StockMetaFields.stories_changed_at.name,
+]
+
+
+class ChangesException(Exception):
+    pass
+
+
+class ChangesQuery(NamedTuple):
+    since: Decimal
+    limit: int = CHANGES_LIMIT
+    start_key: dict | None = None
+
+
+def encode_page_token(key: Mapping) -> str:
+    # last evaluated key of the index as url safe text
+    text = json.dumps({name: str(value) for name, value in key.items()})
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(token: str) -> dict:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        if set(key) != {
+            "ISIN",
+            StockMetaFields.change_feed.name,
+            StockMetaFields.changed_at.name,
+        }:
+            raise ValueError(token)
+        key[StockMetaFields.changed_at.name] = Decimal(
+            key[StockMetaFields.changed_at.name]
+        )
+    except (ValueError, TypeError, AttributeError, binascii.Error, InvalidOperation):
+        raise ChangesException("Invalid next token, use the one of the last page")
+    return key
+
+
+def parse_changes_query(query: Mapping[str, str]) -> ChangesQuery:
+    if "since" not in query:
+        raise ChangesException("Missing since, use a unix timestamp")
+    try:
+        since = Decimal(query["since"])
+        limit = int(query.get("limit", CHANGES_LIMIT))
+    except (ValueError, InvalidOperation):
+        raise ChangesException("Invalid since or limit, use a number")
+    if not since.is_finite():
+        raise ChangesException("Invalid since, use a unix timestamp")
+    if not 0 < limit <= CHANGES_MAX_LIMIT:
+        raise ChangesException(f"Invalid limit, use 1 to {CHANGES_MAX_LIMIT}")
+
+    start_key = None
+    if query.get("next"):
+        start_key = decode_page_token(query["next"])
+    return ChangesQuery(since, limit, start_key)
+
+
+def changes_to_csv(items: Sequence[Mapping]) -> str:
+    # one row per changed stock, oldest change first
+    output_csv = io.StringIO()
+    writer = csv.writer(
+        output_csv, delimiter=";", quoting=csv.QUOTE_ALL, lineterminator="\n"
+    )
+    writer.writerow(CHANGES_FIELDS)
+    for item in items:
+        writer.writerow(
+            ["" if item.get(field) is None else str(item[field]) for field in CHANGES_FIELDS]
+        )
+    return output_csv.getvalue()
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import TypedDict, Dict, Any
+from typing import TypedDict, Dict, Any, NotRequired
 from decimal import Decimal
 
 SYSTEM_PROMPT_TABLES = """
@@ -59,22 +59,98 @@ class StockDataKey(Enum):
 
 StockMetaFields = Enum(
     "StockMetaFields",
-    ["last_import", "last_story_import", "fnet_estimation_url", "fnet_guv_url"],
+    [
+        "last_import",
+        "last_story_import",
+        "fnet_estimation_url",
+        "fnet_guv_url",
+        "fnet_url_retry_at",
+        "tradingview_symbol",
+        "sentiment_series_built",
+        "demand_count",
+        "last_import_changed",
+        "import_lease_owner",
+        "import_lease_expires",
+        "source_status",
+        "screen_built",
+        # last import which changed values or stories, and the later of both
+        "data_changed_at",
+        "stories_changed_at",
+        "changed_at",
+        # partition of the change feed index, set on the first change
+        "change_feed",
+    ],
 )
 
+# pages imported for a stock
+ImportSource = Enum("ImportSource", ["boerse_de", "fnet_guv", "fnet_estimation"])
+
 StockStoryFields = Enum(
     "StockStoryFields",
     [
         "source_url",
         "text_content",
+        "text_content_zlib",
         "published_at",
         "fetched_at",
         "title",
         "data_provider",
         "sentiment",
+        # archive file of the body and ttl of an archived story
+        "archive_key",
+        "expires_at",
     ],
 )
 
+# story fields rendered by the story listing, bodies are never loaded for it
+story_list_fields = [
+    StockStoryFields.published_at.name,
+    StockStoryFields.fetched_at.name,
+    StockStoryFields.sentiment.name,
+    StockStoryFields.source_url.name,
+]
+
+# rows of the stock data csv, in this order
+stock_csv_fields = [
+    StockDataKey.SALES.value,
+    StockDataKey.SALES_PER_SHARE.value,
+    StockDataKey.EARNINGS_PER_SHARE.value,
+    StockDataKey.CASHFLOW_PER_SHARE.value,
+    StockDataKey.BOOK_PER_SHARE.value,
+    StockDataKey.DIVIDEND_PER_SHARE.value,
+    StockDataKey.DIVIDEND_YIELD.value,
+    StockDataKey.EQUITY_RATIO.value,
+    StockDataKey.MARKET_CAP.value,
+    StockDataKey.EBIT.value,
+    StockDataKey.TOTAL_DEBT.value,
+    StockDataKey.KGV.value,
+    StockDataKey.KBV.value,
+    StockDataKey.KUV.value,
+    StockDataKey.KCV.value,
+    StockDataKey.EMPLOYEE_COUNT.value,
+    StockDataKey.STOCK_COUNT.value,
+    StockDataKey.PRICE_PER_SHARE.value,
+]
+# years around the current year in the stock data csv
+STOCK_CSV_YEARS_BEFORE = 2
+STOCK_CSV_YEARS_AFTER = 4
+
+# completed metrics of the screener, by ISIN and year
+screen_fields = stock_csv_fields
+
+# metrics ranked across all stocks of a year
+ranked_fields = [
+    StockDataKey.KGV.value,
+    StockDataKey.KUV.value,
+    StockDataKey.KBV.value,
+    StockDataKey.DIVIDEND_YIELD.value,
+    StockDataKey.EQUITY_RATIO.value,
+]
+# percentile ranks stored with the stock data items: KGVRank, KGVCurrencyRank
+stock_rank_fields = [f"{field}Rank" for field in ranked_fields] + [
+    f"{field}CurrencyRank" for field in ranked_fields
+]
+
 stock_data_key_map = {
     StockDataKey.SALES.value: ["Umsatzerlöse in Mio.", "Umsatz", "Umsatzerlöse"],
     StockDataKey.EBIT.value: ["EBIT", "EBIT in Mio.", "Ergebnis vor Steuer (EBT)"],
@@ -132,6 +208,7 @@ StockStoryItem = TypedDict(
         "title": str,
         "data_provider": str,
         "external_id": str,
+        "sentiment": NotRequired[str],
     },
 )
 
@@ -147,6 +224,32 @@ TradingviewStoryItem = TypedDict(
     },
 )
 
+# daily sentiment counts persisted in sentiment table
+StockSentimentItem = TypedDict(
+    "StockSentimentItem",
+    {
+        "ISIN": str,
+        "Day": str,
+        "positive": Decimal,
+        "neutral": Decimal,
+        "negative": Decimal,
+    },
+    total=False,
+)
+
+# import result of a source, persisted in meta table
+SourceStatus = TypedDict(
+    "SourceStatus",
+    {
+        "status": str,
+        "at": Decimal,
+        "failures": int,
+        "retry_at": NotRequired[Decimal],
+        # changed values of the last successful import
+        "changed": NotRequired[int],
+    },
+)
+
 PageCurrencies = TypedDict(
     "PageCurrencies", {"dataCurrency": str, "salesCurrency": str}
 )
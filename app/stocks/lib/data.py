@@ -1,39 +1,84 @@
 import os
+import zlib
 import boto3
 from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.types import Binary
 from datetime import datetime, timezone
 from decimal import Decimal
-
-from .constants import NewsSentiment, StockMetaFields, StockStoryItem, StockStoryFields
+from typing import Any, Iterator, Mapping
+
+from .constants import (
+    NewsSentiment,
+    stock_rank_fields,
+    SourceStatus,
+    StockMetaFields,
+    StockSentimentItem,
+    StockStoryItem,
+    StockStoryFields,
+    story_list_fields,
+)
+from .metrics import debug, track_dynamodb_capacity
+
+
+# sparse index of the meta items by changed_at, in a single partition
+CHANGE_FEED_INDEX = "change-feed-index"
+CHANGE_FEED_PARTITION = "changes"
+# sparse index of the screen items by updated_at, in a single partition
+SCREEN_UPDATES_INDEX = "screen-updates-index"
+SCREEN_UPDATES_PARTITION = "screen"
+
+
+def connect_dynamodb():
+    dynamodb = boto3.resource("dynamodb", region_name="eu-west-3")
+    track_dynamodb_capacity(dynamodb)
+    return dynamodb
 
 
 def connect_stocks_table():
     table_name = os.environ["STOCKS_TABLE"]
-    dynamodb = boto3.resource("dynamodb", region_name="eu-west-3")
+    dynamodb = connect_dynamodb()
     return dynamodb.Table(table_name)
 
 
 def connect_stocks_meta_table():
     meta_table_name = os.environ["STOCKS_META_TABLE"]
-    dynamodb = boto3.resource("dynamodb", region_name="eu-west-3")
+    dynamodb = connect_dynamodb()
     return dynamodb.Table(meta_table_name)
 
 
 def connect_stocks_story_table():
     stories_table_name = os.environ["STOCKS_STORY_TABLE"]
-    dynamodb = boto3.resource("dynamodb", region_name="eu-west-3")
+    dynamodb = connect_dynamodb()
     return dynamodb.Table(stories_table_name)
 
 
+def connect_stocks_sentiment_table():
+    sentiment_table_name = os.environ["STOCKS_SENTIMENT_TABLE"]
+    dynamodb = connect_dynamodb()
+    return dynamodb.Table(sentiment_table_name)
+
+
+def connect_stocks_screen_table():
+    screen_table_name = os.environ["STOCKS_SCREEN_TABLE"]
+    dynamodb = connect_dynamodb()
+    return dynamodb.Table(screen_table_name)
+
+
+def connect_stocks_layout_table():
+    layout_table_name = os.environ["STOCKS_LAYOUT_TABLE"]
+    dynamodb = connect_dynamodb()
+    return dynamodb.Table(layout_table_name)
+
+
+def connect_story_archive_bucket():
+    bucket_name = os.environ["STORY_ARCHIVE_BUCKET"]
+    s3 = boto3.resource("s3", region_name="eu-west-3")
+    return s3.Bucket(bucket_name)
+
+
 def add_stock_meta(stock_isin: str):
     meta_table = connect_stocks_meta_table()
-    meta_table.put_item(
-        Item={
-            "ISIN": stock_isin,
-            StockMetaFields.last_import.name: 0,
-            StockMetaFields.last_story_import.name: 0,
-        }
-    )
+    meta_table.put_item(Item=new_stock_meta_item(stock_isin))
 
 
 def fetch_stock_meta(stock_isin: str):
@@ -49,21 +94,29 @@ def fetch_stock_meta(stock_isin: str):
 
 
 def update_stock_meta(
-    stock_isin: str, fnet_estimation: str | None = None, fnet_guv: str | None = None
+    stock_isin: str,
+    fnet_estimation: str | None = None,
+    fnet_guv: str | None = None,
+    fnet_url_retry_at: Decimal | None = None,
+    tradingview_symbol: str | None = None,
 ):
     meta_table = connect_stocks_meta_table()
     update_expr_list = []
     expr_values = {}
-    if fnet_estimation is not None:
-        update_expr_list.append(
-            f"{StockMetaFields.fnet_estimation_url.name} = :{StockMetaFields.fnet_estimation_url.name}"
-        )
-        expr_values[f":{StockMetaFields.fnet_estimation_url.name}"] = fnet_estimation
-    if fnet_guv is not None:
-        update_expr_list.append(
-            f"{StockMetaFields.fnet_guv_url.name} = :{StockMetaFields.fnet_guv_url.name}"
-        )
-        expr_values[f":{StockMetaFields.fnet_guv_url.name}"] = fnet_guv
+    fields = [
+        (StockMetaFields.fnet_estimation_url, fnet_estimation),
+        (StockMetaFields.fnet_guv_url, fnet_guv),
+        (StockMetaFields.fnet_url_retry_at, fnet_url_retry_at),
+        (StockMetaFields.tradingview_symbol, tradingview_symbol),
+    ]
+    for field, value in fields:
+        if value is not None:
+            update_expr_list.append(f"{field.name} = :{field.name}")
+            expr_values[f":{field.name}"] = value
+
+    # nothing to update
+    if not len(update_expr_list):
+        return
 
     update_expr = ", ".join(update_expr_list)
 
@@ -74,19 +127,144 @@ def update_stock_meta(
     )
 
 
-def fetch_oldest_stock_meta() -> str | None:
+def new_stock_meta_item(stock_isin: str) -> dict:
+    return {
+        "ISIN": stock_isin,
+        StockMetaFields.last_import.name: 0,
+        StockMetaFields.last_story_import.name: 0,
+    }
+
+
+def batch_fetch_stock_metas(stock_isins: list[str]) -> dict[str, dict]:
+    # meta items of the known stocks by ISIN, 100 keys per request
+    dynamodb = connect_dynamodb()
+    meta_table_name = os.environ["STOCKS_META_TABLE"]
+    items: dict[str, dict] = {}
+    for start in range(0, len(stock_isins), 100):
+        request: dict[str, Any] = {
+            meta_table_name: {
+                "Keys": [{"ISIN": isin} for isin in stock_isins[start : start + 100]]
+            }
+        }
+        # throttled keys are returned as unprocessed
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response["Responses"].get(meta_table_name, []):
+                items[item["ISIN"]] = item
+            request = response.get("UnprocessedKeys", {})
+    return items
+
+
+def put_stock_metas(items: list[dict]):
+    meta_table = connect_stocks_meta_table()
+    with meta_table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=item)
+
+
+def scan_stock_meta() -> list[dict]:
     meta_table = connect_stocks_meta_table()
     response = meta_table.scan()
-    if "Items" in response:
-        # sort by last_import
-        sorted_stocks = sorted(
-            response["Items"],
-            key=lambda item: item.get(StockMetaFields.last_import.name, 0),
+    items = response["Items"]
+    # scan is paginated by 1MB
+    while "LastEvaluatedKey" in response:
+        response = meta_table.scan(ExclusiveStartKey=response["LastEvaluatedKey"])
+        items.extend(response["Items"])
+    return items
+
+
+def record_stock_demand(stock_isin: str) -> dict | None:
+    """
+    Counts a read of the stock and returns the meta item before the update,
+    None if the stock was not known before. Unknown stocks are added.
+    """
+    meta_table = connect_stocks_meta_table()
+    response = meta_table.update_item(
+        Key={"ISIN": stock_isin},
+        UpdateExpression=(
+            f"ADD {StockMetaFields.demand_count.name} :one "
+            f"SET {StockMetaFields.last_import.name} = if_not_exists({StockMetaFields.last_import.name}, :zero), "
+            f"{StockMetaFields.last_story_import.name} = if_not_exists({StockMetaFields.last_story_import.name}, :zero)"
+        ),
+        ExpressionAttributeValues={":one": 1, ":zero": 0},
+        ReturnValues="ALL_OLD",
+    )
+    if "Attributes" not in response:
+        return None
+    return response["Attributes"]
+
+
+class UnknownStockException(Exception):
+    pass
+
+
+def acquire_import_lease(stock_isin: str, owner: str, duration: int) -> dict | None:
+    """
+    Takes the import lease of a stock if it is free, expired or already owned.
+    Returns the meta item or None if another importer holds the lease, raises
+    UnknownStockException if the stock has no meta item.
+    """
+    meta_table = connect_stocks_meta_table()
+    now = datetime.now(timezone.utc).timestamp()
+    owner_field = StockMetaFields.import_lease_owner.name
+    expires_field = StockMetaFields.import_lease_expires.name
+    try:
+        response = meta_table.update_item(
+            Key={"ISIN": stock_isin},
+            UpdateExpression=f"SET {owner_field} = :owner, {expires_field} = :expires",
+            ConditionExpression=(
+                f"attribute_exists(ISIN) AND (attribute_not_exists({expires_field}) "
+                f"OR {expires_field} < :now OR {owner_field} = :owner)"
+            ),
+            ExpressionAttributeValues={
+                ":owner": owner,
+                ":expires": Decimal(str(now + duration)),
+                ":now": Decimal(str(now)),
+            },
+            ReturnValues="ALL_NEW",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
         )
-        if len(sorted_stocks):
-            return sorted_stocks[0]["ISIN"]
+    except meta_table.meta.client.exceptions.ConditionalCheckFailedException as e:
+        # the failed check returns the item, if there is one
+        if "Item" not in e.response:
+            raise UnknownStockException(f"Unknown stock {stock_isin}")
+        return None
+    return response["Attributes"]
 
-    return None
+
+def renew_import_lease(stock_isin: str, owner: str, duration: int) -> bool:
+    meta_table = connect_stocks_meta_table()
+    now = datetime.now(timezone.utc).timestamp()
+    try:
+        meta_table.update_item(
+            Key={"ISIN": stock_isin},
+            UpdateExpression=f"SET {StockMetaFields.import_lease_expires.name} = :expires",
+            ConditionExpression=f"{StockMetaFields.import_lease_owner.name} = :owner",
+            ExpressionAttributeValues={
+                ":owner": owner,
+                ":expires": Decimal(str(now + duration)),
+            },
+        )
+    except meta_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+
+def release_import_lease(stock_isin: str, owner: str):
+    meta_table = connect_stocks_meta_table()
+    try:
+        meta_table.update_item(
+            Key={"ISIN": stock_isin},
+            UpdateExpression=(
+                f"REMOVE {StockMetaFields.import_lease_owner.name}, "
+                f"{StockMetaFields.import_lease_expires.name}"
+            ),
+            ConditionExpression=f"{StockMetaFields.import_lease_owner.name} = :owner",
+            ExpressionAttributeValues={":owner": owner},
+        )
+    except meta_table.meta.client.exceptions.ConditionalCheckFailedException:
+        # lease expired and was taken by another importer
+        pass
 
 
 def fetch_oldest_stock_story_meta() -> str | None:
@@ -125,8 +303,8 @@ def update_stock_data(stock_isin: str, year: int, item: dict):
     for key in item:
         expr_attr[f":{key}"] = item[key]
 
-    print("Write item", item)
-    print("Expr", update_expr_joined)
+    debug("Write item", item)
+    debug("Expr", update_expr_joined)
 
     # write item
     table = connect_stocks_table()
@@ -137,13 +315,142 @@ def update_stock_data(stock_isin: str, year: int, item: dict):
     )
 
 
-def update_last_import(stock_isin: str):
+def scan_stock_ranks() -> list[dict]:
+    # stored percentile ranks of every stock year, Year is a reserved word
+    table = connect_stocks_table()
+    scan_args: dict[str, Any] = {
+        "ProjectionExpression": ", ".join(["ISIN", "#year", *stock_rank_fields]),
+        "ExpressionAttributeNames": {"#year": "Year"},
+    }
+    response = table.scan(**scan_args)
+    items = response["Items"]
+    # scan is paginated by 1MB
+    while "LastEvaluatedKey" in response:
+        response = table.scan(ExclusiveStartKey=response["LastEvaluatedKey"], **scan_args)
+        items.extend(response["Items"])
+    return items
+
+
+def update_stock_ranks(
+    stock_isin: str, year: int, ranks: dict[str, Decimal], removed: list[str]
+):
+    # set changed ranks and remove ranks of metrics which are missing now
+    update_expr = ""
+    if len(ranks):
+        update_expr += "SET " + ", ".join(f"{key} = :{key}" for key in ranks)
+    if len(removed):
+        update_expr += " REMOVE " + ", ".join(removed)
+    if not update_expr:
+        return
+
+    update_args: dict[str, Any] = {
+        "Key": {"ISIN": stock_isin, "Year": year},
+        "UpdateExpression": update_expr.strip(),
+    }
+    if len(ranks):
+        update_args["ExpressionAttributeValues"] = {
+            f":{key}": value for key, value in ranks.items()
+        }
+    table = connect_stocks_table()
+    table.update_item(**update_args)
+
+
+def update_last_import(
+    stock_isin: str,
+    changed: bool = True,
+    source_status: dict[str, SourceStatus] | None = None,
+    seen_demand: int = 0,
+):
     meta_table = connect_stocks_meta_table()
     now = datetime.now(timezone.utc).timestamp()
+    # demand is counted from one import to the next, reads counted while the
+    # import was running are kept
+    update_expr = (
+        f"ADD {StockMetaFields.demand_count.name} :val3 "
+        f"SET {StockMetaFields.last_import.name} = :val1, "
+        f"{StockMetaFields.last_import_changed.name} = :val2"
+    )
+    expr_values: dict[str, Any] = {
+        ":val1": Decimal(str(now)),
+        ":val2": changed,
+        ":val3": -seen_demand,
+    }
+    if source_status is not None:
+        update_expr += f", {StockMetaFields.source_status.name} = :val4"
+        expr_values[":val4"] = source_status
+
     meta_table.update_item(
         Key={"ISIN": stock_isin},
-        UpdateExpression=f"SET {StockMetaFields.last_import.name} = :val1",
-        ExpressionAttributeValues={":val1": Decimal(str(now))},
+        UpdateExpression=update_expr,
+        ExpressionAttributeValues=expr_values,
+    )
+
+
+def update_source_status(stock_isin: str, source_status: dict[str, SourceStatus]):
+    meta_table = connect_stocks_meta_table()
+    meta_table.update_item(
+        Key={"ISIN": stock_isin},
+        UpdateExpression=f"SET {StockMetaFields.source_status.name} = :val1",
+        ExpressionAttributeValues={":val1": source_status},
+    )
+
+
+def mark_stock_changed(stock_isin: str, changed_field: str):
+    # data_changed_at or stories_changed_at, listed by the change feed
+    meta_table = connect_stocks_meta_table()
+    now = datetime.now(timezone.utc).timestamp()
+    meta_table.update_item(
+        Key={"ISIN": stock_isin},
+        UpdateExpression=(
+            f"SET {changed_field} = :now, "
+            f"{StockMetaFields.changed_at.name} = :now, "
+            f"{StockMetaFields.change_feed.name} = :feed"
+        ),
+        ExpressionAttributeValues={
+            ":now": Decimal(str(now)),
+            ":feed": CHANGE_FEED_PARTITION,
+        },
+    )
+
+
+def query_changed_stocks(
+    changed_after: Decimal, limit: int, start_key: dict | None = None
+) -> tuple[list[dict], dict | None]:
+    """
+    Reads up to limit meta items changed after the timestamp from the change
+    feed index, oldest change first. Returns the items and the key to continue
+    from, None after the last page.
+    """
+    meta_table = connect_stocks_meta_table()
+    query_args: dict[str, Any] = {
+        "IndexName": CHANGE_FEED_INDEX,
+        "KeyConditionExpression": Key(StockMetaFields.change_feed.name).eq(
+            CHANGE_FEED_PARTITION
+        )
+        & Key(StockMetaFields.changed_at.name).gt(changed_after),
+        "Limit": limit,
+    }
+    if start_key is not None:
+        query_args["ExclusiveStartKey"] = start_key
+    response = meta_table.query(**query_args)
+    return response["Items"], response.get("LastEvaluatedKey")
+
+
+def update_sentiment_series_built(stock_isin: str):
+    meta_table = connect_stocks_meta_table()
+    meta_table.update_item(
+        Key={"ISIN": stock_isin},
+        UpdateExpression=f"SET {StockMetaFields.sentiment_series_built.name} = :val1",
+        ExpressionAttributeValues={":val1": True},
+    )
+
+
+def update_screen_built(stock_isin: str, built: bool = True):
+    meta_table = connect_stocks_meta_table()
+    meta_table.update_item(
+        Key={"ISIN": stock_isin},
+        UpdateExpression=f"SET {StockMetaFields.screen_built.name} = :val1",
+        ExpressionAttributeValues={":val1": built},
     )
 
 
@@ -157,11 +464,32 @@ def update_last_story_import(stock_isin: str):
     )
 
 
+def compress_story_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 9)
+
+
+# read story body, compressed or from legacy plain text attribute
+def story_text_content(story: Mapping[str, Any]) -> str:
+    compressed = story.get(StockStoryFields.text_content_zlib.name)
+    if compressed is not None:
+        # boto3 wraps binary attributes
+        if isinstance(compressed, Binary):
+            compressed = compressed.value
+        return zlib.decompress(compressed).decode("utf-8")
+    return story.get(StockStoryFields.text_content.name, "")
+
+
 def add_stock_stories(stories: list[StockStoryItem]):
     story_table = connect_stocks_story_table()
     print(f"Write {len(stories)} story items")
     with story_table.batch_writer() as batch:
-        for item in stories:
+        for story in stories:
+            # store body compressed as binary attribute
+            item: dict[str, Any] = dict(story)
+            text_content = item.pop(StockStoryFields.text_content.name)
+            item[StockStoryFields.text_content_zlib.name] = compress_story_text(
+                text_content
+            )
             batch.put_item(Item=item)
     print(f"{len(stories)} story items written")
 
@@ -178,8 +506,10 @@ def fetch_stock_story_urls(stock_isin: str) -> list[StockStoryItem]:
 
 def fetch_stock_stories(stock_isin: str) -> list[StockStoryItem]:
     story_table = connect_stocks_story_table()
+    # only read listed fields, story bodies are not needed
     response = story_table.query(
         KeyConditionExpression=Key("ISIN").eq(stock_isin),
+        ProjectionExpression=", ".join(story_list_fields),
     )
     items = response["Items"]
     return items
@@ -197,21 +527,202 @@ def fetch_stock_stories_without_sentiment(stock_isin: str) -> list[StockStoryIte
     return items
 
 
-def update_stock_story_sentiment(
-    stock_isin: str, source_url: str, sentiment: NewsSentiment
+def fetch_stock_stories_to_archive(
+    stock_isin: str, published_before: Decimal
+) -> Iterator[list[StockStoryItem]]:
+    # stories with a body published before by query page, stories without
+    # sentiment keep it
+    story_table = connect_stocks_story_table()
+    query_args: dict[str, Any] = {
+        "KeyConditionExpression": Key("ISIN").eq(stock_isin),
+        "FilterExpression": Attr(StockStoryFields.published_at.name).lt(
+            published_before
+        )
+        & Attr(StockStoryFields.sentiment.name).exists()
+        & Attr(StockStoryFields.sentiment.name).ne("")
+        & (
+            Attr(StockStoryFields.text_content_zlib.name).exists()
+            | Attr(StockStoryFields.text_content.name).exists()
+        ),
+    }
+    response = story_table.query(**query_args)
+    # query is paginated by 1MB, the filter can leave a page empty
+    while True:
+        if len(response["Items"]):
+            yield response["Items"]
+        if "LastEvaluatedKey" not in response:
+            return
+        response = story_table.query(
+            ExclusiveStartKey=response["LastEvaluatedKey"], **query_args
+        )
+
+
+def put_story_archive(archive_key: str, body: bytes):
+    bucket = connect_story_archive_bucket()
+    bucket.put_object(Key=archive_key, Body=body, ContentType="application/gzip")
+
+
+def fetch_story_archive(archive_key: str) -> bytes:
+    bucket = connect_story_archive_bucket()
+    return bucket.Object(archive_key).get()["Body"].read()
+
+
+def archive_stock_story(
+    stock_isin: str, source_url: str, archive_key: str, expires_at: Decimal
 ):
-    meta_table = connect_stocks_story_table()
-    update_expr_list = []
-    expr_values = {}
+    # the body is in the archive file, metadata and sentiment stay
+    story_table = connect_stocks_story_table()
+    story_table.update_item(
+        Key={"ISIN": stock_isin, "source_url": source_url},
+        UpdateExpression=(
+            f"SET {StockStoryFields.archive_key.name} = :archive_key,"
+            f" {StockStoryFields.expires_at.name} = :expires_at"
+            f" REMOVE {StockStoryFields.text_content_zlib.name},"
+            f" {StockStoryFields.text_content.name}"
+        ),
+        ExpressionAttributeValues={
+            ":archive_key": archive_key,
+            ":expires_at": expires_at,
+        },
+    )
+
 
-    update_expr_list.append(
-        f"{StockStoryFields.sentiment.name} = :{StockStoryFields.sentiment.name}"
+def set_stock_story_sentiment(
+    stock_isin: str, source_url: str, day: str, sentiment: NewsSentiment
+) -> bool:
+    """
+    Writes the sentiment of an uncategorized story and counts it in the
+    sentiment series of its day in one transaction. Returns False if the
+    story was categorized before, nothing is counted then.
+    """
+    client = connect_dynamodb().meta.client
+    sentiment_field = StockStoryFields.sentiment.name
+    try:
+        client.transact_write_items(
+            TransactItems=[
+                {
+                    "Update": {
+                        "TableName": os.environ["STOCKS_STORY_TABLE"],
+                        "Key": {"ISIN": stock_isin, "source_url": source_url},
+                        "UpdateExpression": f"SET {sentiment_field} = :sentiment",
+                        "ConditionExpression": (
+                            "attribute_exists(source_url) AND "
+                            f"(attribute_not_exists({sentiment_field}) "
+                            f"OR {sentiment_field} = :empty "
+                            f"OR {sentiment_field} = :null)"
+                        ),
+                        "ExpressionAttributeValues": {
+                            ":sentiment": sentiment.value,
+                            ":empty": "",
+                            ":null": None,
+                        },
+                    }
+                },
+                {
+                    "Update": {
+                        "TableName": os.environ["STOCKS_SENTIMENT_TABLE"],
+                        "Key": {"ISIN": stock_isin, "Day": day},
+                        "UpdateExpression": "ADD #sentiment :one",
+                        "ExpressionAttributeNames": {"#sentiment": sentiment.value},
+                        "ExpressionAttributeValues": {":one": 1},
+                    }
+                },
+            ]
+        )
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get("CancellationReasons", [])
+        if len(reasons) and reasons[0].get("Code") == "ConditionalCheckFailed":
+            return False
+        raise
+    return True
+
+
+# day of a story in sentiment table: 1717200000 -> 2024-06-01
+def story_day(published_at: Decimal) -> str:
+    return datetime.fromtimestamp(float(published_at), timezone.utc).strftime(
+        "%Y-%m-%d"
     )
-    update_expr = ", ".join(update_expr_list)
-    expr_values[f":{StockStoryFields.sentiment.name}"] = sentiment.value
 
-    meta_table.update_item(
-        Key={"ISIN": stock_isin, "source_url": source_url},
-        UpdateExpression=f"SET {update_expr}",
-        ExpressionAttributeValues=expr_values,
+
+def put_stock_sentiment_counts(items: list[StockSentimentItem]):
+    sentiment_table = connect_stocks_sentiment_table()
+    with sentiment_table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=item)
+
+
+def fetch_stock_sentiment_counts(
+    stock_isin: str, from_day: str | None = None, to_day: str | None = None
+) -> list[StockSentimentItem]:
+    sentiment_table = connect_stocks_sentiment_table()
+    key_condition = Key("ISIN").eq(stock_isin)
+    if from_day is not None and to_day is not None:
+        key_condition = key_condition & Key("Day").between(from_day, to_day)
+    elif from_day is not None:
+        key_condition = key_condition & Key("Day").gte(from_day)
+    elif to_day is not None:
+        key_condition = key_condition & Key("Day").lte(to_day)
+
+    response = sentiment_table.query(KeyConditionExpression=key_condition)
+    items = response["Items"]
+    return items
+
+
+def put_stock_screen_items(items: list[dict]):
+    screen_table = connect_stocks_screen_table()
+    with screen_table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item={**item, "screen_updates": SCREEN_UPDATES_PARTITION})
+
+
+def scan_stock_screen() -> list[dict]:
+    # screen items of all stocks
+    screen_table = connect_stocks_screen_table()
+    response = screen_table.scan()
+    items = response["Items"]
+    # scan is paginated by 1MB
+    while "LastEvaluatedKey" in response:
+        response = screen_table.scan(ExclusiveStartKey=response["LastEvaluatedKey"])
+        items.extend(response["Items"])
+    return items
+
+
+def query_stock_screen_updates(updated_after: Decimal) -> list[dict]:
+    """
+    Reads the screen items written after updated_after from the screen
+    updates index, only the changed items are read.
+    """
+    screen_table = connect_stocks_screen_table()
+    query_args: dict[str, Any] = {
+        "IndexName": SCREEN_UPDATES_INDEX,
+        "KeyConditionExpression": Key("screen_updates").eq(SCREEN_UPDATES_PARTITION)
+        & Key("updated_at").gt(updated_after),
+    }
+    response = screen_table.query(**query_args)
+    items = response["Items"]
+    while "LastEvaluatedKey" in response:
+        response = screen_table.query(
+            ExclusiveStartKey=response["LastEvaluatedKey"], **query_args
+        )
+        items.extend(response["Items"])
+    return items
+
+
+def fetch_table_layout(fingerprint: str) -> str | None:
+    # table entries matched for a table layout, None if not matched yet
+    layout_table = connect_stocks_layout_table()
+    response = layout_table.get_item(Key={"Fingerprint": fingerprint})
+    if "Item" not in response:
+        return None
+    return response["Item"]["entries"]
+
+
+def put_table_layout(fingerprint: str, entries: str):
+    layout_table = connect_stocks_layout_table()
+    layout_table.put_item(
+        Item={
+            "Fingerprint": fingerprint,
+            "entries": entries,
+            "created_at": Decimal(str(datetime.now(timezone.utc).timestamp())),
+        }
     )
@@ -1,10 +1,16 @@
+import csv
+import io
 import pandas as pd
 import numpy as np
 from typing import TypeGuard
 
-from .helper import find_curr, text_to_float
-from .constants import StockDataKey
-from .data import fetch_stock_data
+from .helper import parse_value, text_to_float
+from .constants import (
+    STOCK_CSV_YEARS_AFTER,
+    STOCK_CSV_YEARS_BEFORE,
+    StockDataKey,
+    stock_csv_fields,
+)
 
 
 def is_valid_float(value) -> TypeGuard[float]:
@@ -21,12 +27,12 @@ def calculate_pps(stock_df: pd.DataFrame) -> pd.DataFrame:
     pps_list: list[str | float] = []
 
     for i in stock_df.index:
-        EPS = text_to_float(stock_df[StockDataKey.EARNINGS_PER_SHARE.value][i])
+        eps_parsed = parse_value(stock_df[StockDataKey.EARNINGS_PER_SHARE.value][i])
+        EPS = eps_parsed.value
         KGV = text_to_float(stock_df[StockDataKey.KGV.value][i])
         if is_valid_float(EPS) and is_valid_float(KGV):
-            curr = find_curr(stock_df[StockDataKey.EARNINGS_PER_SHARE.value][i])
             PPS = EPS * KGV
-            pps_list.append(f"{PPS:.2f} {curr}")
+            pps_list.append(f"{PPS:.2f} {eps_parsed.currency}")
         else:
             pps_list.append(np.nan)
 
@@ -88,8 +94,7 @@ def calculate_sps(stock_df: pd.DataFrame) -> pd.DataFrame:
 
     for i in stock_df.index:
         sps_value = stock_df[StockDataKey.SALES_PER_SHARE.value][i]
-        sales_value = text_to_float(stock_df[StockDataKey.SALES.value][i])
-        sales_curr = find_curr(stock_df[StockDataKey.SALES.value][i])
+        sales_value, sales_curr, _, _ = parse_value(stock_df[StockDataKey.SALES.value][i])
         stock_count_value = text_to_float(stock_df[StockDataKey.STOCK_COUNT.value][i])
         if (
             is_valid_float(sales_value)
@@ -134,12 +139,8 @@ def calculate_kuv(stock_df: pd.DataFrame) -> pd.DataFrame:
     return stock_df
 
 
-def fill_missing_values(stock_isin: str) -> None | pd.DataFrame:
-    data = fetch_stock_data(stock_isin)
-    if not len(data):
-        print("Could not find data for:", stock_isin)
-        return None
-
+# calculates missing values of the stored stock items
+def complete_stock_df(data: list[dict]) -> pd.DataFrame:
     stock_df = pd.DataFrame.from_records(data, index="Year")
 
     stock_df = calculate_stock_count(stock_df)
@@ -151,3 +152,20 @@ def fill_missing_values(stock_isin: str) -> None | pd.DataFrame:
     stock_df = stock_df.ffill()
 
     return stock_df
+
+
+def stock_df_to_csv(stock_df: pd.DataFrame, current_year: int) -> str:
+    data_df = stock_df.reindex(columns=stock_csv_fields).transpose()
+    # filter df by years
+    min_year = current_year - STOCK_CSV_YEARS_BEFORE
+    max_year = current_year + STOCK_CSV_YEARS_AFTER
+    dropped_cols = []
+    for col in data_df.columns:
+        if int(col) < min_year or int(col) > max_year:
+            dropped_cols.append(col)
+    data_df = data_df.drop(columns=dropped_cols)
+
+    # write csv
+    output_csv = io.StringIO()
+    data_df.to_csv(output_csv, decimal=",", quoting=csv.QUOTE_ALL, sep=";")
+    return output_csv.getvalue().replace(".", ",")
@@ -1,44 +1,112 @@
 import pandas as pd
 import numpy
 from decimal import Decimal
+from typing import Any, Iterator
 
-from .helper import is_number_optional_suffix
+from .helper import parse_value
 from .constants import StockDataKey
 
 
-def dataframe_to_items(stock_df: pd.DataFrame):
+# check if value is number or float and not nan
+def is_number_optional_suffix(value) -> bool:
+    if isinstance(value, str):
+        value = parse_value(value).value
+
+    if value is None:
+        return False
+
+    if isinstance(value, Decimal) and value.is_nan():
+        return False
+
+    try:
+        float_value = float(value)
+        if numpy.nan is float_value:
+            return False
+        return True
+    except ValueError:
+        return False
+
+
+# attributes of the stock data items, Year is part of the key
+ITEM_KEYS = frozenset(key.value for key in StockDataKey) - {StockDataKey.YEAR.value}
+
+
+def encode_value(val):
+    # numpy to python types
+    if isinstance(val, numpy.generic):
+        if numpy.isnan(val):
+            return None
+        val = val.item()
+    # float to decimal
+    if isinstance(val, float):
+        val = Decimal(str(val))
+    return val
+
+
+def encode_column(column: pd.Series) -> list:
+    """
+    Encodes the values of a column for dynamodb, None for values which are not
+    written.
+    """
+    if pd.api.types.is_float_dtype(column.dtype):
+        # every value but nan is a number
+        array = column.to_numpy()
+        missing = numpy.isnan(array).tolist()
+        return [
+            None if missing[i] else Decimal(str(value))
+            for i, value in enumerate(array.tolist())
+        ]
+
+    if pd.api.types.is_integer_dtype(column.dtype) or pd.api.types.is_bool_dtype(
+        column.dtype
+    ):
+        return column.tolist()
+
+    values = [encode_value(val) for val in column.tolist()]
+    # filter empty values
+    return [val if is_number_optional_suffix(val) else None for val in values]
+
+
+def dataframe_to_items(stock_df: pd.DataFrame | None) -> Iterator[tuple[dict, Any]]:
+    """
+    Yields the stock data item and year of each row. The columns are encoded
+    once when the first item is taken.
+    """
     if stock_df is None:
-        return []
-
-    items = []
-
-    for i in stock_df.index:
-        item = {}
-        for col in stock_df:
-            val = stock_df[col][i]
-            # numpy to python types
-            if isinstance(val, numpy.generic):
-                if numpy.isnan(val):
-                    val = None
-                else:
-                    val = val.item()
-            # float to decimal
-            if isinstance(val, float):
-                val = Decimal(str(val))
-
-            # filter empty values
-            if (
-                is_number_optional_suffix(val)
-                # filter out year
-                and col != "Year"
-                and col in [el.value for el in StockDataKey]
-            ):
-                item[col] = val
-
-        year = stock_df["Year"][i]
-        if isinstance(year, numpy.generic):
-            year = year.item()
-
-        items.append([item, year])
-
-    return items
+        return
+
+    columns = [
+        (col, encode_column(stock_df[col])) for col in stock_df if col in ITEM_KEYS
+    ]
+    years = stock_df["Year"].tolist()
+
+    for i, year in enumerate(years):
+        item = {col: values[i] for col, values in columns if values[i] is not None}
+        yield item, year
+
+
+# attributes of item that differ from the stored item
+def diff_stock_item(stored_item: dict, item: dict) -> dict:
+    return {
+        key: value
+        for key, value in item.items()
+        if key not in stored_item or stored_item[key] != value
+    }
+
+
+def merge_stock_items(
+    stored_items: dict[int, dict], items: dict[int, dict]
+) -> tuple[dict[int, dict], int]:
+    """
+    Returns the stored items of the years with changed values, updated with
+    the changes, and how many values changed.
+    """
+    merged: dict[int, dict] = {}
+    changed = 0
+    for year, item in items.items():
+        stored_item = stored_items.get(year, {})
+        changed_item = diff_stock_item(stored_item, item)
+        if changed_item:
+            merged[year] = {**stored_item, **changed_item}
+            changed += len(changed_item)
+    return merged, changed
@@ -1,25 +1,124 @@
-import numpy
-from decimal import Decimal
-
-
-# check if value is number or float and not nan
-def is_number_optional_suffix(value) -> bool:
-    if isinstance(value, str):
-        value = text_to_float(value)
-
-    if value is None:
-        return False
-
-    if isinstance(value, Decimal) and value.is_nan():
-        return False
+import re
+from functools import lru_cache
+from typing import Any, NamedTuple
+
+# checked in this order, the first one found in a text is its currency
+CURRENCIES = [
+    "AUD",
+    "BRL",
+    "CAD",
+    "CHF",
+    "CNY",
+    "CZK",
+    "DKK",
+    "EUR",
+    "GBP",
+    "HKD",
+    "JPY",
+    "KRW",
+    "MNT",
+    "MXN",
+    "NOK",
+    "PLN",
+    "RUB",
+    "THB",
+    "TRY",
+    "UAH",
+    "USD",
+    "VND",
+]
+CURRENCY_ORDER = {curr: i for i, curr in enumerate(CURRENCIES)}
+UNITS = ["Mrd.", "Mio."]
+
+# usual cells: a number with one currency or percent sign, "1.200,50 EUR"
+VALUE_PATTERN = re.compile(
+    r"\s*([-+]?\d[\d.,]*)\s*(?:(" + "|".join(CURRENCIES) + r")|(%))?\s*"
+)
+# every currency, unit and percent sign of a text in one scan, overlapping ones too
+VALUE_TOKENS = re.compile(
+    "(?=(" + "|".join(map(re.escape, [*CURRENCIES, *UNITS, "%"])) + "))"
+)
+
+# distinct texts of a few stocks, the cells of a page and their completion
+PARSE_CACHE_SIZE = 1024
+
+
+class ParsedValue(NamedTuple):
+    # number like text_to_float, None if the text has a unit
+    value: float | None
+    currency: str | None
+    # Mrd. or Mio.
+    unit: str | None
+    is_percent: bool
+
+
+EMPTY_VALUE = ParsedValue(None, None, None, False)
+
+
+def first_currency(tokens: list[str]) -> str | None:
+    currencies = [token for token in tokens if token in CURRENCY_ORDER]
+    if not len(currencies):
+        return None
+    if len(currencies) == 1:
+        return currencies[0]
+    return min(currencies, key=CURRENCY_ORDER.__getitem__)
+
+
+def parse_value(text: Any) -> ParsedValue:
+    """
+    Parses a table cell or stored value: "1.200,50 EUR" => (1200.5, "EUR",
+    None, False). Values which are no text are converted with float.
+    """
+    if isinstance(text, str):
+        return parse_text(text)
+    if text is None:
+        return EMPTY_VALUE
 
     try:
-        float_value = float(value)
-        if numpy.nan is float_value:
-            return False
-        return True
+        return ParsedValue(float(text), None, None, False)
     except ValueError:
-        return False
+        return EMPTY_VALUE
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_text(text: str) -> ParsedValue:
+    match = VALUE_PATTERN.fullmatch(text)
+    if match is not None:
+        number, currency, percent = match.groups()
+        return ParsedValue(parse_number(number), currency, None, percent is not None)
+
+    tokens = VALUE_TOKENS.findall(text)
+    if not len(tokens):
+        return ParsedValue(parse_number(text.strip()), None, None, False)
+
+    currency = first_currency(tokens)
+    unit = "Mrd." if "Mrd." in tokens else "Mio." if "Mio." in tokens else None
+    is_percent = "%" in tokens
+    if unit is not None:
+        return ParsedValue(None, currency, unit, is_percent)
+
+    number_text = text
+    number_currency = currency
+    if is_percent:
+        number_text = number_text.replace("%", "")
+        # removing % can join a currency
+        number_currency = first_currency(VALUE_TOKENS.findall(number_text))
+    if number_currency is not None:
+        number_text = number_text.replace(number_currency, "")
+
+    return ParsedValue(parse_number(number_text.strip()), currency, unit, is_percent)
+
+
+def parse_number(text: str) -> float | None:
+    # the last separator is the decimal one: "1.200,5" and "1,200.5" => 1200.5
+    if text.rfind(",") > text.rfind("."):
+        text = text.replace(".", "").replace(",", ".")
+    else:
+        text = text.replace(",", "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
 
 
 # find curr strings: 1000EUR -> EUR
@@ -27,35 +126,7 @@ def find_curr(text: str) -> str | None:
     if not isinstance(text, str):
         return None
 
-    curr = [
-        "AUD",
-        "BRL",
-        "CAD",
-        "CHF",
-        "CNY",
-        "CZK",
-        "DKK",
-        "EUR",
-        "GBP",
-        "HKD",
-        "JPY",
-        "KRW",
-        "MNT",
-        "MXN",
-        "NOK",
-        "PLN",
-        "RUB",
-        "THB",
-        "TRY",
-        "UAH",
-        "USD",
-        "VND",
-    ]
-    for c in curr:
-        if c in text:
-            return c
-
-    return None
+    return parse_text(text).currency
 
 
 # convert text to float: "1,5" => 1.5 "3.5" => 3.5
@@ -63,31 +134,12 @@ def text_currency_to_float(text: str) -> float:
     if not isinstance(text, str):
         return text
 
-    t = text
-    dot_pos = t.rfind(".")
-    comma_pos = t.rfind(",")
-    if comma_pos > dot_pos:
-        t = t.replace(".", "")
-        t = t.replace(",", ".")
-    else:
-        t = t.replace(",", "")
-    return float(t)
+    value = parse_number(text)
+    if value is None:
+        raise ValueError(f"could not convert string to float: {text!r}")
+    return value
 
 
 # remove currency or % from text: "1,00 EUR" => 1.0
 def text_to_float(text: str) -> float | None:
-    if text is None:
-        return None
-
-    try:
-        if not isinstance(text, str):
-            return float(text)
-
-        text = text.replace("%", "")
-        curr = find_curr(text)
-        if curr is not None:
-            text = text.replace(curr, "")
-
-        return text_currency_to_float(text.strip())
-    except ValueError:
-        return None
+    return parse_value(text).value
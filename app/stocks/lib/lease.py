@@ -0,0 +1,46 @@
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+from .data import acquire_import_lease, renew_import_lease, release_import_lease
+
+# lease outlives the import lambda timeout, a crashed import frees it after this
+IMPORT_LEASE_DURATION = 300
+# renew lease this often while the import is running
+IMPORT_LEASE_HEARTBEAT = 60
+
+
+@contextmanager
+def import_lease(
+    stock_isin: str,
+    duration: int = IMPORT_LEASE_DURATION,
+    heartbeat: int = IMPORT_LEASE_HEARTBEAT,
+) -> Iterator[dict | None]:
+    """
+    Holds the import lease of a stock while the block runs and renews it in
+    the background. Yields the meta item, or None if another importer is
+    already importing the stock.
+    """
+    owner = str(uuid.uuid4())
+    meta_item = acquire_import_lease(stock_isin, owner, duration)
+    if meta_item is None:
+        yield None
+        return
+
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(heartbeat):
+            if not renew_import_lease(stock_isin, owner, duration):
+                print("Lost import lease for:", stock_isin)
+                return
+
+    heartbeat_thread = threading.Thread(target=renew, daemon=True)
+    heartbeat_thread.start()
+    try:
+        yield meta_item
+    finally:
+        stop.set()
+        heartbeat_thread.join()
+        release_import_lease(stock_isin, owner)
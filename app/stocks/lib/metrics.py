@@ -0,0 +1,123 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+# DEBUG also prints payloads like tables, dataframes and written items
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+METRICS_NAMESPACE = "StockDataImport"
+
+DYNAMODB_READ_OPERATIONS = ["GetItem", "BatchGetItem", "Query", "Scan"]
+
+metrics: dict[str, float] = {}
+metrics_lock = threading.Lock()
+
+
+def is_debug() -> bool:
+    return LOG_LEVEL == "DEBUG"
+
+
+def debug(*args):
+    if is_debug():
+        print(*args)
+
+
+def count(name: str, value: float = 1):
+    with metrics_lock:
+        metrics[name] = metrics.get(name, 0) + value
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    # adds the duration of the block to the <name>_ms metric
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        count(f"{name}_ms", (time.perf_counter() - start) * 1000)
+
+
+def metric_unit(name: str) -> str:
+    if name.endswith("_ms"):
+        return "Milliseconds"
+    if name.endswith("_bytes"):
+        return "Bytes"
+    return "Count"
+
+
+def emit_metrics(handler_name: str):
+    """
+    Prints the metrics of the invocation as one line in CloudWatch embedded
+    metric format, so they are extracted as metrics from the logs.
+    """
+    with metrics_lock:
+        values = {name: round(value, 3) for name, value in metrics.items()}
+        metrics.clear()
+
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRICS_NAMESPACE,
+                            "Dimensions": [["handler"]],
+                            "Metrics": [
+                                {"Name": name, "Unit": metric_unit(name)}
+                                for name in values
+                            ],
+                        }
+                    ],
+                },
+                "handler": handler_name,
+                **values,
+            }
+        )
+    )
+
+
+def instrumented(handler: Callable) -> Callable:
+    # collects metrics of one lambda invocation and emits them at the end
+    handler_name = handler.__module__.rsplit(".", 1)[-1]
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        with metrics_lock:
+            metrics.clear()
+        try:
+            with span("invocation"):
+                return handler(event, context)
+        finally:
+            emit_metrics(handler_name)
+
+    return wrapper
+
+
+def track_dynamodb_capacity(resource: Any):
+    """
+    Requests the consumed capacity of every call of a boto3 dynamodb resource
+    and counts it as dynamodb_read_units and dynamodb_write_units.
+    """
+    events = resource.meta.client.meta.events
+
+    def add_return_consumed_capacity(params, model, **kwargs):
+        if "ReturnConsumedCapacity" in model.input_shape.members:
+            params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+    def count_consumed_capacity(parsed, model, **kwargs):
+        consumed = parsed.get("ConsumedCapacity")
+        if consumed is None:
+            return
+        # batch operations return a list of tables
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        kind = "read" if model.name in DYNAMODB_READ_OPERATIONS else "write"
+        count(f"dynamodb_{kind}_units", sum(c.get("CapacityUnits", 0) for c in consumed))
+        count(f"dynamodb_{kind}_calls")
+
+    events.register("provide-client-params.dynamodb.*", add_return_consumed_capacity)
+    events.register("after-call.dynamodb.*", count_consumed_capacity)
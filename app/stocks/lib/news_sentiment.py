@@ -1,8 +1,13 @@
 import os
-import requests
 
-from .data import fetch_stock_stories_without_sentiment, update_stock_story_sentiment
+from .data import (
+    fetch_stock_stories_without_sentiment,
+    set_stock_story_sentiment,
+    story_text_content,
+    story_day,
+)
 from .constants import SENTIMENT_PROMPT, NewsSentiment
+from .provider import provider_request
 
 
 class SentimentException(Exception):
@@ -12,7 +17,9 @@ class SentimentException(Exception):
 def query_hf(payload, model_id) -> list:
     headers = {"Authorization": f"Bearer {os.environ["HUGGINGFACEHUB_API_TOKEN"]}"}
     API_URL = f"https://api-inference.huggingface.co/models/{model_id}"
-    response = requests.post(API_URL, headers=headers, json=payload)
+    response = provider_request(
+        "huggingface", "POST", API_URL, headers=headers, json=payload
+    )
     if response.status_code != 200:
         raise Exception("Error response from huggingface inference api")
     return response.json()
@@ -36,18 +43,27 @@ def categorize_news_sentiment(news: str) -> NewsSentiment:
     return NewsSentiment(sentiment)
 
 
-def set_news_sentiment(stock_isin: str) -> None:
+def set_news_sentiment(stock_isin: str) -> int:
     """
-    Sets the sentiment of the news stories for a given stock.
+    Sets the sentiment of the news stories for a given stock, returns the
+    categorized stories.
     """
     stories = fetch_stock_stories_without_sentiment(stock_isin)
+    categorized = 0
     for story in stories:
         try:
             print("Categorizing sentiment for story", story["title"])
-            sentiment = categorize_news_sentiment(story["text_content"])
+            sentiment = categorize_news_sentiment(story_text_content(story))
             print("Sentiment:", sentiment)
         except SentimentException as e:
             print(e)
             continue
 
-        update_stock_story_sentiment(stock_isin, story["source_url"], sentiment)
+        # label and daily sentiment series together, a story is counted once
+        if not set_stock_story_sentiment(
+            stock_isin, story["source_url"], story_day(story["published_at"]), sentiment
+        ):
+            print("Story was categorized before:", story["source_url"])
+            continue
+        categorized += 1
+    return categorized
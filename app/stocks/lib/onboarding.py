@@ -0,0 +1,145 @@
+"""
+Onboarding of many stocks at once. New ISINs get a meta item, then the
+finanzen.net urls and the tradingview symbol of every stock without them are
+searched ahead of its first import. Each search runs in its own thread pool,
+so the slow search engine does not hold back the symbol search.
+
+The provider buckets keep the pools within the provider rates of this
+process only. They do not coordinate with the import lambdas, which search
+the same providers while imports are running.
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Mapping, NamedTuple
+
+from .constants import StockMetaFields
+from .data import batch_fetch_stock_metas, new_stock_meta_item, put_stock_metas
+from .provider import provider
+from .story_scraper import search_stock_symbol
+from .url import search_fnet_urls
+
+ISIN_PATTERN = re.compile(r"[A-Z]{2}[A-Z0-9]{9}[0-9]")
+
+
+def isin_check_digit_valid(isin: str) -> bool:
+    # luhn over the digits of the ISIN, letters count as 10 to 35
+    digits = "".join(str(int(char, 36)) for char in isin)
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        value = int(digit) * (2 if i % 2 else 1)
+        total += value // 10 + value % 10
+    return total % 10 == 0
+
+
+def parse_isins(lines: Iterable[str]) -> tuple[list[str], list[str]]:
+    """
+    Returns the valid ISINs of the lines without duplicates and the invalid
+    lines, empty lines and # comments are skipped.
+    """
+    isins: dict[str, None] = {}
+    invalid = []
+    for line in lines:
+        isin = line.split("#")[0].strip().upper()
+        if not isin:
+            continue
+        if ISIN_PATTERN.fullmatch(isin) and isin_check_digit_valid(isin):
+            isins[isin] = None
+        else:
+            invalid.append(line.strip())
+    return list(isins), invalid
+
+
+def add_stocks(stock_isins: list[str]) -> tuple[dict[str, dict], int]:
+    # meta items of all stocks by ISIN, returns them and the added stocks
+    metas = batch_fetch_stock_metas(stock_isins)
+    new_items = [
+        new_stock_meta_item(isin) for isin in stock_isins if isin not in metas
+    ]
+    put_stock_metas(new_items)
+    for item in new_items:
+        metas[item["ISIN"]] = item
+    return metas, len(new_items)
+
+
+def search_fnet(stock_isin: str, stock_meta: dict) -> bool:
+    guv_url, estimation_url = search_fnet_urls(stock_isin, stock_meta)
+    return guv_url is not None and estimation_url is not None
+
+
+def search_tradingview(stock_isin: str, stock_meta: dict) -> bool:
+    # raises if no symbol is listed for the ISIN
+    search_stock_symbol(stock_isin, stock_meta)
+    return True
+
+
+def fnet_missing(stock_meta: Mapping) -> bool:
+    # misses waiting for their retry are skipped by the search itself
+    return (
+        stock_meta.get(StockMetaFields.fnet_guv_url.name) is None
+        or stock_meta.get(StockMetaFields.fnet_estimation_url.name) is None
+    )
+
+
+def tradingview_missing(stock_meta: Mapping) -> bool:
+    return stock_meta.get(StockMetaFields.tradingview_symbol.name) is None
+
+
+class PrefetchSearch(NamedTuple):
+    # provider whose circuit stops the search
+    provider: str
+    missing: Callable[[Mapping], bool]
+    search: Callable[[str, dict], bool]
+
+
+# searches of the identifiers, by name
+PREFETCH_SEARCHES = {
+    "fnet": PrefetchSearch("duckduckgo", fnet_missing, search_fnet),
+    "tradingview": PrefetchSearch(
+        "tradingview", tradingview_missing, search_tradingview
+    ),
+}
+
+
+def prefetch_identifiers(
+    metas: Mapping[str, dict], workers: int
+) -> dict[str, dict[str, int]]:
+    """
+    Searches the missing identifiers of the stocks, returns the found, still
+    missing, failed and skipped stocks per search. Failed searches store
+    nothing, searches are skipped while the circuit of their provider is open.
+    Identifiers are stored as they are found, another run continues with the
+    missing, failed and skipped ones.
+    """
+    lock = threading.Lock()
+    stats = {
+        name: {"found": 0, "missing": 0, "failed": 0, "skipped": 0}
+        for name in PREFETCH_SEARCHES
+    }
+
+    def prefetch(name: str, prefetch_search: PrefetchSearch, stock_isin: str):
+        if provider(prefetch_search.provider).breaker.is_open():
+            result = "skipped"
+        else:
+            try:
+                found = prefetch_search.search(stock_isin, metas[stock_isin])
+                result = "found" if found else "missing"
+            except Exception as e:
+                print(f"Error searching {name} of {stock_isin}:", e)
+                result = "failed"
+        with lock:
+            stats[name][result] += 1
+
+    executors = [ThreadPoolExecutor(workers) for _ in PREFETCH_SEARCHES]
+    try:
+        for executor, (name, prefetch_search) in zip(
+            executors, PREFETCH_SEARCHES.items()
+        ):
+            for stock_isin, stock_meta in metas.items():
+                if prefetch_search.missing(stock_meta):
+                    executor.submit(prefetch, name, prefetch_search, stock_isin)
+    finally:
+        for executor in executors:
+            executor.shutdown(wait=True)
+    return stats
@@ -0,0 +1,99 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from typing import Callable
+
+import boto3
+
+# PROFILE=1 profiles every invocation of the handlers, checked once per container
+PROFILE_ENABLED = os.environ.get("PROFILE", "").lower() in ["1", "true"]
+# entries of the printed summary
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "25"))
+# directory or s3://bucket/prefix for the raw profile, summary only if not set,
+# s3 output needs s3:PutObject on the prefix, see profile_bucket in terraform
+PROFILE_OUTPUT = os.environ.get("PROFILE_OUTPUT") or None
+
+
+def profiled(handler: Callable) -> Callable:
+    """
+    Captures a cProfile and a tracemalloc snapshot of each invocation if
+    PROFILE is set, the handler is returned unchanged otherwise.
+    """
+    if not PROFILE_ENABLED:
+        return handler
+
+    handler_name = handler.__module__.rsplit(".", 1)[-1]
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        profile = cProfile.Profile()
+        tracemalloc.start()
+        profile.enable()
+        try:
+            return handler(event, context)
+        finally:
+            profile.disable()
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            try:
+                report_profile(handler_name, context, profile, snapshot, peak)
+            except Exception as e:
+                # never fail the invocation because of the profiler
+                print("Could not write profile:", e)
+
+    return wrapper
+
+
+def profile_summary(
+    profile: cProfile.Profile, snapshot: tracemalloc.Snapshot, peak: int, top: int
+) -> str:
+    output = io.StringIO()
+    stats = pstats.Stats(profile, stream=output)
+    stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+    output.write(f"Peak traced memory: {peak / 1024:.0f} KiB\n")
+    output.write(f"Top {top} allocations still held:\n")
+    for stat in snapshot.statistics("lineno")[:top]:
+        output.write(f"{stat}\n")
+    return output.getvalue()
+
+
+def report_profile(
+    handler_name: str,
+    context,
+    profile: cProfile.Profile,
+    snapshot: tracemalloc.Snapshot,
+    peak: int,
+):
+    print(f"Profile of {handler_name}:\n" + profile_summary(profile, snapshot, peak, PROFILE_TOP))
+    if PROFILE_OUTPUT is None:
+        return
+
+    # open with pstats.Stats and tracemalloc.Snapshot.load
+    request_id = getattr(context, "aws_request_id", "local")
+    name = f"{handler_name}-{int(time.time())}-{request_id}"
+    if PROFILE_OUTPUT.startswith("s3://"):
+        directory = "/tmp"
+    else:
+        directory = PROFILE_OUTPUT
+        os.makedirs(directory, exist_ok=True)
+    paths = [
+        os.path.join(directory, f"{name}.prof"),
+        os.path.join(directory, f"{name}.tracemalloc"),
+    ]
+    profile.dump_stats(paths[0])
+    snapshot.dump(paths[1])
+
+    if PROFILE_OUTPUT.startswith("s3://"):
+        bucket, _, prefix = PROFILE_OUTPUT.removeprefix("s3://").partition("/")
+        s3 = boto3.client("s3")
+        for path in paths:
+            key = "/".join(filter(None, [prefix.strip("/"), os.path.basename(path)]))
+            s3.upload_file(path, bucket, key)
+            os.remove(path)
+    print("Profile written to", PROFILE_OUTPUT, name)
@@ -0,0 +1,317 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, TypedDict, TypeVar, cast
+
+import requests
+
+from .metrics import count
+
+T = TypeVar("T")
+
+ProviderConfig = TypedDict(
+    "ProviderConfig",
+    {
+        # requests per second and burst size of the token bucket
+        "rate": float,
+        "burst": float,
+        # seconds per request
+        "timeout": float,
+        "retries": int,
+        # longest backoff between retries, longer retry-after waits fail
+        "max_backoff": float,
+        # seconds a call may take with its retries, below the lambda timeout
+        "deadline": float,
+        # consecutive failures opening the circuit and seconds it stays open
+        "failure_threshold": int,
+        "cooldown": float,
+    },
+)
+
+# limits of each external provider, override with env PROVIDER_<NAME>_<KEY>
+PROVIDERS: dict[str, ProviderConfig] = {
+    "scrappey": {
+        "rate": 0.5,
+        "burst": 2,
+        "timeout": 90,
+        "retries": 2,
+        "max_backoff": 20,
+        "deadline": 200,
+        "failure_threshold": 3,
+        "cooldown": 300,
+    },
+    "duckduckgo": {
+        "rate": 0.2,
+        "burst": 1,
+        "timeout": 15,
+        "retries": 2,
+        "max_backoff": 20,
+        "deadline": 60,
+        "failure_threshold": 3,
+        "cooldown": 600,
+    },
+    "openai": {
+        "rate": 1,
+        "burst": 3,
+        "timeout": 60,
+        "retries": 2,
+        "max_backoff": 20,
+        "deadline": 150,
+        "failure_threshold": 3,
+        "cooldown": 120,
+    },
+    "huggingface": {
+        "rate": 1,
+        "burst": 3,
+        "timeout": 60,
+        "retries": 3,
+        "max_backoff": 30,
+        "deadline": 240,
+        "failure_threshold": 5,
+        "cooldown": 120,
+    },
+    "tradingview": {
+        "rate": 2,
+        "burst": 5,
+        "timeout": 20,
+        "retries": 2,
+        "max_backoff": 10,
+        "deadline": 60,
+        "failure_threshold": 5,
+        "cooldown": 120,
+    },
+}
+
+# first backoff step, doubled on each retry
+BACKOFF_BASE = 1.0
+
+
+class ProviderException(Exception):
+    pass
+
+
+class RetryableProviderException(ProviderException):
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ProviderUnavailableException(ProviderException):
+    pass
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = burst
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # takes a token ahead, then waits until it was refilled
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            self.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures, calls then fail fast until the cooldown
+    passed. It is half open then and lets a single probe call through, the
+    probe closes it again or opens it for another cooldown.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        cooldown: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def _open(self) -> bool:
+        return self.opened_at is not None and (
+            self.probing or self.clock() - self.opened_at < self.cooldown
+        )
+
+    def is_open(self) -> bool:
+        # open during the cooldown and while the probe runs
+        with self.lock:
+            return self._open()
+
+    def allow(self) -> bool:
+        # whether a call may run, the first call after the cooldown probes
+        with self.lock:
+            if self._open():
+                return False
+            self.probing = self.opened_at is not None
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self.probing = False
+
+
+class Provider:
+    def __init__(
+        self,
+        name: str,
+        config: ProviderConfig,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.name = name
+        self.config = config
+        self.clock = clock
+        self.sleep = sleep
+        self.bucket = TokenBucket(config["rate"], config["burst"], clock, sleep)
+        self.breaker = CircuitBreaker(
+            config["failure_threshold"], config["cooldown"], clock
+        )
+
+    def call(
+        self,
+        fn: Callable[..., T],
+        *args,
+        retry_on: tuple[type[Exception], ...] = (),
+        **kwargs,
+    ) -> T:
+        """
+        Calls fn rate limited and retries it with jittered exponential backoff
+        on RetryableProviderException, connection errors and retry_on errors.
+        A retry only starts if it can time out before the call deadline.
+        """
+        retryable: tuple[type[Exception], ...] = (
+            RetryableProviderException,
+            requests.ConnectionError,
+            requests.Timeout,
+        ) + retry_on
+
+        if not self.breaker.allow():
+            raise ProviderUnavailableException(f"{self.name} is unavailable")
+
+        started_at = self.clock()
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            count(f"{self.name}_calls")
+            try:
+                result = fn(*args, **kwargs)
+            except retryable as e:
+                count(f"{self.name}_failures")
+                backoff = random.uniform(0, BACKOFF_BASE * 2**attempt)
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is not None:
+                    backoff = max(backoff, retry_after)
+                elapsed = self.clock() - started_at
+                if (
+                    attempt >= self.config["retries"]
+                    or backoff > self.config["max_backoff"]
+                    or elapsed + backoff + self.config["timeout"]
+                    > self.config["deadline"]
+                ):
+                    # one failure per call, retries are not counted
+                    self.breaker.record_failure()
+                    raise
+                print(f"Retry {self.name} in {backoff:.1f}s:", e)
+                count(f"{self.name}_retries")
+                self.sleep(backoff)
+                attempt += 1
+                continue
+            except Exception:
+                # the provider answered, the error is the caller's
+                self.breaker.record_success()
+                raise
+
+            self.breaker.record_success()
+            return result
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.config["timeout"])
+        response = self.call(send_request, method, url, **kwargs)
+        count(f"{self.name}_bytes", len(response.content))
+        return response
+
+
+def send_request(method: str, url: str, **kwargs) -> requests.Response:
+    response = requests.request(method, url, **kwargs)
+    # rate limited or provider error, worth another try
+    if response.status_code == 429 or response.status_code >= 500:
+        retry_after = response.headers.get("Retry-After")
+        # drop query, it can contain api keys
+        raise RetryableProviderException(
+            f"{method} {url.split('?')[0]} failed with status {response.status_code}",
+            float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+    return response
+
+
+def provider_config(name: str) -> ProviderConfig:
+    config: dict[str, Any] = dict(PROVIDERS[name])
+    for key in config:
+        env_value = os.environ.get(f"PROVIDER_{name}_{key}".upper())
+        if env_value is not None:
+            config[key] = float(env_value)
+    config["retries"] = int(config["retries"])
+    config["failure_threshold"] = int(config["failure_threshold"])
+
+    # concurrent import workers share the provider rate
+    workers = int(os.environ.get("IMPORT_WORKER_CONCURRENCY", "1"))
+    config["rate"] = config["rate"] / workers
+    return cast(ProviderConfig, config)
+
+
+providers: dict[str, Provider] = {}
+providers_lock = threading.Lock()
+
+
+def provider(name: str) -> Provider:
+    # one provider state per lambda container
+    with providers_lock:
+        if name not in providers:
+            providers[name] = Provider(name, provider_config(name))
+        return providers[name]
+
+
+def call_provider(name: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    return provider(name).call(fn, *args, **kwargs)
+
+
+def provider_request(name: str, method: str, url: str, **kwargs) -> requests.Response:
+    return provider(name).request(method, url, **kwargs)
+
+
+def provider_timeout(name: str) -> float:
+    return provider(name).config["timeout"]
@@ -0,0 +1,108 @@
+"""
+Percentile ranks of the ranked metrics across all stocks of a year, computed
+from the screen table by a batch job and stored with the stock data items, so
+get_stocks_data returns them with the raw values.
+
+A rank is the share of stocks with a lower value plus half of the ones with
+the same value, in percent. <metric>Rank compares a stock with all stocks,
+<metric>CurrencyRank with the stocks reporting in the same currency.
+"""
+
+from decimal import Decimal
+from typing import Mapping, Sequence
+
+import numpy as np
+
+from .constants import ranked_fields, stock_rank_fields
+from .data import scan_stock_ranks, scan_stock_screen, update_stock_ranks
+
+# smaller currency groups are not ranked
+RANK_MIN_GROUP = 5
+
+StockYear = tuple[str, int]
+
+
+def percentile_ranks(values: np.ndarray) -> np.ndarray:
+    # rank of each value among the values which are no nan, nan stays nan
+    ranks = np.full(len(values), np.nan)
+    valid = ~np.isnan(values)
+    count = np.count_nonzero(valid)
+    if not count:
+        return ranks
+
+    sorted_values = np.sort(values[valid])
+    lower = np.searchsorted(sorted_values, values[valid], side="left")
+    lower_or_equal = np.searchsorted(sorted_values, values[valid], side="right")
+    ranks[valid] = (lower + lower_or_equal) / 2 / count * 100
+    return ranks
+
+
+def compute_ranks(screen_items: Sequence[Mapping]) -> dict[StockYear, dict[str, Decimal]]:
+    """
+    Returns the ranks of each stock year of the screen items, stock years
+    without a ranked metric are left out.
+    """
+    by_year: dict[int, list[Mapping]] = {}
+    for item in screen_items:
+        by_year.setdefault(int(item["Year"]), []).append(item)
+
+    ranks: dict[StockYear, dict[str, Decimal]] = {}
+    for year, items in by_year.items():
+        currencies = np.array([item.get("Currency", "") for item in items], dtype=object)
+        groups = [
+            currencies == currency
+            for currency in set(currencies.tolist()) - {""}
+            if np.count_nonzero(currencies == currency) >= RANK_MIN_GROUP
+        ]
+        for field in ranked_fields:
+            values = np.array(
+                [float(item[field]) if field in item else np.nan for item in items]
+            )
+            field_ranks = {f"{field}Rank": percentile_ranks(values)}
+            currency_ranks = np.full(len(items), np.nan)
+            for group in groups:
+                currency_ranks[group] = percentile_ranks(values[group])
+            field_ranks[f"{field}CurrencyRank"] = currency_ranks
+
+            for name, values_ranks in field_ranks.items():
+                for item, rank in zip(items, values_ranks.tolist()):
+                    if np.isnan(rank):
+                        continue
+                    stock_ranks = ranks.setdefault((item["ISIN"], year), {})
+                    stock_ranks[name] = Decimal(f"{rank:.1f}")
+    return ranks
+
+
+def rank_updates(
+    ranks: Mapping[StockYear, Mapping[str, Decimal]],
+    stored_items: Sequence[Mapping],
+) -> list[tuple[StockYear, dict[str, Decimal], list[str]]]:
+    """
+    Compares the ranks with the stored ones, returns the changed ranks and
+    the ranks to remove of each stock year which needs an update.
+    """
+    stored_ranks = {
+        (item["ISIN"], int(item["Year"])): {
+            key: item[key] for key in stock_rank_fields if key in item
+        }
+        for item in stored_items
+    }
+    updates = []
+    for stock_year in sorted(stored_ranks.keys() | ranks.keys()):
+        new = ranks.get(stock_year, {})
+        stored = stored_ranks.get(stock_year, {})
+        changed = {key: value for key, value in new.items() if stored.get(key) != value}
+        removed = [key for key in stored if key not in new]
+        if len(changed) or len(removed):
+            updates.append((stock_year, changed, removed))
+    return updates
+
+
+def update_all_ranks() -> int:
+    # recomputes the ranks of all stocks, returns the updated stock years
+    ranks = compute_ranks(scan_stock_screen())
+    updates = rank_updates(ranks, scan_stock_ranks())
+    for (stock_isin, year), changed, removed in updates:
+        update_stock_ranks(stock_isin, year, changed, removed)
+    print(f"Updated ranks of {len(updates)} stock years")
+    return len(updates)
@@ -0,0 +1,118 @@
+import math
+from datetime import datetime, timezone
+
+from decimal import Decimal
+
+from .constants import ImportSource, SourceStatus, StockMetaFields
+from .data import scan_stock_meta
+
+# each doubling of reads since the last import adds this much priority
+DEMAND_WEIGHT = 0.5
+# imports that did not change any data are repeated less often
+UNCHANGED_FACTOR = 0.5
+# stocks below this priority are not due for an import yet
+DUE_PRIORITY = 1.0
+# first retry of a failed source after an hour, doubled on each failure
+SOURCE_RETRY_BASE = 60 * 60
+SOURCE_RETRY_MAX = 7 * 24 * 60 * 60
+
+
+def import_priority(meta_item: dict, now: float) -> float:
+    """
+    Priority of importing a stock, higher is more urgent. Combines days since
+    the last import with the reads since then and whether the last import
+    changed anything. Never imported stocks come first.
+    """
+    last_import = float(meta_item.get(StockMetaFields.last_import.name, 0))
+    if last_import == 0:
+        return math.inf
+
+    staleness_days = max(now - last_import, 0) / (24 * 60 * 60)
+    demand = int(meta_item.get(StockMetaFields.demand_count.name, 0))
+    priority = staleness_days * (1 + DEMAND_WEIGHT * math.log2(1 + demand))
+    if not meta_item.get(StockMetaFields.last_import_changed.name, True):
+        priority *= UNCHANGED_FACTOR
+
+    return priority
+
+
+def rank_stock_imports(meta_items: list[dict], now: float) -> list[str]:
+    # highest priority first, oldest import breaks ties
+    ranked = sorted(
+        meta_items,
+        key=lambda item: (
+            -import_priority(item, now),
+            item.get(StockMetaFields.last_import.name, 0),
+        ),
+    )
+    return [item["ISIN"] for item in ranked]
+
+
+def next_source_status(
+    previous: SourceStatus | None, succeeded: bool, now: float, changed: int = 0
+) -> SourceStatus:
+    if succeeded:
+        return {
+            "status": "ok",
+            "at": Decimal(str(now)),
+            "failures": 0,
+            "changed": changed,
+        }
+
+    failures = 1
+    if previous is not None and previous["status"] == "failed":
+        failures = int(previous["failures"]) + 1
+    backoff = min(SOURCE_RETRY_BASE * 2 ** (failures - 1), SOURCE_RETRY_MAX)
+    return {
+        "status": "failed",
+        "at": Decimal(str(now)),
+        "failures": failures,
+        "retry_at": Decimal(str(now + backoff)),
+    }
+
+
+def retry_sources(meta_item: dict, now: float) -> list[str]:
+    # failed sources whose retry is due
+    statuses: dict = meta_item.get(StockMetaFields.source_status.name, {})
+    return [
+        source.name
+        for source in ImportSource
+        if source.name in statuses
+        and statuses[source.name]["status"] == "failed"
+        and float(statuses[source.name]["retry_at"]) <= now
+    ]
+
+
+def due_import_jobs(
+    meta_items: list[dict], now: float, count: int
+) -> list[tuple[str, list[str] | None]]:
+    """
+    Returns (ISIN, sources) of due imports, sources None for a full import.
+    Retries of failed sources come first, then full imports by priority.
+    """
+    due_items = [
+        item for item in meta_items if import_priority(item, now) >= DUE_PRIORITY
+    ]
+    due_isins = set(item["ISIN"] for item in due_items)
+
+    jobs: list[tuple[str, list[str] | None]] = []
+    for item in meta_items:
+        sources = retry_sources(item, now)
+        # full import retries the sources anyway
+        if len(sources) and item["ISIN"] not in due_isins:
+            jobs.append((item["ISIN"], sources))
+
+    jobs.extend((isin, None) for isin in rank_stock_imports(due_items, now))
+    return jobs[:count]
+
+
+def fetch_due_import_jobs(count: int) -> list[tuple[str, list[str] | None]]:
+    meta_items = scan_stock_meta()
+    now = datetime.now(timezone.utc).timestamp()
+    return due_import_jobs(meta_items, now, count)
+
+
+def fetch_next_stock_metas(count: int) -> list[str]:
+    meta_items = scan_stock_meta()
+    now = datetime.now(timezone.utc).timestamp()
+    return rank_stock_imports(meta_items, now)[:count]
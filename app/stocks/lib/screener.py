@@ -0,0 +1,374 @@
+"""
+Screener over the latest completed metrics of all stocks.
+
+The screen table holds an item per ISIN and year with the completed metrics as
+numbers, it is written after each import. ScreenIndex keeps them in memory as
+one matrix per metric, with a row per ISIN and a column per year, so filters
+and sort keys are evaluated on whole columns.
+
+Conditions compare a metric of the screened year, or of a year relative to it
+with @+1 or @-1, against a number or another metric:
+  KGV<12,DividendYield>3,EarningsPerShare@+1>EarningsPerShare
+"""
+
+import csv
+import io
+import math
+import operator
+import re
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Mapping, NamedTuple, Sequence
+
+import numpy as np
+
+from .constants import StockDataKey, screen_fields
+from .data import (
+    put_stock_screen_items,
+    query_stock_screen_updates,
+    scan_stock_screen,
+)
+from .helper import parse_value, text_to_float
+from .stock_rows import StockColumns, complete_stock_rows
+
+# seconds a warm container screens on its index before reading newer items
+SCREEN_REFRESH_INTERVAL = 60
+# items written while the last refresh was running are read again
+SCREEN_REFRESH_OVERLAP = 60
+SCREEN_LIMIT = 50
+SCREEN_MAX_LIMIT = 500
+
+# metrics whose text names the currency of a stock year, in this order
+CURRENCY_FIELDS = [
+    StockDataKey.EARNINGS_PER_SHARE.value,
+    StockDataKey.PRICE_PER_SHARE.value,
+    StockDataKey.BOOK_PER_SHARE.value,
+    StockDataKey.DIVIDEND_PER_SHARE.value,
+    StockDataKey.SALES.value,
+]
+
+OPERATORS: dict[str, Callable[[Any, Any], Any]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "=": operator.eq,
+}
+CONDITION_PATTERN = re.compile(r"\s*([\w@+-]+?)\s*(<=|>=|<|>|=)\s*(\S+)\s*")
+METRIC_PATTERN = re.compile(r"(\w+)(?:@([+-]?\d+))?")
+
+
+class ScreenException(Exception):
+    pass
+
+
+class Metric(NamedTuple):
+    field: str
+    # years after the screened year
+    offset: int = 0
+
+
+class Condition(NamedTuple):
+    metric: Metric
+    op: str
+    other: Metric | float
+
+
+class ScreenQuery(NamedTuple):
+    conditions: list[Condition]
+    year: int
+    sort: Metric | None = None
+    descending: bool = False
+    limit: int = SCREEN_LIMIT
+
+
+def parse_metric(text: str) -> Metric:
+    match = METRIC_PATTERN.fullmatch(text.strip())
+    if match is None or match.group(1) not in screen_fields:
+        raise ScreenException(f"Unknown metric {text}, use one of {screen_fields}")
+    field, offset = match.groups()
+    return Metric(field, int(offset or 0))
+
+
+def parse_operand(text: str) -> Metric | float:
+    if METRIC_PATTERN.fullmatch(text) and not text[0].isdigit():
+        return parse_metric(text)
+    try:
+        value = float(text)
+    except ValueError:
+        raise ScreenException(f"Invalid value {text}, use a number or a metric")
+    if not math.isfinite(value):
+        raise ScreenException(f"Invalid value {text}, use a number or a metric")
+    return value
+
+
+def parse_conditions(text: str) -> list[Condition]:
+    # KGV<12,DividendYield>3 => [(KGV, <, 12), (DividendYield, >, 3)]
+    conditions = []
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        match = CONDITION_PATTERN.fullmatch(part)
+        if match is None:
+            raise ScreenException(f"Invalid filter {part}, use <metric><op><value>")
+        metric, op, other = match.groups()
+        conditions.append(Condition(parse_metric(metric), op, parse_operand(other)))
+    return conditions
+
+
+def parse_screen_query(query: Mapping[str, str], current_year: int) -> ScreenQuery:
+    """
+    Reads the screener parameters:
+    filter=KGV<12,DividendYield>3&sort=-DividendYield&limit=50&year=2024
+    """
+    conditions = parse_conditions(query.get("filter", ""))
+
+    sort = None
+    descending = False
+    sort_text = query.get("sort", "").strip()
+    if sort_text:
+        descending = sort_text.startswith("-")
+        sort = parse_metric(sort_text.lstrip("+-"))
+
+    try:
+        limit = int(query.get("limit", SCREEN_LIMIT))
+        year = int(query.get("year", current_year))
+    except ValueError:
+        raise ScreenException("Invalid limit or year, use a number")
+    if not 0 < limit <= SCREEN_MAX_LIMIT:
+        raise ScreenException(f"Invalid limit, use 1 to {SCREEN_MAX_LIMIT}")
+
+    return ScreenQuery(conditions, year, sort, descending, limit)
+
+
+def screen_items(
+    stock_isin: str, data: Sequence[Mapping], updated_at: float
+) -> list[dict]:
+    """
+    Completes the stored stock items and returns a screen item per year with
+    the metrics which are numbers and the currency of the year if known.
+    """
+    years, columns = complete_stock_rows(data)
+    return completed_screen_items(stock_isin, years, columns, updated_at)
+
+
+def completed_screen_items(
+    stock_isin: str,
+    years: Sequence[Any],
+    columns: StockColumns,
+    updated_at: float,
+) -> list[dict]:
+    # screen items of completed columns
+    items = []
+    for i, year in enumerate(years):
+        item: dict[str, Any] = {
+            "ISIN": stock_isin,
+            "Year": year,
+            "updated_at": Decimal(str(updated_at)),
+        }
+        for field in screen_fields:
+            if field not in columns:
+                continue
+            value = text_to_float(columns[field][i])
+            if value is not None and math.isfinite(value):
+                item[field] = Decimal(str(value))
+        for field in CURRENCY_FIELDS:
+            currency = parse_value(columns[field][i]).currency if field in columns else None
+            if currency is not None:
+                item["Currency"] = currency
+                break
+        items.append(item)
+    return items
+
+
+def update_stock_screen(
+    stock_isin: str,
+    years: Sequence[Any],
+    columns: StockColumns,
+) -> int:
+    # screen items of the imported stock, returns the written years
+    items = completed_screen_items(
+        stock_isin, years, columns, datetime.now(timezone.utc).timestamp()
+    )
+    put_stock_screen_items(items)
+    return len(items)
+
+
+def update_changed_stock_screen(
+    stock_isin: str, initial_data: Sequence[Mapping], data: Sequence[Mapping]
+) -> int:
+    """
+    Writes the screen items of the years whose screen values differ between
+    the stored items before and after an import, returns the written years.
+    """
+    updated_at = datetime.now(timezone.utc).timestamp()
+    initial_items = {
+        item["Year"]: item for item in screen_items(stock_isin, initial_data, updated_at)
+    }
+    items = [
+        item
+        for item in screen_items(stock_isin, data, updated_at)
+        if initial_items.get(item["Year"]) != item
+    ]
+    put_stock_screen_items(items)
+    return len(items)
+
+
+class ScreenIndex:
+    """
+    Metrics of all stocks as a float matrix per metric, rows are the ISINs in
+    the order they were added and columns the years from first_year on.
+    Missing metrics are nan and never match a condition.
+    """
+
+    def __init__(self):
+        self.isins = np.array([], dtype=object)
+        self.positions: dict[str, int] = {}
+        self.first_year = 0
+        self.values: dict[str, np.ndarray] = {
+            field: np.empty((0, 0)) for field in screen_fields
+        }
+        # newest updated_at of the added items
+        self.updated_at: Decimal | None = None
+        self.refreshed_at = -math.inf
+
+    def year_count(self) -> int:
+        return self.values[screen_fields[0]].shape[1]
+
+    def grow(self, isins: list[str], first_year: int, last_year: int):
+        # add rows for new stocks and columns for new years
+        if len(self.positions):
+            first_year = min(first_year, self.first_year)
+            last_year = max(last_year, self.first_year + self.year_count() - 1)
+        shape = (len(self.positions) + len(isins), last_year - first_year + 1)
+        if shape == self.values[screen_fields[0]].shape:
+            return
+
+        offset = self.first_year - first_year
+        for field in screen_fields:
+            old = self.values[field]
+            values = np.full(shape, np.nan)
+            values[: old.shape[0], offset : offset + old.shape[1]] = old
+            self.values[field] = values
+        for isin in isins:
+            self.positions[isin] = len(self.positions)
+        self.isins = np.concatenate([self.isins, np.array(isins, dtype=object)])
+        self.first_year = first_year
+
+    def add_items(self, items: Sequence[Mapping]):
+        """
+        Writes screen items into the index, an item replaces all metrics of
+        its stock year.
+        """
+        if not len(items):
+            return
+
+        years = [int(item["Year"]) for item in items]
+        new_isins = list(
+            dict.fromkeys(
+                item["ISIN"] for item in items if item["ISIN"] not in self.positions
+            )
+        )
+        self.grow(new_isins, min(years), max(years))
+
+        rows = [self.positions[item["ISIN"]] for item in items]
+        columns = [year - self.first_year for year in years]
+        for field in screen_fields:
+            self.values[field][rows, columns] = [
+                float(item[field]) if field in item else math.nan for item in items
+            ]
+
+        updated_at = max(Decimal(item.get("updated_at", 0)) for item in items)
+        if self.updated_at is None or updated_at > self.updated_at:
+            self.updated_at = updated_at
+
+    def column(self, metric: Metric, year: int) -> np.ndarray:
+        # metric of every stock in a year, nan for years out of the index
+        column = year + metric.offset - self.first_year
+        if not 0 <= column < self.year_count():
+            return np.full(len(self.isins), np.nan)
+        return self.values[metric.field][:, column]
+
+    def screen(self, query: ScreenQuery) -> np.ndarray:
+        """
+        Returns the positions of the stocks matching all conditions, sorted by
+        ISIN or the sort metric with missing values last.
+        """
+        mask = np.ones(len(self.isins), dtype=bool)
+        for condition in query.conditions:
+            other = condition.other
+            other_values = (
+                self.column(other, query.year) if isinstance(other, Metric) else other
+            )
+            mask &= OPERATORS[condition.op](
+                self.column(condition.metric, query.year), other_values
+            )
+
+        positions = np.flatnonzero(mask)
+        positions = positions[np.argsort(self.isins[positions], kind="stable")]
+        if query.sort is not None:
+            keys = self.column(query.sort, query.year)[positions]
+            if query.descending:
+                keys = -keys
+            positions = positions[np.argsort(keys, kind="stable")]
+        return positions[: query.limit]
+
+
+# index of a warm container, refreshed with the items written since
+screen_index = ScreenIndex()
+
+
+def current_screen_index() -> ScreenIndex:
+    now = time.monotonic()
+    if now - screen_index.refreshed_at >= SCREEN_REFRESH_INTERVAL:
+        # full scan on a cold start, then only the items written since
+        if screen_index.updated_at is None:
+            screen_index.add_items(scan_stock_screen())
+        else:
+            screen_index.add_items(
+                query_stock_screen_updates(
+                    screen_index.updated_at - SCREEN_REFRESH_OVERLAP
+                )
+            )
+        screen_index.refreshed_at = now
+    return screen_index
+
+
+def screen_metrics(query: ScreenQuery) -> list[Metric]:
+    # metrics of the conditions and the sort, in this order
+    metrics: list[Metric] = []
+    for condition in query.conditions:
+        metrics.append(condition.metric)
+        if isinstance(condition.other, Metric):
+            metrics.append(condition.other)
+    if query.sort is not None:
+        metrics.append(query.sort)
+    return list(dict.fromkeys(metrics))
+
+
+def metric_name(metric: Metric) -> str:
+    if metric.offset:
+        return f"{metric.field}@{metric.offset:+d}"
+    return metric.field
+
+
+def screen_to_csv(index: ScreenIndex, positions: np.ndarray, query: ScreenQuery) -> str:
+    # one row per stock with the screened metrics
+    metrics = screen_metrics(query)
+    columns = [index.column(metric, query.year)[positions].tolist() for metric in metrics]
+
+    output_csv = io.StringIO()
+    writer = csv.writer(
+        output_csv, delimiter=";", quoting=csv.QUOTE_ALL, lineterminator="\n"
+    )
+    writer.writerow(["ISIN"] + [metric_name(metric) for metric in metrics])
+    for i, isin in enumerate(index.isins[positions].tolist()):
+        writer.writerow(
+            [isin]
+            + [
+                "" if math.isnan(values[i]) else str(values[i]).replace(".", ",")
+                for values in columns
+            ]
+        )
+    return output_csv.getvalue()
@@ -0,0 +1,96 @@
+import csv
+import io
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from .constants import NewsSentiment, StockSentimentItem
+from .data import (
+    fetch_stock_stories,
+    fetch_stock_sentiment_counts,
+    put_stock_sentiment_counts,
+    story_day,
+)
+
+SENTIMENT_INTERVALS = ["day", "week"]
+
+
+def build_sentiment_series(stock_isin: str) -> None:
+    """
+    Rebuilds the daily sentiment counts of a stock from its categorized stories.
+    """
+    stories = fetch_stock_stories(stock_isin)
+    day_counts: dict[str, Counter[str]] = {}
+    for story in stories:
+        sentiment = story.get("sentiment")
+        if sentiment not in [s.value for s in NewsSentiment]:
+            continue
+        day = story_day(story["published_at"])
+        day_counts.setdefault(day, Counter())[sentiment] += 1
+
+    items: list[StockSentimentItem] = [
+        {
+            "ISIN": stock_isin,
+            "Day": day,
+            "positive": Decimal(counts[NewsSentiment.POSITIVE.value]),
+            "neutral": Decimal(counts[NewsSentiment.NEUTRAL.value]),
+            "negative": Decimal(counts[NewsSentiment.NEGATIVE.value]),
+        }
+        for day, counts in day_counts.items()
+    ]
+    print(f"Write {len(items)} sentiment days for:", stock_isin)
+    put_stock_sentiment_counts(items)
+
+
+# only YYYY-MM-DD, the days are compared as text in the range query
+def parse_series_day(day: str) -> str:
+    parsed = datetime.strptime(day, "%Y-%m-%d").date().isoformat()
+    if parsed != day:
+        raise ValueError(f"Invalid day {day}")
+    return parsed
+
+
+# start of the interval: 2024-06-06 -> 2024-06-03 (monday) for weeks
+def interval_start(day: str, interval: str) -> str:
+    if interval == "week":
+        day_date = date.fromisoformat(day)
+        return (day_date - timedelta(days=day_date.weekday())).isoformat()
+    return day
+
+
+def sentiment_series(
+    stock_isin: str,
+    from_day: str | None = None,
+    to_day: str | None = None,
+    interval: str = "day",
+) -> list[list]:
+    """
+    Returns sentiment counts per interval sorted by date, rows have the format
+    [date, positive, neutral, negative].
+    """
+    items = fetch_stock_sentiment_counts(stock_isin, from_day, to_day)
+    series: dict[str, list] = {}
+    # items are sorted by day
+    for item in items:
+        start = interval_start(item["Day"], interval)
+        row = series.setdefault(start, [start, 0, 0, 0])
+        row[1] += int(item.get("positive", 0))
+        row[2] += int(item.get("neutral", 0))
+        row[3] += int(item.get("negative", 0))
+
+    return list(series.values())
+
+
+def sentiment_series_to_csv(series: list[list], interval: str = "day") -> str:
+    output_csv = io.StringIO()
+    writer = csv.writer(output_csv, quoting=csv.QUOTE_ALL, delimiter=";")
+    writer.writerow(
+        [
+            interval.capitalize(),
+            NewsSentiment.POSITIVE.value,
+            NewsSentiment.NEUTRAL.value,
+            NewsSentiment.NEGATIVE.value,
+        ]
+    )
+    writer.writerows(series)
+    return output_csv.getvalue()
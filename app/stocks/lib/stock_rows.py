@@ -0,0 +1,235 @@
+"""
+Completion and csv export of stored stock items without pandas, for the read
+lambdas. Returns the same csv as data_completer.complete_stock_df and
+stock_df_to_csv.
+
+Values of a column are a list by year. Missing values are math.nan, which
+plays the part of np.nan in data_completer: it is not a valid number, while
+other NaN are. Like pandas, columns holding only NaN, None and floats become
+float columns, where every missing value is such another NaN.
+"""
+
+import csv
+import io
+import math
+from typing import Any, Mapping, Sequence, TypeGuard
+
+from .constants import (
+    STOCK_CSV_YEARS_AFTER,
+    STOCK_CSV_YEARS_BEFORE,
+    StockDataKey,
+    stock_csv_fields,
+    stock_rank_fields,
+)
+from .helper import parse_value, text_to_float
+
+StockColumns = dict[str, list[Any]]
+
+# missing value of float columns, unlike math.nan a valid number
+FLOAT_NAN = float("nan")
+
+
+def is_valid_float(value) -> TypeGuard[float]:
+    return value is not None and value is not math.nan and value != 0
+
+
+def is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def set_column(columns: StockColumns, key: str, values: list[Any]):
+    if all(value is None or isinstance(value, float) for value in values) and any(
+        isinstance(value, float) for value in values
+    ):
+        values = [FLOAT_NAN if is_missing(value) else value for value in values]
+    columns[key] = values
+
+
+def ffill(values: list[Any]) -> list[Any]:
+    filled = []
+    last = None
+    for value in values:
+        if is_missing(value):
+            value = value if last is None else last
+        else:
+            last = value
+        filled.append(value)
+    return filled
+
+
+def calculate_stock_count(columns: StockColumns):
+    if StockDataKey.STOCK_COUNT.value in columns:
+        # drop stupid 0 values
+        stock_counts = [
+            math.nan if value is not None and value == 0 else value
+            for value in columns[StockDataKey.STOCK_COUNT.value]
+        ]
+        set_column(columns, StockDataKey.STOCK_COUNT.value, stock_counts)
+        columns[StockDataKey.STOCK_COUNT.value] = ffill(
+            columns[StockDataKey.STOCK_COUNT.value]
+        )
+
+
+def calculate_pps(columns: StockColumns):
+    if (
+        StockDataKey.EARNINGS_PER_SHARE.value not in columns
+        or StockDataKey.KGV.value not in columns
+    ):
+        return
+
+    pps_list: list[str | float] = []
+    for eps_value, kgv_value in zip(
+        columns[StockDataKey.EARNINGS_PER_SHARE.value],
+        columns[StockDataKey.KGV.value],
+    ):
+        eps_parsed = parse_value(eps_value)
+        EPS = eps_parsed.value
+        KGV = text_to_float(kgv_value)
+        if is_valid_float(EPS) and is_valid_float(KGV):
+            PPS = EPS * KGV
+            pps_list.append(f"{PPS:.2f} {eps_parsed.currency}")
+        else:
+            pps_list.append(math.nan)
+
+    if len(pps_list):
+        set_column(columns, StockDataKey.PRICE_PER_SHARE.value, pps_list)
+
+
+def calculate_kbv(columns: StockColumns, years: int):
+    if (
+        StockDataKey.BOOK_PER_SHARE.value not in columns
+        or StockDataKey.PRICE_PER_SHARE.value not in columns
+    ):
+        return
+
+    kbv_values = columns.get(StockDataKey.KBV.value, [math.nan] * years)
+    kbv_list = []
+    for KBV, bps_value, pps_value in zip(
+        kbv_values,
+        columns[StockDataKey.BOOK_PER_SHARE.value],
+        columns[StockDataKey.PRICE_PER_SHARE.value],
+    ):
+        BPS = text_to_float(bps_value)
+        PPS = text_to_float(pps_value)
+        if is_valid_float(BPS) and is_valid_float(PPS):
+            KBV = float("{:.2f}".format(PPS / BPS))
+        kbv_list.append(KBV)
+
+    if len(kbv_list):
+        set_column(columns, StockDataKey.KBV.value, kbv_list)
+
+
+def calculate_sps(columns: StockColumns):
+    if (
+        StockDataKey.SALES_PER_SHARE.value not in columns
+        or StockDataKey.SALES.value not in columns
+        or StockDataKey.STOCK_COUNT.value not in columns
+    ):
+        return
+
+    sps_list = []
+    for sps_value, sales, stock_count in zip(
+        columns[StockDataKey.SALES_PER_SHARE.value],
+        columns[StockDataKey.SALES.value],
+        columns[StockDataKey.STOCK_COUNT.value],
+    ):
+        sales_value, sales_curr, _, _ = parse_value(sales)
+        stock_count_value = text_to_float(stock_count)
+        if (
+            is_valid_float(sales_value)
+            and is_valid_float(stock_count_value)
+            and sales_curr is not None
+        ):
+            sps_value = f"{sales_value / stock_count_value:.2f} {sales_curr}"
+        sps_list.append(sps_value)
+
+    if len(sps_list):
+        set_column(columns, StockDataKey.SALES_PER_SHARE.value, sps_list)
+
+
+def calculate_kuv(columns: StockColumns, years: int):
+    if (
+        StockDataKey.PRICE_PER_SHARE.value not in columns
+        or StockDataKey.SALES_PER_SHARE.value not in columns
+    ):
+        return
+
+    kuv_values = columns.get(StockDataKey.KUV.value, [math.nan] * years)
+    kuv_list = []
+    for kuv_value, sps, pps in zip(
+        kuv_values,
+        columns[StockDataKey.SALES_PER_SHARE.value],
+        columns[StockDataKey.PRICE_PER_SHARE.value],
+    ):
+        sps_value = text_to_float(sps)
+        pps_value = text_to_float(pps)
+        if is_valid_float(sps_value) and is_valid_float(pps_value):
+            kuv_value = float("{:.2f}".format(pps_value / sps_value))
+        kuv_list.append(kuv_value)
+
+    if len(kuv_list):
+        set_column(columns, StockDataKey.KUV.value, kuv_list)
+
+
+def complete_stock_rows(data: Sequence[Mapping]) -> tuple[list[Any], StockColumns]:
+    """
+    Calculates missing values of the stored stock items, returns the years and
+    the values of each column by year.
+    """
+    years = [item["Year"] for item in data]
+    columns: StockColumns = {}
+    for item in data:
+        for key in item:
+            if key != "Year" and key not in columns:
+                set_column(columns, key, [other.get(key, math.nan) for other in data])
+
+    calculate_stock_count(columns)
+    calculate_pps(columns)
+    calculate_kbv(columns, len(years))
+    calculate_sps(columns)
+    calculate_kuv(columns, len(years))
+    # forward fill missing values
+    for key in columns:
+        columns[key] = ffill(columns[key])
+
+    return years, columns
+
+
+def stock_rank_columns(data: Sequence[Mapping]) -> StockColumns:
+    # stored percentile ranks by year, not filled like the completed values
+    return {
+        field: [item.get(field, math.nan) for item in data]
+        for field in stock_rank_fields
+    }
+
+
+def csv_value(value) -> str:
+    return "" if is_missing(value) else str(value)
+
+
+def stock_rows_to_csv(
+    years: list[Any],
+    columns: StockColumns,
+    current_year: int,
+    fields: Sequence[str] = stock_csv_fields,
+) -> str:
+    # filter by years
+    min_year = current_year - STOCK_CSV_YEARS_BEFORE
+    max_year = current_year + STOCK_CSV_YEARS_AFTER
+    positions = [
+        i for i, year in enumerate(years) if min_year <= int(year) <= max_year
+    ]
+
+    # write csv, one row per field
+    output_csv = io.StringIO()
+    writer = csv.writer(
+        output_csv, delimiter=";", quoting=csv.QUOTE_ALL, lineterminator="\n"
+    )
+    writer.writerow([""] + [str(years[i]) for i in positions])
+    for field in fields:
+        values = columns.get(field)
+        writer.writerow(
+            [field]
+            + [("" if values is None else csv_value(values[i])) for i in positions]
+        )
+    return output_csv.getvalue().replace(".", ",")
@@ -1,22 +1,32 @@
-import pandas as pd
+import csv
+import io
+from typing import Mapping, Sequence
 
-from .constants import StockStoryFields
+from .constants import StockStoryItem, story_list_fields
 from .data import fetch_stock_stories
 
 
-def stories_sentiment(stock_isin: str) -> None | pd.DataFrame:
+def stories_sentiment(stock_isin: str) -> None | list[StockStoryItem]:
     stories = fetch_stock_stories(stock_isin)
     if not len(stories):
         print("Could not find data for:", stock_isin)
         return None
 
-    columns = [
-        StockStoryFields.published_at.name,
-        StockStoryFields.fetched_at.name,
-        StockStoryFields.sentiment.name,
-        StockStoryFields.source_url.name,
-    ]
-    stories_df = pd.DataFrame.from_records(
-        stories, index="published_at", columns=columns
-    ).sort_index()
-    return stories_df
+    return sorted(stories, key=lambda story: story["published_at"])
+
+
+def stories_to_csv(stories: Sequence[Mapping]) -> str:
+    # one row per story, published_at first like a dataframe index
+    output_csv = io.StringIO()
+    writer = csv.writer(
+        output_csv, delimiter=";", quoting=csv.QUOTE_ALL, lineterminator="\n"
+    )
+    writer.writerow(story_list_fields)
+    for story in stories:
+        writer.writerow(
+            [
+                "" if story.get(field) is None else str(story[field])
+                for field in story_list_fields
+            ]
+        )
+    return output_csv.getvalue()
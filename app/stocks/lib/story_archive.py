@@ -0,0 +1,90 @@
+"""
+Retention tiers of the story table. Stories published within STORY_HOT_DAYS
+keep their body in the table. Older stories with a sentiment keep only their
+metadata and sentiment, their bodies move to gzip files of json lines in
+the story archive bucket, one per stock, archival run and page of stories. Archived items expire by
+the table ttl after STORY_RETENTION_DAYS, the bucket drops archive files
+after the same time.
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Mapping, Sequence
+
+from .constants import StockStoryFields
+from .data import (
+    archive_stock_story,
+    fetch_stock_stories_to_archive,
+    put_story_archive,
+    story_text_content,
+)
+
+STORY_HOT_DAYS = int(os.environ.get("STORY_HOT_DAYS", "90"))
+STORY_RETENTION_DAYS = int(os.environ.get("STORY_RETENTION_DAYS", "730"))
+
+DAY_SECONDS = 24 * 60 * 60
+
+# fields of an archived story besides the body
+ARCHIVE_FIELDS = [
+    StockStoryFields.source_url.name,
+    StockStoryFields.published_at.name,
+    StockStoryFields.title.name,
+]
+
+
+def archive_lines(stories: Sequence[Mapping]) -> bytes:
+    # one json line per story with its body
+    lines = [
+        json.dumps(
+            {
+                **{
+                    field: str(story[field]) if field in story else None
+                    for field in ARCHIVE_FIELDS
+                },
+                StockStoryFields.text_content.name: story_text_content(story),
+            },
+            ensure_ascii=False,
+        )
+        for story in stories
+    ]
+    return gzip.compress("\n".join(lines).encode("utf-8"))
+
+
+def read_archive(data: bytes) -> list[dict]:
+    text = gzip.decompress(data).decode("utf-8")
+    return [json.loads(line) for line in text.splitlines() if line]
+
+
+def story_expires_at(story: Mapping) -> Decimal:
+    # ttl of an archived story, counted from its publication
+    published_at = story[StockStoryFields.published_at.name]
+    return Decimal(int(published_at) + STORY_RETENTION_DAYS * DAY_SECONDS)
+
+
+def archive_old_stories(stock_isin: str, now: float | None = None) -> int:
+    """
+    Moves the bodies of the stories older than the hot tier to archive
+    files, returns the archived stories. Each page of stories is archived
+    before the next one is read, so only one page is held in memory. The
+    file of a page is written first, so a failed run leaves the bodies of
+    the page in the table for the next run.
+    """
+    if now is None:
+        now = datetime.now(timezone.utc).timestamp()
+    published_before = Decimal(int(now - STORY_HOT_DAYS * DAY_SECONDS))
+
+    archived = 0
+    pages = fetch_stock_stories_to_archive(stock_isin, published_before)
+    for page, stories in enumerate(pages):
+        archive_key = f"{stock_isin}/{int(now)}-{page}.jsonl.gz"
+        put_story_archive(archive_key, archive_lines(stories))
+        for story in stories:
+            archive_stock_story(
+                stock_isin, story["source_url"], archive_key, story_expires_at(story)
+            )
+        print(f"Archived {len(stories)} stories to {archive_key}")
+        archived += len(stories)
+    return archived
@@ -1,13 +1,16 @@
-import requests
 from urllib.parse import quote
 from datetime import datetime, timezone
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from decimal import Decimal
 
-from .constants import TradingviewStoryItem, StockStoryItem
+from .constants import TradingviewStoryItem, StockStoryItem, StockMetaFields
+from .data import update_stock_meta
+from .provider import provider_request
 
 
 TRADINGVIEW_BASE_URL = "https://www.tradingview.com"
+# only the main content subtree of a story page is parsed
+MAIN_CONTENT_STRAINER = SoupStrainer("div", attrs={"aria-label": "Main content"})
 
 
 def find_stock_symbol(stock_isin: str) -> str:
@@ -30,7 +33,9 @@ def find_stock_symbol(stock_isin: str) -> str:
         "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
     }
 
-    symbol_response = requests.get(symbol_api_url, headers=headers)
+    symbol_response = provider_request(
+        "tradingview", "GET", symbol_api_url, headers=headers
+    )
     if symbol_response.status_code != 200:
         raise Exception("Failed to fetch tradingview stock symbol")
 
@@ -53,19 +58,28 @@ def find_stock_symbol(stock_isin: str) -> str:
     return tradingview_symbol
 
 
+def search_stock_symbol(stock_isin: str, stock_meta: dict) -> str:
+    # symbol of the stock stories, searched once and kept in the meta item
+    symbol = stock_meta.get(StockMetaFields.tradingview_symbol.name)
+    if symbol is not None:
+        return symbol
+    symbol = find_stock_symbol(stock_isin)
+    update_stock_meta(stock_isin, tradingview_symbol=symbol)
+    return symbol
+
+
 def build_story_url(story_item: TradingviewStoryItem) -> str:
     return TRADINGVIEW_BASE_URL + story_item["storyPath"]
 
 
 def fetch_stories(
-    stock_isin: str, old_stories: list[StockStoryItem]
+    stock_isin: str, old_stories: list[StockStoryItem], tradingview_symbol: str
 ) -> list[StockStoryItem]:
-    tradingview_symbol = find_stock_symbol(stock_isin)
     tradingview_symbol_escaped = quote(tradingview_symbol)
     stories_api_url = f"https://news-headlines.tradingview.com/v2/view/headlines/symbol?client=web&lang=en&section=&streaming=false&symbol={tradingview_symbol_escaped}"
 
     print("Fetching tradingview stories for", stock_isin)
-    stories_response = requests.get(stories_api_url)
+    stories_response = provider_request("tradingview", "GET", stories_api_url)
     if stories_response.status_code != 200:
         raise Exception("Failed to fetch tradingview story list")
 
@@ -100,7 +114,7 @@ def fetch_story(
     story_url = build_story_url(story_item)
 
     print("Fetching tradingview story:", story_url)
-    story_response = requests.get(story_url)
+    story_response = provider_request("tradingview", "GET", story_url)
     if story_response.status_code != 200:
         raise Exception("Failed to fetch tradingview story item")
 
@@ -108,20 +122,16 @@ def fetch_story(
     story_data = story_response.text
     now = Decimal(str(datetime.now(timezone.utc).timestamp()))
 
-    page_parser = BeautifulSoup(story_data, "html.parser")
-    story_article = page_parser.select_one("div[aria-label='Main content'] article")
-    if story_article is None or story_article.text == "":
-        # fallback to script tag
-        story_article = page_parser.select_one("div[aria-label='Main content'] script")
+    text_content = extract_story_text(story_data)
 
     # format and return result
-    if story_article is not None and story_article.text != "":
+    if text_content is not None:
         return {
             "ISIN": stock_isin,
             "source_url": story_url,
             "published_at": Decimal(story_item["published"]),
             "fetched_at": now,
-            "text_content": story_article.text,
+            "text_content": text_content,
             "title": story_item["title"],
             "data_provider": story_item["provider"],
             "external_id": story_item["id"],
@@ -129,3 +139,19 @@ def fetch_story(
 
     print("Could not find text content for story!", story_url)
     return None
+
+
+def extract_story_text(story_data: str) -> str | None:
+    # skip everything outside of the main content while parsing
+    page_parser = BeautifulSoup(
+        story_data, "html.parser", parse_only=MAIN_CONTENT_STRAINER
+    )
+    story_article = page_parser.select_one("div[aria-label='Main content'] article")
+    if story_article is None or story_article.text == "":
+        # fallback to script tag
+        story_article = page_parser.select_one("div[aria-label='Main content'] script")
+
+    if story_article is not None and story_article.text != "":
+        return story_article.text
+
+    return None
@@ -1,9 +1,19 @@
 import pandas as pd
 from difflib import SequenceMatcher
 import csv
+import hashlib
 import io
+import json
+import threading
 
 from .constants import SimilarityKeyEntry, SimilarityMap, stock_data_key_map
+from .data import fetch_table_layout, put_table_layout
+from .metrics import count, debug
+
+# layouts a warm container keeps, the oldest is dropped first
+LAYOUT_CACHE_SIZE = 256
+# changes with the synonyms, so stored entries of older synonyms are not used
+MATCHER_VERSION = hashlib.sha256(repr(stock_data_key_map).encode()).hexdigest()[:16]
 
 
 def calculate_similarity(val1, val2) -> float:
@@ -45,5 +55,63 @@ def find_table_entries(stock_dfs: list[pd.DataFrame]) -> str:
     for key in keys_map:
         writer.writerow([keys_map[key]["table"], keys_map[key]["column"], key])
 
-    print("Extracted table data:", output_csv.getvalue())
+    debug("Extracted table data:", output_csv.getvalue())
     return output_csv.getvalue()
+
+
+def table_layout_fingerprint(stock_dfs: list[pd.DataFrame]) -> str:
+    # table count and first column labels, all find_table_entries reads of a page
+    layout = [[repr(row) for row in df[df.columns[0]]] for df in stock_dfs]
+    text = json.dumps([MATCHER_VERSION, layout])
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class LayoutCache:
+    """
+    Table entries by table layout fingerprint, pages of different stocks with
+    the same layout get the same entries without matching. Entries missing in
+    memory are read from the layout table and written to it after matching,
+    if the cache is persistent.
+    """
+
+    def __init__(self, persistent: bool = True, size: int = LAYOUT_CACHE_SIZE):
+        self.persistent = persistent
+        self.size = size
+        self.entries: dict[str, str] = {}
+        self.hits = 0
+        self.stored_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def table_entries(self, stock_dfs: list[pd.DataFrame]) -> str:
+        fingerprint = table_layout_fingerprint(stock_dfs)
+        with self.lock:
+            entries = self.entries.get(fingerprint)
+        if entries is not None:
+            self.record("hits")
+            return entries
+
+        entries = fetch_table_layout(fingerprint) if self.persistent else None
+        if entries is not None:
+            self.record("stored_hits")
+        else:
+            self.record("misses")
+            entries = find_table_entries(stock_dfs)
+            if self.persistent:
+                put_table_layout(fingerprint, entries)
+
+        with self.lock:
+            while len(self.entries) >= self.size:
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[fingerprint] = entries
+        return entries
+
+    def record(self, name: str):
+        # layout_cache_hits, layout_cache_stored_hits, layout_cache_misses
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+        count(f"layout_cache_{name}")
+
+
+# layouts of a warm container
+layout_cache = LayoutCache()
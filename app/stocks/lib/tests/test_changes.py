@@ -0,0 +1,62 @@
+from decimal import Decimal
+from unittest import TestCase, main
+
+from stocks.lib.changes import (
+    ChangesException,
+    ChangesQuery,
+    changes_to_csv,
+    encode_page_token,
+    parse_changes_query,
+)
+
+LAST_KEY = {
+    "ISIN": "DE0007164600",
+    "change_feed": "changes",
+    "changed_at": Decimal("1717200000.25"),
+}
+
+
+class TestParseChangesQuery(TestCase):
+    def test_parse(self):
+        self.assertEqual(
+            parse_changes_query({"since": "1717200000", "limit": "10"}),
+            ChangesQuery(Decimal(1717200000), 10),
+        )
+        query = parse_changes_query(
+            {"since": "0", "next": encode_page_token(LAST_KEY)}
+        )
+        self.assertEqual(query.start_key, LAST_KEY)
+
+    def test_invalid(self):
+        for query in [
+            {},
+            {"since": "yesterday"},
+            {"since": "nan"},
+            {"since": "0", "limit": "0"},
+            {"since": "0", "next": "token"},
+            {"since": "0", "next": encode_page_token({"ISIN": "A"})},
+        ]:
+            with self.subTest(query=query):
+                with self.assertRaises(ChangesException):
+                    parse_changes_query(query)
+
+
+class TestChangesToCsv(TestCase):
+    def test_csv(self):
+        self.assertEqual(
+            changes_to_csv(
+                [
+                    {
+                        "ISIN": "DE0007164600",
+                        "changed_at": Decimal("1717200000.25"),
+                        "data_changed_at": Decimal("1717200000.25"),
+                    }
+                ]
+            ),
+            '"ISIN";"changed_at";"data_changed_at";"stories_changed_at"\n'
+            '"DE0007164600";"1717200000.25";"1717200000.25";""\n',
+        )
+
+
+if __name__ == "__main__":
+    main()
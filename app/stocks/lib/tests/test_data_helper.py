@@ -0,0 +1,111 @@
+from decimal import Decimal
+from types import GeneratorType
+from unittest import TestCase, main
+import numpy as np
+import pandas as pd
+from stocks.lib.data_helper import (
+    dataframe_to_items,
+    diff_stock_item,
+    merge_stock_items,
+)
+
+
+class TestDataframeToItems(TestCase):
+    def test_items(self):
+        stock_df = pd.DataFrame(
+            {
+                "Year": [2023, 2024, 2025],
+                "KGV": [12.5, np.nan, 8.0],
+                "Sales": ["1000 EUR", np.nan, "n/a"],
+                "DividendYield": ["1,28%", "2.5%", None],
+                "StockCount": [100, 200, 300],
+                "Unknown": [1.0, 2.0, 3.0],
+            }
+        )
+        self.assertEqual(
+            list(dataframe_to_items(stock_df)),
+            [
+                (
+                    {
+                        "KGV": Decimal("12.5"),
+                        "Sales": "1000 EUR",
+                        "DividendYield": "1,28%",
+                        "StockCount": 100,
+                    },
+                    2023,
+                ),
+                ({"DividendYield": "2.5%", "StockCount": 200}, 2024),
+                ({"KGV": Decimal("8.0"), "StockCount": 300}, 2025),
+            ],
+        )
+
+    def test_object_column_with_numbers(self):
+        stock_df = pd.DataFrame(
+            {"Year": [2023, 2024], "KBV": pd.Series([1.25, "3 EUR"], dtype=object)}
+        )
+        items = list(dataframe_to_items(stock_df))
+        self.assertEqual(items[0][0], {"KBV": Decimal("1.25")})
+        self.assertEqual(items[1][0], {"KBV": "3 EUR"})
+        # python types for dynamodb
+        self.assertIs(type(items[0][1]), int)
+
+    def test_lazy(self):
+        self.assertIsInstance(dataframe_to_items(pd.DataFrame()), GeneratorType)
+        self.assertEqual(list(dataframe_to_items(None)), [])
+
+
+class TestDiffStockItem(TestCase):
+    def test_diff(self):
+        stored_item = {
+            "ISIN": "A",
+            "Year": Decimal(2023),
+            "KGV": Decimal("12.5"),
+            "Sales": "1000 EUR",
+            "StockCount": Decimal(100),
+        }
+        item = {
+            "KGV": Decimal("12.50"),
+            "Sales": "1100 EUR",
+            "StockCount": 100,
+            "KBV": Decimal("1.2"),
+        }
+        self.assertEqual(
+            diff_stock_item(stored_item, item),
+            {"Sales": "1100 EUR", "KBV": Decimal("1.2")},
+        )
+
+    def test_unchanged(self):
+        item = {"KGV": Decimal("12.5")}
+        self.assertEqual(diff_stock_item(item, dict(item)), {})
+
+
+class TestMergeStockItems(TestCase):
+    def test_changed_years(self):
+        stored_items = {
+            2023: {"ISIN": "A", "Year": Decimal(2023), "KGV": Decimal("12.5")},
+            2024: {"ISIN": "A", "Year": Decimal(2024), "KGV": Decimal("10")},
+        }
+        items = {
+            2023: {"KGV": Decimal("12.5")},
+            2024: {"KGV": Decimal("11"), "KBV": Decimal("1.2")},
+            2025: {"KGV": Decimal("9")},
+        }
+        self.assertEqual(
+            merge_stock_items(stored_items, items),
+            (
+                {
+                    2024: {
+                        "ISIN": "A",
+                        "Year": Decimal(2024),
+                        "KGV": Decimal("11"),
+                        "KBV": Decimal("1.2"),
+                    },
+                    2025: {"KGV": Decimal("9")},
+                },
+                3,
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import math
+import random
+from decimal import Decimal
+from unittest import TestCase, main
+import numpy as np
+from stocks.lib.helper import (
+    CURRENCIES,
+    find_curr,
+    parse_value,
+    text_currency_to_float,
+    text_to_float,
+)
+
+
+# previous implementations, the parser has to return the same
+def find_curr_scan(text):
+    if not isinstance(text, str):
+        return None
+    for c in CURRENCIES:
+        if c in text:
+            return c
+    return None
+
+
+def text_currency_to_float_replace(text):
+    if not isinstance(text, str):
+        return text
+    t = text
+    dot_pos = t.rfind(".")
+    comma_pos = t.rfind(",")
+    if comma_pos > dot_pos:
+        t = t.replace(".", "")
+        t = t.replace(",", ".")
+    else:
+        t = t.replace(",", "")
+    return float(t)
+
+
+def text_to_float_replace(text):
+    if text is None:
+        return None
+    try:
+        if not isinstance(text, str):
+            return float(text)
+        text = text.replace("%", "")
+        curr = find_curr_scan(text)
+        if curr is not None:
+            text = text.replace(curr, "")
+        return text_currency_to_float_replace(text.strip())
+    except ValueError:
+        return None
+
+
+def same_float(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a):
+        return math.isnan(b)
+    return a == b
+
+
+TEXTS = [
+    "1,5",
+    "3.5",
+    "1.200,50 EUR",
+    "1,200.50 USD",
+    "1.234.567",
+    "1,234,567",
+    "-0,75%",
+    "12,5 %",
+    "2,1 Mrd.",
+    "450,2 Mio. EUR",
+    "USD 12",
+    "12 USDEUR",
+    "CADKK 1",
+    "EU%R 5",
+    "n/a",
+    "-",
+    "",
+    " 7 ",
+    "nan EUR",
+    "1e5",
+    "1_000",
+    "inf",
+    "12,5.3",
+    "+1,5EUR",
+    "1. USD ",
+    "3,5 EURO",
+    "12,5%\t",
+]
+
+
+class TestParseValue(TestCase):
+    def test_same_as_previous(self):
+        rng = random.Random(1)
+        texts = list(TEXTS)
+        parts = ["1", "2", "0", ".", ",", " ", "%", "-", "EUR", "USD", "GBP", "Mio.", "Mrd.", "e", "x", "+", "\t"]
+        texts += ["".join(rng.choices(parts, k=rng.randint(1, 8))) for _ in range(3000)]
+
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertEqual(find_curr(text), find_curr_scan(text))
+                self.assertTrue(same_float(text_to_float(text), text_to_float_replace(text)))
+                try:
+                    expected = text_currency_to_float_replace(text)
+                except ValueError:
+                    with self.assertRaises(ValueError):
+                        text_currency_to_float(text)
+                    continue
+                self.assertTrue(same_float(text_currency_to_float(text), expected))
+
+    def test_parse_value(self):
+        self.assertEqual(parse_value("1.200,50 EUR"), (1200.5, "EUR", None, False))
+        self.assertEqual(parse_value("1,28 %"), (1.28, None, None, True))
+        self.assertEqual(parse_value("2,1 Mrd. USD"), (None, "USD", "Mrd.", False))
+        self.assertEqual(parse_value(None), (None, None, None, False))
+        self.assertEqual(parse_value(Decimal("2.5")), (2.5, None, None, False))
+
+    def test_keeps_numbers(self):
+        # missing values of dataframes stay np.nan
+        self.assertIs(text_to_float(np.nan), np.nan)
+        self.assertIsNone(find_curr(np.nan))
+        self.assertEqual(text_currency_to_float(1.5), 1.5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from decimal import Decimal
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from stocks import import_stocks_data
+from stocks.import_stocks_data import run_import
+
+
+class TestRunImport(TestCase):
+    def test_sources_writing_over_each_other(self):
+        stored = {2023: {"ISIN": "A", "Year": Decimal(2023), "KGV": "10"}}
+        source_urls = {"boerse_de": "boerse", "fnet_guv": "guv"}
+
+        def process_import(scrappey_key, url, stock_isin, openai_key, stored_items):
+            # the first source changes the value, the second one restores it
+            stored_items[2023]["KGV"] = "12" if url == "boerse" else "10"
+            return 1
+
+        with patch.dict(
+            import_stocks_data.os.environ,
+            {"SCRAPPEY_API_KEY": "", "OPENAI_API_KEY": ""},
+        ), patch.object(
+            import_stocks_data, "search_source_urls", return_value=source_urls
+        ), patch.object(
+            import_stocks_data, "stored_stock_items", return_value=stored
+        ), patch.object(
+            import_stocks_data, "process_import", side_effect=process_import
+        ), patch.object(
+            import_stocks_data, "update_last_import"
+        ) as update_last_import, patch.object(
+            import_stocks_data, "mark_stock_changed"
+        ) as mark_stock_changed, patch.object(
+            import_stocks_data, "refresh_stock_screen"
+        ) as refresh_stock_screen:
+            run_import("A", {"screen_built": True})
+
+        self.assertFalse(update_last_import.call_args.args[1])
+        mark_stock_changed.assert_not_called()
+        refresh_stock_screen.assert_not_called()
+        # the sources still report their own changes
+        source_status = update_last_import.call_args.args[2]
+        self.assertEqual(source_status["fnet_guv"]["changed"], 1)
+
+
+if __name__ == "__main__":
+    main()
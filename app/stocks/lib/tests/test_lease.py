@@ -0,0 +1,47 @@
+from unittest import TestCase, main
+from unittest.mock import MagicMock, patch
+
+from stocks.lib import data
+from stocks.lib.data import UnknownStockException, acquire_import_lease
+
+
+class ConditionalCheckFailedException(Exception):
+    def __init__(self, response: dict):
+        self.response = response
+
+
+def meta_table(failed_response: dict | None = None) -> MagicMock:
+    table = MagicMock()
+    table.meta.client.exceptions.ConditionalCheckFailedException = (
+        ConditionalCheckFailedException
+    )
+    if failed_response is not None:
+        table.update_item.side_effect = ConditionalCheckFailedException(
+            failed_response
+        )
+    else:
+        table.update_item.return_value = {"Attributes": {"ISIN": "A"}}
+    return table
+
+
+class TestAcquireImportLease(TestCase):
+    def test_acquired(self):
+        with patch.object(data, "connect_stocks_meta_table", return_value=meta_table()):
+            self.assertEqual(acquire_import_lease("A", "owner", 300), {"ISIN": "A"})
+
+    def test_held(self):
+        table = meta_table({"Item": {"ISIN": "A", "import_lease_owner": "other"}})
+        with patch.object(data, "connect_stocks_meta_table", return_value=table):
+            self.assertIsNone(acquire_import_lease("A", "owner", 300))
+
+    def test_unknown_stock(self):
+        table = meta_table({"Error": {"Code": "ConditionalCheckFailedException"}})
+        with patch.object(data, "connect_stocks_meta_table", return_value=table):
+            with self.assertRaises(UnknownStockException):
+                acquire_import_lease("A", "owner", 300)
+        condition = table.update_item.call_args.kwargs["ConditionExpression"]
+        self.assertTrue(condition.startswith("attribute_exists(ISIN) AND ("))
+
+
+if __name__ == "__main__":
+    main()
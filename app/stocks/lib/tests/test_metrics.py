@@ -0,0 +1,62 @@
+import io
+import json
+from contextlib import redirect_stdout
+from unittest import TestCase, main
+from stocks.lib.metrics import count, instrumented, span
+
+
+def emitted_metrics(handler, event=None) -> dict:
+    output = io.StringIO()
+    with redirect_stdout(output):
+        handler(event, None)
+    return json.loads(output.getvalue().strip().splitlines()[-1])
+
+
+class TestMetrics(TestCase):
+    def test_emits_counts_and_spans(self):
+        @instrumented
+        def handler(event, context):
+            count("scrappey_calls")
+            count("scrappey_calls")
+            count("page_bytes", 1200)
+            with span("parse"):
+                pass
+
+        emitted = emitted_metrics(handler)
+        self.assertEqual(emitted["scrappey_calls"], 2)
+        self.assertEqual(emitted["page_bytes"], 1200)
+        self.assertGreaterEqual(emitted["parse_ms"], 0)
+        self.assertGreaterEqual(emitted["invocation_ms"], emitted["parse_ms"])
+
+        units = {
+            metric["Name"]: metric["Unit"]
+            for metric in emitted["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+        }
+        self.assertEqual(units["scrappey_calls"], "Count")
+        self.assertEqual(units["page_bytes"], "Bytes")
+        self.assertEqual(units["parse_ms"], "Milliseconds")
+
+    def test_metrics_are_reset_per_invocation(self):
+        @instrumented
+        def handler(event, context):
+            count("stories", event)
+
+        emitted_metrics(handler, 3)
+        emitted = emitted_metrics(handler, 2)
+        self.assertEqual(emitted["stories"], 2)
+
+    def test_emits_on_error(self):
+        @instrumented
+        def handler(event, context):
+            count("fnet_guv_failures")
+            raise ValueError("failed")
+
+        output = io.StringIO()
+        with redirect_stdout(output), self.assertRaises(ValueError):
+            handler(None, None)
+        emitted = json.loads(output.getvalue().strip())
+        self.assertEqual(emitted["fnet_guv_failures"], 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from decimal import Decimal
+from unittest import TestCase, main
+from unittest.mock import MagicMock, patch
+
+from stocks.lib import data, news_sentiment
+from stocks.lib.constants import NewsSentiment
+from stocks.lib.data import set_stock_story_sentiment
+from stocks.lib.news_sentiment import set_news_sentiment
+
+
+class TransactionCanceledException(Exception):
+    def __init__(self, code: str):
+        self.response = {"CancellationReasons": [{"Code": code}, {"Code": "None"}]}
+
+
+def dynamodb(error: Exception | None = None) -> MagicMock:
+    resource = MagicMock()
+    client = resource.meta.client
+    client.exceptions.TransactionCanceledException = TransactionCanceledException
+    client.transact_write_items.side_effect = error
+    return resource
+
+
+class TestSetStockStorySentiment(TestCase):
+    def setUp(self):
+        env = {"STOCKS_STORY_TABLE": "story", "STOCKS_SENTIMENT_TABLE": "sentiment"}
+        patcher = patch.dict("os.environ", env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_label_and_count_together(self):
+        resource = dynamodb()
+        with patch.object(data, "connect_dynamodb", return_value=resource):
+            self.assertTrue(
+                set_stock_story_sentiment("A", "url", "2024-06-01", NewsSentiment.POSITIVE)
+            )
+        items = resource.meta.client.transact_write_items.call_args.kwargs[
+            "TransactItems"
+        ]
+        self.assertEqual(
+            [item["Update"]["TableName"] for item in items], ["story", "sentiment"]
+        )
+        self.assertIn("ConditionExpression", items[0]["Update"])
+
+    def test_categorized_before(self):
+        resource = dynamodb(TransactionCanceledException("ConditionalCheckFailed"))
+        with patch.object(data, "connect_dynamodb", return_value=resource):
+            self.assertFalse(
+                set_stock_story_sentiment("A", "url", "2024-06-01", NewsSentiment.POSITIVE)
+            )
+
+    def test_other_cancellation(self):
+        resource = dynamodb(TransactionCanceledException("TransactionConflict"))
+        with patch.object(data, "connect_dynamodb", return_value=resource):
+            with self.assertRaises(TransactionCanceledException):
+                set_stock_story_sentiment("A", "url", "2024-06-01", NewsSentiment.POSITIVE)
+
+
+class TestSetNewsSentiment(TestCase):
+    def test_counts_stories_categorized_once(self):
+        stories = [
+            {"title": "a", "source_url": "a", "published_at": Decimal(1717200000)},
+            {"title": "b", "source_url": "b", "published_at": Decimal(1717200000)},
+        ]
+        with patch.object(
+            news_sentiment, "fetch_stock_stories_without_sentiment", return_value=stories
+        ), patch.object(
+            news_sentiment, "story_text_content", return_value="text"
+        ), patch.object(
+            news_sentiment, "categorize_news_sentiment", return_value=NewsSentiment.NEUTRAL
+        ), patch.object(
+            # b was categorized by a retried run in between
+            news_sentiment, "set_stock_story_sentiment", side_effect=[True, False]
+        ) as set_stock_story_sentiment:
+            self.assertEqual(set_news_sentiment("A"), 1)
+        set_stock_story_sentiment.assert_any_call(
+            "A", "a", "2024-06-01", NewsSentiment.NEUTRAL
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+from unittest import TestCase, main
+from unittest.mock import MagicMock, patch
+
+from stocks.lib import onboarding, story_scraper
+from stocks.lib.provider import ProviderUnavailableException
+from stocks.lib.onboarding import (
+    add_stocks,
+    isin_check_digit_valid,
+    parse_isins,
+    prefetch_identifiers,
+)
+
+
+class TestOnboarding(TestCase):
+    def test_check_digit(self):
+        self.assertTrue(isin_check_digit_valid("DE0007164600"))
+        self.assertTrue(isin_check_digit_valid("US0378331005"))
+        self.assertFalse(isin_check_digit_valid("US0378331006"))
+
+    def test_parse_isins(self):
+        isins, invalid = parse_isins(
+            ["DE0007164600", " us0378331005 # apple", "", "DE0007164600", "US0378331006"]
+        )
+        self.assertEqual(isins, ["DE0007164600", "US0378331005"])
+        self.assertEqual(invalid, ["US0378331006"])
+
+    def test_add_stocks(self):
+        known = {"DE0007164600": {"ISIN": "DE0007164600", "last_import": 5}}
+        with patch.object(
+            onboarding, "batch_fetch_stock_metas", return_value=dict(known)
+        ), patch.object(onboarding, "put_stock_metas") as put_stock_metas:
+            metas, added = add_stocks(["DE0007164600", "US0378331005"])
+
+        self.assertEqual(added, 1)
+        self.assertEqual(metas["DE0007164600"], known["DE0007164600"])
+        put_stock_metas.assert_called_once_with(
+            [{"ISIN": "US0378331005", "last_import": 0, "last_story_import": 0}]
+        )
+
+    def test_prefetch_identifiers(self):
+        metas = {
+            # nothing to search
+            "A": {
+                "fnet_guv_url": "guv",
+                "fnet_estimation_url": "estimation",
+                "tradingview_symbol": "XETR:A",
+            },
+            "B": {"fnet_guv_url": "guv"},
+            "C": {},
+        }
+        symbols: list[str] = []
+
+        def find_stock_symbol(stock_isin: str) -> str:
+            if stock_isin == "C":
+                raise Exception("Could not find tradingview symbols")
+            return f"XETR:{stock_isin}"
+
+        def update_stock_meta(stock_isin: str, tradingview_symbol: str):
+            symbols.append(tradingview_symbol)
+
+        with patch.object(
+            onboarding,
+            "search_fnet_urls",
+            side_effect=lambda isin, meta: ("guv", "estimation" if isin == "B" else None),
+        ) as search_fnet_urls, patch.object(
+            story_scraper, "find_stock_symbol", side_effect=find_stock_symbol
+        ), patch.object(
+            story_scraper, "update_stock_meta", side_effect=update_stock_meta
+        ):
+            stats = prefetch_identifiers(metas, 2)
+
+        self.assertEqual(
+            stats,
+            {
+                "fnet": {"found": 1, "missing": 1, "failed": 0, "skipped": 0},
+                "tradingview": {"found": 1, "missing": 0, "failed": 1, "skipped": 0},
+            },
+        )
+        self.assertEqual(search_fnet_urls.call_count, 2)
+        self.assertEqual(symbols, ["XETR:B"])
+
+    def test_provider_unavailable(self):
+        metas = {"A": {"tradingview_symbol": "XETR:A"}, "B": {"tradingview_symbol": "XETR:B"}}
+        breaker = MagicMock()
+        breaker.is_open.side_effect = [False, True]
+
+        # the first search opens the circuit, the next one is not run
+        with patch.object(
+            onboarding,
+            "search_fnet_urls",
+            side_effect=ProviderUnavailableException("duckduckgo is unavailable"),
+        ) as search_fnet_urls, patch.object(
+            onboarding, "provider", return_value=MagicMock(breaker=breaker)
+        ):
+            stats = prefetch_identifiers(metas, 1)
+
+        self.assertEqual(
+            stats["fnet"], {"found": 0, "missing": 0, "failed": 1, "skipped": 1}
+        )
+        search_fnet_urls.assert_called_once()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest import TestCase, main
+
+from stocks.import_stocks_data import parse_page, read_page_tables, titles_from_html
+
+
+def large_page(paragraphs: int) -> bytes:
+    # fundamentals tables in a page of a few MB, like pages with long news lists
+    table = (
+        "<table><tr><th></th><th>2023</th><th>2024</th></tr>"
+        "<tr><td>Umsatzerlöse</td><td>1.200,50</td><td>1.300,25</td></tr>"
+        "<tr><td>KGV</td><td>12,5</td><td>11,0</td></tr></table>"
+    )
+    news = "<p>Kurs der Aktie über dem Markt &amp; Index</p>" * paragraphs
+    return (
+        f"<html><body><main>{news}<h2>Umsatz und Ergebnis</h2><div>{table}</div>"
+        f"<h2>Nachrichten</h2><p>{news}</p><h2>Bilanz</h2>{table}</main></body></html>"
+    ).encode("utf-8")
+
+
+# growth of the peak rss of a fresh process fetching and parsing a large
+# page, in bytes. The scrappey response holds the page in its json payload.
+PEAK_RSS_SCRIPT = """
+import json
+import resource
+from unittest.mock import MagicMock
+from stocks import import_stocks_data
+from stocks.import_stocks_data import fetch_html, parse_page, read_page_tables, titles_from_html
+from stocks.lib.tests.test_page_parsing import large_page
+
+def response(page):
+    payload = {"solution": {"response": page.decode("utf-8")}}
+    return MagicMock(status_code=200, content=json.dumps(payload).encode("utf-8"))
+
+def fetch_and_parse():
+    page = parse_page(fetch_html("key", "https://www.boerse.de"))
+    read_page_tables(page)
+    titles_from_html(page)
+
+# parsers and their imports are loaded on a small page first
+fetched = response(large_page(10))
+import_stocks_data.provider_request = lambda *args, **kwargs: fetched
+fetch_and_parse()
+
+fetched = response(large_page(50000))
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+fetch_and_parse()
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss is in KiB on linux
+print(len(fetched.content), (after - before) * 1024)
+"""
+
+
+class TestPageParsing(TestCase):
+    def test_tables_and_titles(self):
+        page = parse_page(large_page(10))
+        dfs = read_page_tables(page)
+        self.assertEqual(len(dfs), 2)
+        self.assertEqual(dfs[0].iloc[0, 0], "Umsatzerlöse")
+        self.assertEqual(dfs[0].iloc[0, 1], 1200.5)
+        self.assertEqual(
+            titles_from_html(page), "\n<h2>Umsatz und Ergebnis</h2>\n<h2>Bilanz</h2>"
+        )
+
+    def test_peak_memory(self):
+        # tracemalloc does not see the lxml heap, the rss of the process does
+        app_dir = Path(__file__).parents[3]
+        result = subprocess.run(
+            [sys.executable, "-c", PEAK_RSS_SCRIPT],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=app_dir,
+            env={**os.environ, "PYTHONPATH": str(app_dir)},
+        )
+        # the last line, fetch_html prints the url
+        page_size, growth = map(int, result.stdout.splitlines()[-1].split())
+        self.assertGreater(page_size, 4 * 1024 * 1024)
+        # the decoded payload and the lxml tree, no text copy of the response
+        # or a python tree of the page, which grew the rss by 28 times the page
+        self.assertLess(growth, 10 * page_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import io
+import os
+import pstats
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from unittest import TestCase, main
+from unittest.mock import patch
+from stocks.lib import profiling
+
+
+def handler(event, context):
+    return sorted(range(event, 0, -1))
+
+
+class TestProfiling(TestCase):
+    def test_disabled_returns_handler(self):
+        with patch.object(profiling, "PROFILE_ENABLED", False):
+            self.assertIs(profiling.profiled(handler), handler)
+
+    def test_prints_summary(self):
+        with patch.object(profiling, "PROFILE_ENABLED", True), patch.object(
+            profiling, "PROFILE_OUTPUT", None
+        ):
+            output = io.StringIO()
+            with redirect_stdout(output):
+                result = profiling.profiled(handler)(3, None)
+
+        self.assertEqual(result, [1, 2, 3])
+        self.assertIn("Profile of test_profiling", output.getvalue())
+        self.assertIn("Peak traced memory", output.getvalue())
+
+    def test_writes_raw_profile(self):
+        with tempfile.TemporaryDirectory() as directory, patch.object(
+            profiling, "PROFILE_ENABLED", True
+        ), patch.object(profiling, "PROFILE_OUTPUT", directory):
+            with redirect_stdout(io.StringIO()):
+                profiling.profiled(handler)(3, None)
+
+            files = sorted(os.listdir(directory))
+            self.assertEqual(len(files), 2)
+            self.assertTrue(files[0].endswith(".prof"))
+            self.assertTrue(files[1].endswith(".tracemalloc"))
+            pstats.Stats(os.path.join(directory, files[0]))
+            tracemalloc.Snapshot.load(os.path.join(directory, files[1]))
+
+
+if __name__ == "__main__":
+    main()
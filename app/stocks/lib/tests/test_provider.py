@@ -0,0 +1,157 @@
+from unittest import TestCase, main
+from stocks.lib.provider import (
+    CircuitBreaker,
+    Provider,
+    ProviderConfig,
+    ProviderUnavailableException,
+    RetryableProviderException,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+CONFIG: ProviderConfig = {
+    "rate": 1,
+    "burst": 1,
+    "timeout": 10,
+    "retries": 2,
+    "max_backoff": 10,
+    "deadline": 100,
+    "failure_threshold": 3,
+    "cooldown": 60,
+}
+
+
+class TestTokenBucket(TestCase):
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=2, clock=clock, sleep=clock.sleep)
+        for _ in range(6):
+            bucket.acquire()
+        # burst of 2, then 2 per second
+        self.assertAlmostEqual(clock.now, 2)
+
+
+class TestCircuitBreaker(TestCase):
+    def test_open_and_close(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=60, clock=clock)
+        breaker.record_failure()
+        self.assertFalse(breaker.is_open())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open())
+        clock.now = 61
+        self.assertFalse(breaker.is_open())
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertFalse(breaker.is_open())
+
+    def test_half_open(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=60, clock=clock)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        # a single probe after the cooldown, its failure opens it again
+        clock.now = 61
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open())
+        clock.now = 100
+        self.assertFalse(breaker.allow())
+
+        # a successful probe closes it
+        clock.now = 122
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+
+class TestProvider(TestCase):
+    def test_retry(self):
+        clock = FakeClock()
+        provider = Provider("test", CONFIG, clock=clock, sleep=clock.sleep)
+        calls = []
+
+        def flaky():
+            calls.append(clock.now)
+            if len(calls) < 3:
+                raise RetryableProviderException("rate limited")
+            return "ok"
+
+        self.assertEqual(provider.call(flaky), "ok")
+        self.assertEqual(len(calls), 3)
+
+    def test_retry_exhausted(self):
+        clock = FakeClock()
+        provider = Provider("test", CONFIG, clock=clock, sleep=clock.sleep)
+
+        def failing():
+            raise RetryableProviderException("unavailable")
+
+        # a failed call counts once, not once per attempt
+        for _ in range(CONFIG["failure_threshold"]):
+            self.assertFalse(provider.breaker.is_open())
+            with self.assertRaises(RetryableProviderException):
+                provider.call(failing)
+        # breaker opened, no more calls during cooldown
+        with self.assertRaises(ProviderUnavailableException):
+            provider.call(failing)
+
+    def test_deadline(self):
+        clock = FakeClock()
+        provider = Provider(
+            "test", {**CONFIG, "retries": 5}, clock=clock, sleep=clock.sleep
+        )
+        calls = []
+
+        def timing_out():
+            calls.append(clock.now)
+            clock.now += 45
+            raise RetryableProviderException("timed out")
+
+        # the third attempt could not time out before the deadline
+        with self.assertRaises(RetryableProviderException):
+            provider.call(timing_out)
+        self.assertEqual(len(calls), 2)
+        self.assertLess(clock.now, CONFIG["deadline"])
+
+    def test_retry_after_too_long(self):
+        clock = FakeClock()
+        provider = Provider("test", CONFIG, clock=clock, sleep=clock.sleep)
+
+        def rate_limited():
+            raise RetryableProviderException("rate limited", retry_after=600)
+
+        with self.assertRaises(RetryableProviderException):
+            provider.call(rate_limited)
+        self.assertEqual(clock.sleeps, [])
+
+    def test_no_retry(self):
+        provider = Provider("test", CONFIG)
+
+        def invalid():
+            raise ValueError("invalid")
+
+        with self.assertRaises(ValueError):
+            provider.call(invalid)
+        self.assertEqual(provider.breaker.failures, 0)
+
+
+if __name__ == "__main__":
+    main()
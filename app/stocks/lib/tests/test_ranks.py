@@ -0,0 +1,83 @@
+import random
+from decimal import Decimal
+from unittest import TestCase, main
+
+import numpy as np
+
+from stocks.lib.constants import StockDataKey
+from stocks.lib.ranks import (
+    RANK_MIN_GROUP,
+    compute_ranks,
+    percentile_ranks,
+    rank_updates,
+)
+
+KGV = StockDataKey.KGV.value
+KUV = StockDataKey.KUV.value
+
+
+class TestPercentileRanks(TestCase):
+    def test_same_as_counting(self):
+        rng = random.Random(1)
+        values = [rng.choice([np.nan, float(rng.randint(0, 20))]) for _ in range(200)]
+        valid = [value for value in values if not np.isnan(value)]
+        expected = [
+            np.nan
+            if np.isnan(value)
+            else (
+                sum(v < value for v in valid) + sum(v == value for v in valid) / 2
+            )
+            / len(valid)
+            * 100
+            for value in values
+        ]
+        np.testing.assert_allclose(percentile_ranks(np.array(values)), expected)
+
+    def test_empty(self):
+        self.assertTrue(np.isnan(percentile_ranks(np.array([np.nan, np.nan]))).all())
+
+
+class TestComputeRanks(TestCase):
+    def test_ranks_by_year_and_currency(self):
+        items = [
+            {"ISIN": f"A{i}", "Year": Decimal(2024), KGV: Decimal(i), "Currency": "EUR"}
+            for i in range(RANK_MIN_GROUP)
+        ]
+        items += [
+            {"ISIN": "U0", "Year": Decimal(2024), KGV: Decimal(100), "Currency": "USD"},
+            {"ISIN": "A0", "Year": Decimal(2025), KUV: Decimal(1)},
+        ]
+        ranks = compute_ranks(items)
+
+        self.assertEqual(
+            ranks[("A0", 2024)],
+            {"KGVRank": Decimal("8.3"), "KGVCurrencyRank": Decimal("10.0")},
+        )
+        # too few stocks in USD for a currency rank
+        self.assertEqual(ranks[("U0", 2024)], {"KGVRank": Decimal("91.7")})
+        self.assertEqual(ranks[("A0", 2025)], {"KUVRank": Decimal("50.0")})
+
+
+class TestRankUpdates(TestCase):
+    def test_changed_and_removed(self):
+        ranks = {
+            ("A", 2024): {"KGVRank": Decimal("10.0"), "KUVRank": Decimal("20.0")},
+            ("B", 2024): {"KGVRank": Decimal("90.0")},
+        }
+        stored = [
+            {"ISIN": "A", "Year": Decimal(2024), "KGVRank": Decimal("10.0")},
+            {"ISIN": "B", "Year": Decimal(2024), "KGVRank": Decimal("90.0")},
+            {"ISIN": "C", "Year": Decimal(2024), "KBVRank": Decimal("50.0")},
+            {"ISIN": "D", "Year": Decimal(2024)},
+        ]
+        self.assertEqual(
+            rank_updates(ranks, stored),
+            [
+                (("A", 2024), {"KUVRank": Decimal("20.0")}, []),
+                (("C", 2024), {}, ["KBVRank"]),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
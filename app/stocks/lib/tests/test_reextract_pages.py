@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from stocks import reextract_pages
+from stocks.reextract_pages import ExtractedPage, StoredPage, batches, store_pages
+
+
+def page(name: str, stock_isin: str) -> StoredPage:
+    return StoredPage(name, stock_isin, b"", None)
+
+
+@contextmanager
+def import_lease(stock_isin: str):
+    # B is being imported
+    yield None if stock_isin == "B" else {"ISIN": stock_isin}
+
+
+class TestReextractPages(TestCase):
+    def test_batches_keep_stocks_together(self):
+        pages = [
+            page("boerse_de_A.html", "A"),
+            page("fnet_guv_A.html", "A"),
+            page("fnet_estimation_A.html", "A"),
+            page("boerse_de_B.html", "B"),
+            page("boerse_de_C.html", "C"),
+        ]
+        self.assertEqual(
+            [[p.stock_isin for p in batch] for batch in batches(iter(pages), 2)],
+            [["A", "A", "A"], ["B", "C"]],
+        )
+
+    def test_store_changed_values(self):
+        stored = [{"ISIN": "A", "Year": Decimal(2023), "KGV": "10", "KBV": "1"}]
+        pages = [
+            ExtractedPage("boerse_de_A.html", "A", {2023: {"KGV": "12", "KBV": "1"}}),
+            ExtractedPage("fnet_guv_A.html", "A", {2024: {"KGV": "13"}}),
+            ExtractedPage("fnet_estimation_A.html", "A", {}, "parse"),
+            ExtractedPage("boerse_de_B.html", "B", {2023: {"KGV": "14"}}),
+        ]
+        with patch.object(
+            reextract_pages, "import_lease", side_effect=import_lease
+        ), patch.object(
+            reextract_pages, "fetch_stock_data", return_value=stored
+        ) as fetch_stock_data, patch.object(
+            reextract_pages, "update_stock_data"
+        ) as update_stock_data, patch.object(
+            reextract_pages, "update_stock_screen"
+        ), patch.object(
+            reextract_pages, "mark_stock_changed"
+        ):
+            self.assertEqual(store_pages(pages), (2, 2, 1))
+
+        # the stock being imported is not read or written
+        fetch_stock_data.assert_called_once_with("A")
+
+        # values the pages did not change are not written back
+        self.assertEqual(
+            [call.args for call in update_stock_data.call_args_list],
+            [("A", 2023, {"KGV": "12"}), ("A", 2024, {"KGV": "13"})],
+        )
+
+
+if __name__ == "__main__":
+    main()
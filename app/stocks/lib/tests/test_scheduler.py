@@ -0,0 +1,86 @@
+import math
+from decimal import Decimal
+from unittest import TestCase, main
+from stocks.lib.scheduler import (
+    SOURCE_RETRY_BASE,
+    due_import_jobs,
+    import_priority,
+    next_source_status,
+    rank_stock_imports,
+)
+
+DAY = 24 * 60 * 60
+NOW = 100 * DAY
+
+
+class TestImportPriority(TestCase):
+    def test_never_imported(self):
+        self.assertEqual(import_priority({"ISIN": "A", "last_import": 0}, NOW), math.inf)
+        self.assertEqual(import_priority({"ISIN": "A"}, NOW), math.inf)
+
+    def test_staleness(self):
+        item = {"ISIN": "A", "last_import": Decimal(NOW - 10 * DAY)}
+        self.assertAlmostEqual(import_priority(item, NOW), 10)
+
+    def test_demand_and_changes(self):
+        last_import = Decimal(NOW - 10 * DAY)
+        idle = {"ISIN": "A", "last_import": last_import}
+        read = {"ISIN": "B", "last_import": last_import, "demand_count": Decimal(3)}
+        unchanged = {"ISIN": "C", "last_import": last_import, "last_import_changed": False}
+        self.assertAlmostEqual(import_priority(idle, NOW), 10)
+        self.assertAlmostEqual(import_priority(read, NOW), 20)
+        self.assertAlmostEqual(import_priority(unchanged, NOW), 5)
+
+
+class TestRankStockImports(TestCase):
+    def test_rank(self):
+        items = [
+            {"ISIN": "A", "last_import": Decimal(NOW - 10 * DAY)},
+            {"ISIN": "B", "last_import": Decimal(NOW - 5 * DAY), "demand_count": 255},
+            {"ISIN": "C", "last_import": 0},
+            {"ISIN": "D", "last_import": Decimal(NOW - 1 * DAY)},
+        ]
+        self.assertEqual(rank_stock_imports(items, NOW), ["C", "B", "A", "D"])
+
+
+class TestSourceStatus(TestCase):
+    def test_backoff(self):
+        status = next_source_status(None, False, NOW)
+        self.assertEqual(status["failures"], 1)
+        self.assertEqual(status["retry_at"], NOW + SOURCE_RETRY_BASE)
+        status = next_source_status(status, False, NOW)
+        self.assertEqual(status["failures"], 2)
+        self.assertEqual(status["retry_at"], NOW + 2 * SOURCE_RETRY_BASE)
+        status = next_source_status(status, True, NOW)
+        self.assertEqual(
+            status, {"status": "ok", "at": NOW, "failures": 0, "changed": 0}
+        )
+
+
+class TestDueImportJobs(TestCase):
+    def test_retry_failed_sources(self):
+        failed = next_source_status(None, False, NOW - 2 * SOURCE_RETRY_BASE)
+        waiting = next_source_status(None, False, NOW)
+        ok = next_source_status(None, True, NOW)
+        recent = Decimal(NOW - DAY / 2)
+        items = [
+            {"ISIN": "A", "last_import": Decimal(NOW - 10 * DAY)},
+            {
+                "ISIN": "B",
+                "last_import": recent,
+                "source_status": {"boerse_de": ok, "fnet_guv": failed},
+            },
+            {
+                "ISIN": "C",
+                "last_import": recent,
+                "source_status": {"fnet_estimation": waiting},
+            },
+            {"ISIN": "D", "last_import": recent},
+        ]
+        jobs = due_import_jobs(items, NOW, 5)
+        self.assertEqual(jobs, [("B", ["fnet_guv"]), ("A", None)])
+        self.assertEqual(due_import_jobs(items, NOW, 1), [("B", ["fnet_guv"])])
+
+
+if __name__ == "__main__":
+    main()
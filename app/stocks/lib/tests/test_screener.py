@@ -0,0 +1,256 @@
+import math
+import random
+from decimal import Decimal
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from stocks.lib.constants import StockDataKey, screen_fields
+from stocks.lib import screener
+from stocks.lib.screener import (
+    OPERATORS,
+    SCREEN_REFRESH_OVERLAP,
+    Condition,
+    Metric,
+    ScreenException,
+    ScreenIndex,
+    ScreenQuery,
+    current_screen_index,
+    parse_screen_query,
+    screen_items,
+    screen_to_csv,
+    update_changed_stock_screen,
+)
+
+KGV = StockDataKey.KGV.value
+EPS = StockDataKey.EARNINGS_PER_SHARE.value
+DIVIDEND_YIELD = StockDataKey.DIVIDEND_YIELD.value
+
+
+def random_screen_items(rng: random.Random, isins: int) -> list[dict]:
+    items = []
+    for i in range(isins):
+        for year in range(rng.randint(2018, 2022), rng.randint(2023, 2028)):
+            item = {"ISIN": f"DE{i:010d}", "Year": Decimal(year), "updated_at": Decimal(i)}
+            for field in [KGV, EPS, DIVIDEND_YIELD]:
+                if rng.random() < 0.8:
+                    item[field] = Decimal(f"{rng.uniform(-5, 30):.2f}")
+            items.append(item)
+    return items
+
+
+def expected_isins(items: list[dict], query: ScreenQuery) -> list[str]:
+    # conditions evaluated stock by stock
+    values = {(item["ISIN"], int(item["Year"])): item for item in items}
+
+    def value(isin: str, metric: Metric) -> float:
+        item = values.get((isin, query.year + metric.offset), {})
+        return float(item[metric.field]) if metric.field in item else math.nan
+
+    isins = sorted({item["ISIN"] for item in items})
+    matches = [
+        isin
+        for isin in isins
+        if all(
+            OPERATORS[c.op](
+                value(isin, c.metric),
+                value(isin, c.other) if isinstance(c.other, Metric) else c.other,
+            )
+            for c in query.conditions
+        )
+    ]
+    if query.sort is not None:
+        sort = query.sort
+        sign = -1 if query.descending else 1
+        matches.sort(
+            key=lambda isin: (math.isnan(value(isin, sort)), sign * value(isin, sort))
+        )
+    return matches[: query.limit]
+
+
+class TestParseScreenQuery(TestCase):
+    def test_parse(self):
+        query = parse_screen_query(
+            {
+                "filter": "KGV<12, DividendYield>=3,EarningsPerShare@+1>EarningsPerShare",
+                "sort": "-DividendYield",
+                "limit": "10",
+            },
+            2024,
+        )
+        self.assertEqual(
+            query.conditions,
+            [
+                Condition(Metric(KGV), "<", 12.0),
+                Condition(Metric(DIVIDEND_YIELD), ">=", 3.0),
+                Condition(Metric(EPS, 1), ">", Metric(EPS)),
+            ],
+        )
+        self.assertEqual(query.sort, Metric(DIVIDEND_YIELD))
+        self.assertTrue(query.descending)
+        self.assertEqual((query.limit, query.year), (10, 2024))
+
+    def test_invalid(self):
+        for query in [
+            {"filter": "Price<12"},
+            {"filter": "KGV<"},
+            {"filter": "KGV<nan"},
+            {"filter": "KGV~12"},
+            {"sort": "Price"},
+            {"limit": "0"},
+            {"year": "last"},
+        ]:
+            with self.subTest(query=query):
+                with self.assertRaises(ScreenException):
+                    parse_screen_query(query, 2024)
+
+
+class TestScreenItems(TestCase):
+    def test_completed_numbers(self):
+        data = [
+            {
+                "Year": Decimal(2024),
+                EPS: "2.50 EUR",
+                KGV: Decimal("10"),
+                DIVIDEND_YIELD: "1.28%",
+                StockDataKey.EMPLOYEE_COUNT.value: "n/a",
+            },
+            {"Year": Decimal(2025), EPS: "3.00 EUR"},
+        ]
+        items = screen_items("DE0000000001", data, 1700000000.5)
+        self.assertEqual(
+            items[0],
+            {
+                "ISIN": "DE0000000001",
+                "Year": Decimal(2024),
+                "updated_at": Decimal("1700000000.5"),
+                "Currency": "EUR",
+                EPS: Decimal("2.5"),
+                KGV: Decimal("10.0"),
+                DIVIDEND_YIELD: Decimal("1.28"),
+                StockDataKey.PRICE_PER_SHARE.value: Decimal("25.0"),
+            },
+        )
+        # missing values are filled with the previous year
+        self.assertEqual(items[1][KGV], Decimal("10.0"))
+        self.assertEqual(items[1][EPS], Decimal("3.0"))
+
+
+    def test_changed_years(self):
+        data = [
+            {"Year": Decimal(2023), EPS: "2.00 EUR", KGV: Decimal("10")},
+            {"Year": Decimal(2024), EPS: "2.50 EUR"},
+            {"Year": Decimal(2025), EPS: "3.00 EUR", KGV: Decimal("12")},
+        ]
+        changed_data = [dict(item) for item in data]
+        changed_data[0][KGV] = Decimal("11")
+
+        with patch.object(screener, "put_stock_screen_items") as put_stock_screen_items:
+            written = update_changed_stock_screen("DE0000000001", data, changed_data)
+
+        # the filled KGV of 2024 changed, 2025 has its own
+        self.assertEqual(written, 2)
+        [items] = put_stock_screen_items.call_args.args
+        self.assertEqual([item["Year"] for item in items], [2023, 2024])
+        self.assertEqual(items[1][KGV], Decimal("11.0"))
+
+
+class TestScreenIndex(TestCase):
+    def test_same_as_stock_by_stock(self):
+        rng = random.Random(1)
+        items = random_screen_items(rng, 300)
+        index = ScreenIndex()
+        index.add_items(items)
+
+        metrics = [Metric(KGV), Metric(EPS), Metric(EPS, 1), Metric(DIVIDEND_YIELD, -1)]
+        for _ in range(200):
+            conditions = [
+                Condition(
+                    rng.choice(metrics),
+                    rng.choice(list(OPERATORS)),
+                    rng.choice([rng.choice(metrics), float(rng.randint(0, 20))]),
+                )
+                for _ in range(rng.randint(0, 3))
+            ]
+            query = ScreenQuery(
+                conditions,
+                rng.randint(2016, 2030),
+                rng.choice([None, *metrics]),
+                rng.random() < 0.5,
+                rng.randint(1, 400),
+            )
+            with self.subTest(query=query):
+                positions = index.screen(query)
+                self.assertEqual(
+                    index.isins[positions].tolist(), expected_isins(items, query)
+                )
+
+    def test_add_items(self):
+        index = ScreenIndex()
+        index.add_items(
+            [
+                {"ISIN": "B", "Year": Decimal(2024), KGV: Decimal(8), "updated_at": Decimal(1)},
+                {"ISIN": "A", "Year": Decimal(2024), KGV: Decimal(20), "updated_at": Decimal(1)},
+            ]
+        )
+        # new year and stock, replaced year without KGV
+        index.add_items(
+            [
+                {"ISIN": "C", "Year": Decimal(2022), KGV: Decimal(5), "updated_at": Decimal(3)},
+                {"ISIN": "A", "Year": Decimal(2024), EPS: Decimal(1), "updated_at": Decimal(2)},
+            ]
+        )
+        self.assertEqual(index.updated_at, Decimal(3))
+        self.assertEqual(index.first_year, 2022)
+        self.assertEqual(index.values[KGV].shape, (3, 3))
+
+        query = ScreenQuery([Condition(Metric(KGV), "<", 10.0)], 2024)
+        self.assertEqual(index.isins[index.screen(query)].tolist(), ["B"])
+        query = ScreenQuery([Condition(Metric(KGV, -2), "<", 10.0)], 2024)
+        self.assertEqual(index.isins[index.screen(query)].tolist(), ["C"])
+
+    def test_csv(self):
+        index = ScreenIndex()
+        index.add_items(
+            [
+                {"ISIN": "A", "Year": Decimal(2024), KGV: Decimal("8.5"), EPS: Decimal(2)},
+                {"ISIN": "B", "Year": Decimal(2024), KGV: Decimal("12.5")},
+            ]
+        )
+        query = ScreenQuery([], 2024, Metric(EPS, 1))
+        self.assertEqual(
+            screen_to_csv(index, index.screen(query), query),
+            '"ISIN";"EarningsPerShare@+1"\n"A";""\n"B";""\n',
+        )
+        query = parse_screen_query({"filter": "KGV<20", "sort": "-KGV"}, 2024)
+        self.assertEqual(
+            screen_to_csv(index, index.screen(query), query),
+            '"ISIN";"KGV"\n"B";"12,5"\n"A";"8,5"\n',
+        )
+        self.assertIn(KGV, screen_fields)
+
+
+
+class TestCurrentScreenIndex(TestCase):
+    def test_refresh(self):
+        first = {"ISIN": "A", "Year": Decimal(2024), KGV: Decimal(10), "updated_at": Decimal(100)}
+        update = {**first, KGV: Decimal(8), "updated_at": Decimal(200)}
+        index = ScreenIndex()
+        with patch.object(screener, "screen_index", index), patch.object(
+            screener, "scan_stock_screen", return_value=[first]
+        ) as scan_stock_screen, patch.object(
+            screener, "query_stock_screen_updates", return_value=[update]
+        ) as query_stock_screen_updates:
+            current_screen_index()
+            # warm containers read only the items written since the last refresh
+            index.refreshed_at = -math.inf
+            self.assertIs(current_screen_index(), index)
+
+        scan_stock_screen.assert_called_once_with()
+        query_stock_screen_updates.assert_called_once_with(
+            Decimal(100) - SCREEN_REFRESH_OVERLAP
+        )
+        self.assertEqual(index.column(Metric(KGV), 2024).tolist(), [8])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from unittest import TestCase, main
+
+from stocks.lib.sentiment_series import interval_start, parse_series_day
+
+
+class TestSentimentSeries(TestCase):
+    def test_parse_series_day(self):
+        self.assertEqual(parse_series_day("2024-01-01"), "2024-01-01")
+        # compact and week dates would not compare as text with stored days
+        for day in ["20240101", "2024-W01-1", "2024-1-1", "2024-02-30"]:
+            with self.assertRaises(ValueError):
+                parse_series_day(day)
+
+    def test_interval_start(self):
+        self.assertEqual(interval_start("2024-06-06", "week"), "2024-06-03")
+        self.assertEqual(interval_start("2024-06-06", "day"), "2024-06-06")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import io
+import csv
+import random
+import warnings
+from decimal import Decimal
+from unittest import TestCase, main
+
+import pandas as pd
+
+from stocks.lib.constants import StockDataKey, story_list_fields
+from stocks.lib.data_completer import complete_stock_df, stock_df_to_csv
+from stocks.lib.stock_rows import (
+    complete_stock_rows,
+    stock_rank_columns,
+    stock_rows_to_csv,
+)
+from stocks.lib.stories import stories_to_csv
+
+KEYS = [key.value for key in StockDataKey if key != StockDataKey.YEAR] + ["ISIN"]
+
+
+def random_value(rng: random.Random):
+    choice = rng.random()
+    if choice < 0.1:
+        return None
+    if choice < 0.2:
+        return Decimal(0)
+    if choice < 0.45:
+        return Decimal(f"{rng.uniform(-5, 500):.2f}")
+    if choice < 0.5:
+        return "0 EUR"
+    if choice < 0.55:
+        return f"{rng.uniform(0, 9):.2f}%"
+    if choice < 0.57:
+        return "nan EUR"
+    if choice < 0.6:
+        return "n/a"
+    if choice < 0.65:
+        return Decimal(rng.randint(1, 10**10))
+    currency = rng.choice(["EUR", "USD", ""])
+    return f"{rng.uniform(-5, 5000):.2f} {currency}".strip()
+
+
+def random_stock_items(rng: random.Random) -> list[dict]:
+    # stored items with gaps, zeros, nulls and unparsable values
+    keys = rng.sample(KEYS, rng.randint(1, len(KEYS)))
+    items = []
+    for year in range(rng.randint(2016, 2022), rng.randint(2023, 2030)):
+        item: dict = {"Year": Decimal(year)}
+        fill_rate = rng.choice([0.2, 0.6, 0.95])
+        for key in keys:
+            if rng.random() < fill_rate:
+                item[key] = random_value(rng)
+        items.append(item)
+    return items
+
+
+def pandas_csv(items: list[dict], current_year: int) -> str:
+    with warnings.catch_warnings():
+        # downcasting of object columns by pandas
+        warnings.simplefilter("ignore", FutureWarning)
+        return stock_df_to_csv(complete_stock_df(items), current_year)
+
+
+class TestStockRows(TestCase):
+    def test_same_csv_as_pandas(self):
+        for seed in range(500):
+            items = random_stock_items(random.Random(seed))
+            with self.subTest(seed=seed):
+                self.assertEqual(
+                    stock_rows_to_csv(*complete_stock_rows(items), 2024),
+                    pandas_csv(items, 2024),
+                )
+
+    def test_completes_values(self):
+        items = [
+            {
+                "Year": Decimal(2024),
+                StockDataKey.EARNINGS_PER_SHARE.value: "2.50 EUR",
+                StockDataKey.KGV.value: Decimal("10"),
+                StockDataKey.BOOK_PER_SHARE.value: "12.50 EUR",
+                StockDataKey.STOCK_COUNT.value: Decimal(1000),
+            },
+            {
+                "Year": Decimal(2025),
+                StockDataKey.STOCK_COUNT.value: Decimal(0),
+            },
+        ]
+        years, columns = complete_stock_rows(items)
+        self.assertEqual(years, [Decimal(2024), Decimal(2025)])
+        self.assertEqual(
+            columns[StockDataKey.PRICE_PER_SHARE.value], ["25.00 EUR", "25.00 EUR"]
+        )
+        self.assertEqual(columns[StockDataKey.KBV.value], [2.0, 2.0])
+        # 0 stock count is replaced by the previous year
+        self.assertEqual(
+            columns[StockDataKey.STOCK_COUNT.value], [Decimal(1000), Decimal(1000)]
+        )
+
+    def test_filters_years(self):
+        items = [{"Year": Decimal(year)} for year in range(2018, 2032)]
+        header = stock_rows_to_csv(*complete_stock_rows(items), 2024).splitlines()[0]
+        self.assertEqual(header, '"";"2022";"2023";"2024";"2025";"2026";"2027";"2028"')
+
+    def test_rank_rows(self):
+        items = [
+            {"Year": Decimal(2024), "KGVRank": Decimal("12.5")},
+            {"Year": Decimal(2025)},
+        ]
+        years, columns = complete_stock_rows(items)
+        columns.update(stock_rank_columns(items))
+        rows = stock_rows_to_csv(years, columns, 2024, ["KGVRank", "KUVRank"])
+        # ranks are not filled from the previous year
+        self.assertEqual(rows, '"";"2024";"2025"\n"KGVRank";"12,5";""\n"KUVRank";"";""\n')
+
+
+class TestStoriesCsv(TestCase):
+    def test_same_csv_as_pandas(self):
+        rng = random.Random(1)
+        stories = [
+            {
+                "published_at": Decimal(1700000000 + rng.randint(0, 10**6)),
+                "fetched_at": Decimal(1710000000 + i),
+                "source_url": f"https://www.tradingview.com/news/{i}.html",
+            }
+            for i in range(30)
+        ]
+        for story in stories[::3]:
+            story["sentiment"] = rng.choice(["positive", "neutral", "negative"])
+
+        stories_df = pd.DataFrame.from_records(
+            stories, index="published_at", columns=story_list_fields
+        ).sort_index()
+        output_csv = io.StringIO()
+        stories_df.to_csv(output_csv, decimal=",", quoting=csv.QUOTE_ALL, sep=";")
+
+        sorted_stories = sorted(stories, key=lambda story: story["published_at"])
+        self.assertEqual(stories_to_csv(sorted_stories), output_csv.getvalue())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+from decimal import Decimal
+from unittest import TestCase, main
+from unittest.mock import MagicMock, patch
+
+from stocks.lib import data, story_archive
+from stocks.lib.data import compress_story_text, fetch_stock_stories_to_archive
+from stocks.lib.story_archive import (
+    DAY_SECONDS,
+    STORY_HOT_DAYS,
+    STORY_RETENTION_DAYS,
+    archive_lines,
+    archive_old_stories,
+    read_archive,
+)
+
+NOW = 1730000000
+
+
+def story(url: str, published_at: int, **fields) -> dict:
+    return {
+        "ISIN": "DE0000000001",
+        "source_url": url,
+        "published_at": Decimal(published_at),
+        "title": f"Title {url}",
+        "sentiment": "positive",
+        **fields,
+    }
+
+
+class TestStoryArchive(TestCase):
+    def test_archive_lines(self):
+        stories = [
+            story("a", 100, text_content_zlib=compress_story_text("Kurs über €")),
+            # legacy plain body
+            story("b", 200, text_content="Aktie"),
+        ]
+        self.assertEqual(
+            read_archive(archive_lines(stories)),
+            [
+                {
+                    "source_url": "a",
+                    "published_at": "100",
+                    "title": "Title a",
+                    "text_content": "Kurs über €",
+                },
+                {
+                    "source_url": "b",
+                    "published_at": "200",
+                    "title": "Title b",
+                    "text_content": "Aktie",
+                },
+            ],
+        )
+
+    def test_archive_old_stories(self):
+        old = story("a", NOW - 100 * DAY_SECONDS, text_content="Aktie")
+        older = story("b", NOW - 200 * DAY_SECONDS, text_content="Kurs")
+        archives: dict[str, bytes] = {}
+        archived: list[tuple] = []
+        with patch.object(
+            story_archive,
+            "fetch_stock_stories_to_archive",
+            return_value=iter([[old], [older]]),
+        ) as fetch, patch.object(
+            story_archive, "put_story_archive", side_effect=archives.__setitem__
+        ), patch.object(
+            story_archive,
+            "archive_stock_story",
+            side_effect=lambda *args: archived.append(args),
+        ):
+            self.assertEqual(archive_old_stories("DE0000000001", NOW), 2)
+
+        fetch.assert_called_once_with(
+            "DE0000000001", Decimal(NOW - STORY_HOT_DAYS * DAY_SECONDS)
+        )
+        # an archive file per page of stories
+        key = f"DE0000000001/{NOW}-0.jsonl.gz"
+        other_key = f"DE0000000001/{NOW}-1.jsonl.gz"
+        self.assertEqual(read_archive(archives[key])[0]["text_content"], "Aktie")
+        self.assertEqual(read_archive(archives[other_key])[0]["text_content"], "Kurs")
+        self.assertEqual(
+            archived,
+            [
+                (
+                    "DE0000000001",
+                    "a",
+                    key,
+                    Decimal(NOW + (STORY_RETENTION_DAYS - 100) * DAY_SECONDS),
+                ),
+                (
+                    "DE0000000001",
+                    "b",
+                    other_key,
+                    Decimal(NOW + (STORY_RETENTION_DAYS - 200) * DAY_SECONDS),
+                ),
+            ],
+        )
+
+    def test_fetch_pages(self):
+        story_table = MagicMock()
+        story_table.query.side_effect = [
+            {"Items": [story("a", 100)], "LastEvaluatedKey": {"source_url": "a"}},
+            # every story of the page filtered
+            {"Items": [], "LastEvaluatedKey": {"source_url": "b"}},
+            {"Items": [story("c", 300)]},
+        ]
+        with patch.object(
+            data, "connect_stocks_story_table", return_value=story_table
+        ):
+            pages = fetch_stock_stories_to_archive("DE0000000001", Decimal(NOW))
+            # the next page is read once the last one is archived
+            self.assertEqual([item["source_url"] for item in next(pages)], ["a"])
+            self.assertEqual(story_table.query.call_count, 1)
+            self.assertEqual([item["source_url"] for item in next(pages)], ["c"])
+            self.assertEqual(list(pages), [])
+        self.assertEqual(story_table.query.call_count, 3)
+
+
+if __name__ == "__main__":
+    main()
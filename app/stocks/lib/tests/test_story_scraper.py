@@ -0,0 +1,31 @@
+from unittest import TestCase, main
+from stocks.lib.story_scraper import extract_story_text
+
+
+class TestExtractStoryText(TestCase):
+    def test_article(self):
+        page = """
+        <html><body>
+        <article>Teaser outside of content</article>
+        <div aria-label="Main content">
+            <div><h1>Title</h1><article><p>Story</p> <p>text</p></article></div>
+        </div>
+        <footer>Footer</footer>
+        </body></html>
+        """
+        self.assertEqual(extract_story_text(page), "Story text")
+
+    def test_script_fallback(self):
+        page = """
+        <div aria-label="Main content"><article></article>
+        <script type="application/json">{"text": "Story"}</script></div>
+        """
+        self.assertEqual(extract_story_text(page), '{"text": "Story"}')
+
+    def test_missing_content(self):
+        page = "<div><article>Not the main content</article></div>"
+        self.assertIsNone(extract_story_text(page))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from unittest import TestCase, main
+
+import pandas as pd
+
+from stocks.lib.table_helper import (
+    LayoutCache,
+    find_table_entries,
+    table_layout_fingerprint,
+)
+
+
+def page_dfs(values: list[float]) -> list[pd.DataFrame]:
+    return [
+        pd.DataFrame({"": ["Umsatz", "Ergebnis je Aktie"], "2023": values}),
+        pd.DataFrame({"": ["KGV"], "2023": values[:1]}),
+    ]
+
+
+class TestLayoutCache(TestCase):
+    def test_fingerprint_of_layout(self):
+        fingerprint = table_layout_fingerprint(page_dfs([1.0, 2.0]))
+        # values of other stocks, same layout
+        self.assertEqual(table_layout_fingerprint(page_dfs([3.0, 4.0])), fingerprint)
+        self.assertNotEqual(table_layout_fingerprint(page_dfs([1.0, 2.0])[:1]), fingerprint)
+        other_labels = page_dfs([1.0, 2.0])
+        other_labels[1][""] = ["KUV"]
+        self.assertNotEqual(table_layout_fingerprint(other_labels), fingerprint)
+
+    def test_hits_and_misses(self):
+        cache = LayoutCache(persistent=False, size=1)
+        entries = cache.table_entries(page_dfs([1.0, 2.0]))
+        self.assertEqual(entries, find_table_entries(page_dfs([1.0, 2.0])))
+        self.assertEqual(cache.table_entries(page_dfs([3.0, 4.0])), entries)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # the oldest layout is dropped
+        cache.table_entries(page_dfs([1.0, 2.0])[:1])
+        cache.table_entries(page_dfs([1.0, 2.0]))
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from duckduckgo_search.exceptions import RatelimitException
+
+from stocks.lib import url
+from stocks.lib.provider import ProviderUnavailableException
+from stocks.lib.url import search_fnet_urls
+
+
+# no search client is created, call_provider is patched
+@patch.object(url, "DDGS")
+class TestSearchFnetUrls(TestCase):
+    def test_found(self, _):
+        results = [
+            {"href": "https://www.finanzen.net/news/apple"},
+            {"href": "https://www.finanzen.net/aktien/apple-aktie"},
+        ]
+        with patch.object(url, "call_provider", return_value=results), patch.object(
+            url, "update_stock_meta"
+        ) as update_stock_meta:
+            urls = search_fnet_urls("US0378331005", {})
+
+        self.assertEqual(
+            urls,
+            (
+                "https://www.finanzen.net/bilanz_guv/apple",
+                "https://www.finanzen.net/schaetzungen/apple",
+            ),
+        )
+        self.assertIsNone(update_stock_meta.call_args.kwargs["fnet_url_retry_at"])
+
+    def test_not_found(self, _):
+        with patch.object(url, "call_provider", return_value=[]), patch.object(
+            url, "update_stock_meta"
+        ) as update_stock_meta:
+            self.assertEqual(search_fnet_urls("US0378331005", {}), (None, None))
+        self.assertIsNotNone(update_stock_meta.call_args.kwargs["fnet_url_retry_at"])
+
+    def test_search_failed(self, _):
+        # a failed search is not a miss, it is searched again on the next import
+        for error in [
+            RatelimitException("https://html.duckduckgo.com/html 202"),
+            ProviderUnavailableException("duckduckgo is unavailable"),
+        ]:
+            with patch.object(url, "call_provider", side_effect=error), patch.object(
+                url, "update_stock_meta"
+            ) as update_stock_meta:
+                with self.assertRaises(type(error)):
+                    search_fnet_urls("US0378331005", {})
+            update_stock_meta.assert_not_called()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase, main
+from stocks.lib.work_queue import LocalWorkQueue, run_workers
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestLocalWorkQueue(TestCase):
+    def test_visibility_timeout(self):
+        clock = FakeClock()
+        queue = LocalWorkQueue(visibility_timeout=30, clock=clock)
+        queue.send_messages([{"ISIN": "A"}])
+
+        [message] = queue.receive_messages()
+        self.assertEqual(message["body"], {"ISIN": "A"})
+        self.assertEqual(queue.receive_messages(), [])
+
+        # not deleted, delivered again after visibility timeout
+        clock.now = 31
+        [message] = queue.receive_messages()
+        self.assertEqual(message["receive_count"], 2)
+        queue.delete_message(message)
+        self.assertEqual(queue.approximate_count(), 0)
+
+    def test_dead_letter(self):
+        queue = LocalWorkQueue(visibility_timeout=0, max_receive_count=2)
+        queue.send_messages([{"ISIN": "A"}])
+        self.assertEqual(len(queue.receive_messages()), 1)
+        self.assertEqual(len(queue.receive_messages()), 1)
+        self.assertEqual(queue.receive_messages(), [])
+        self.assertEqual(queue.approximate_count(), 0)
+        self.assertEqual(queue.dead_letters[0]["body"], {"ISIN": "A"})
+
+    def test_file_backed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "queue.json")
+            LocalWorkQueue(path=path).send_messages([{"ISIN": "A"}, {"ISIN": "B"}])
+            queue = LocalWorkQueue(path=path)
+            self.assertEqual(queue.approximate_count(), 2)
+            messages = queue.receive_messages(max_messages=10)
+            self.assertEqual([m["body"]["ISIN"] for m in messages], ["A", "B"])
+
+
+class TestRunWorkers(TestCase):
+    def test_run_workers(self):
+        # hidden long enough that no other worker receives a message in flight
+        queue = LocalWorkQueue(visibility_timeout=1, max_receive_count=3)
+        queue.send_messages([{"ISIN": str(i)} for i in range(20)] + [{"ISIN": "fail"}])
+        done = []
+        lock = threading.Lock()
+
+        def worker(body):
+            if body["ISIN"] == "fail":
+                raise Exception("Import failed")
+            with lock:
+                done.append(body["ISIN"])
+
+        stats = run_workers(queue, worker, concurrency=4, poll_interval=0.01)
+        self.assertEqual(sorted(done), sorted(str(i) for i in range(20)))
+        self.assertEqual(stats, {"processed": 20, "failed": 3})
+        self.assertEqual(queue.dead_letters[0]["body"], {"ISIN": "fail"})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
-from duckduckgo_search import DDGS
+import os
 import urllib.parse
+from datetime import datetime, timezone
+from decimal import Decimal
+from duckduckgo_search import DDGS
+from duckduckgo_search.exceptions import RatelimitException, TimeoutException
 
-from .data import fetch_stock_meta, update_stock_meta
+from .data import update_stock_meta
 from .constants import StockMetaFields
+from .provider import call_provider, provider_timeout
+
+FNET_BASE_URL = "https://www.finanzen.net"
+# days until a finanzen.net url that was not found is searched again
+FNET_URL_RETRY_DAYS = int(os.environ.get("FNET_URL_RETRY_DAYS", "30"))
 
 
 def search_boerse_de_url(stock_isin: str) -> str:
@@ -10,66 +19,80 @@ def search_boerse_de_url(stock_isin: str) -> str:
     return BOERSE_DE_URL + stock_isin
 
 
-def search_fnet_stock_name(stock_isin: str) -> str | None:
-    query = f"site:finanzen.net isin {stock_isin} Aktie"
-    results = DDGS().text(
-        query,
-        max_results=1,
+# stock name in finanzen.net urls: /aktien/apple-aktie, /bilanz_guv/apple -> apple
+def fnet_stock_slug(stock_url: str) -> str | None:
+    url_parts = urllib.parse.urlparse(stock_url)
+    path = url_parts.path.strip("/").split("/")
+    if len(path) != 2 or path[0] not in ["aktien", "bilanz_guv", "schaetzungen"]:
+        return None
+    return path[1].replace("-aktie", "")
+
+
+def search_fnet_urls(
+    stock_isin: str, stock_meta: dict
+) -> tuple[str | None, str | None]:
+    """
+    Returns the finanzen.net (guv url, estimation url) of the stock. Urls are
+    taken from the meta item, missing ones are derived from a single search
+    for the stock. Urls that could not be found are not searched again
+    before the retry time stored in the meta item. Raises if the search
+    fails, only searches that ran without a match set the retry time.
+    """
+    guv_url = stock_meta.get(StockMetaFields.fnet_guv_url.name)
+    estimation_url = stock_meta.get(StockMetaFields.fnet_estimation_url.name)
+    if guv_url is not None and estimation_url is not None:
+        print("Found fnet urls from db:", guv_url, estimation_url)
+        return guv_url, estimation_url
+
+    now = datetime.now(timezone.utc).timestamp()
+    retry_at = stock_meta.get(StockMetaFields.fnet_url_retry_at.name, 0)
+    if now < retry_at:
+        print("Skip fnet url search until:", retry_at)
+        return guv_url, estimation_url
+
+    # known url or search result tell the stock name
+    slug = None
+    for known_url in [guv_url, estimation_url]:
+        if known_url is not None:
+            slug = fnet_stock_slug(known_url)
+    if slug is None:
+        query = f"site:finanzen.net isin {stock_isin} Aktie"
+        for result in query_ddg(query):
+            slug = fnet_stock_slug(result["href"])
+            if slug is not None:
+                break
+
+    found_guv_url = guv_url
+    found_estimation_url = estimation_url
+    if slug is not None:
+        print("Found fnet stock name:", slug)
+        found_guv_url = found_guv_url or f"{FNET_BASE_URL}/bilanz_guv/{slug}"
+        found_estimation_url = (
+            found_estimation_url or f"{FNET_BASE_URL}/schaetzungen/{slug}"
+        )
+
+    # remember misses, so they are not searched on every import
+    new_retry_at = None
+    if found_guv_url is None or found_estimation_url is None:
+        new_retry_at = Decimal(str(now + FNET_URL_RETRY_DAYS * 24 * 60 * 60))
+        print("Could not find fnet urls for:", stock_isin)
+
+    update_stock_meta(
+        stock_isin,
+        fnet_estimation=found_estimation_url if estimation_url is None else None,
+        fnet_guv=found_guv_url if guv_url is None else None,
+        fnet_url_retry_at=new_retry_at,
     )
-    if len(results):
-        stock_url = results[0]["href"]
-        url_parts = urllib.parse.urlparse(stock_url)
-        url_slug = url_parts.path.rsplit("/", 1)[-1]
-        stock_url = url_slug.replace("-aktie", "")
-        print("Found fnet stock name:", stock_url)
-        return stock_url
-
-    return None
-
-
-def search_fnet_estimation_url(stock_isin: str) -> str | None:
-    stock_meta = fetch_stock_meta(stock_isin)
-    if stock_meta and StockMetaFields.fnet_estimation_url.name in stock_meta:
-        stock_url = stock_meta[StockMetaFields.fnet_estimation_url.name]
-        print("Found fnet estimation url from db:", stock_url)
-        return stock_url
-
-    query = f"site:finanzen.net isin {stock_isin} schaetzungen prognosen & erwartungen"
-    results = query_ddg(query)
-
-    for result in results:
-        if "schaetzungen" in result["href"]:
-            stock_url = result["href"]
-            print("Found fnet estimation url:", stock_url)
-            update_stock_meta(stock_isin, fnet_estimation=stock_url)
-            return stock_url
-
-    return None
-
-
-def search_fnet_guv_url(stock_isin: str) -> str | None:
-    stock_meta = fetch_stock_meta(stock_isin)
-    if stock_meta and StockMetaFields.fnet_guv_url.name in stock_meta:
-        stock_url = stock_meta[StockMetaFields.fnet_guv_url.name]
-        print("Found fnet guv url from db:", stock_url)
-        return stock_url
-
-    query = f"site:finanzen.net isin {stock_isin} Bilanz & GUV"
-    results = query_ddg(query)
-
-    for result in results:
-        if "bilanz" in result["href"]:
-            stock_url = result["href"]
-            print("Found fnet guv url:", stock_url)
-            update_stock_meta(stock_isin, fnet_guv=stock_url)
-            return stock_url
-
-    return None
+    return found_guv_url, found_estimation_url
 
 
+# raises if the search failed, a search without results returns []
 def query_ddg(query: str):
-    try:
-        return DDGS().text(query, max_results=3, backend="html")
-    except Exception as e:
-        print(e)
-        return []
+    return call_provider(
+        "duckduckgo",
+        DDGS(timeout=int(provider_timeout("duckduckgo"))).text,
+        query,
+        max_results=3,
+        backend="html",
+        retry_on=(RatelimitException, TimeoutException),
+    )
@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Mapping, NotRequired, Protocol, Sequence, TypedDict
+
+import boto3
+
+# message body of an import job
+ImportMessage = TypedDict(
+    "ImportMessage",
+    {
+        "ISIN": str,
+        "dispatched_at": NotRequired[float],
+        # only import these sources, all if missing
+        "sources": NotRequired[list[str]],
+    },
+)
+
+QueueMessage = TypedDict(
+    "QueueMessage",
+    {
+        "id": str,
+        "receipt": str,
+        "body": dict[str, Any],
+        "receive_count": int,
+    },
+)
+
+WorkerStats = TypedDict("WorkerStats", {"processed": int, "failed": int})
+
+
+class WorkQueue(Protocol):
+    """
+    Queue of import jobs. Received messages are hidden for the visibility
+    timeout and delivered again unless they are deleted, messages received
+    too often move to the dead letter queue.
+    """
+
+    def send_messages(self, bodies: Sequence[Mapping[str, Any]]) -> None: ...
+
+    def receive_messages(
+        self, max_messages: int = 1, visibility_timeout: int | None = None
+    ) -> list[QueueMessage]: ...
+
+    def delete_message(self, message: QueueMessage) -> None: ...
+
+    def approximate_count(self) -> int: ...
+
+
+class SqsWorkQueue:
+    def __init__(self, queue_url: str):
+        self.queue_url = queue_url
+        self.client = boto3.client("sqs", region_name="eu-west-3")
+
+    def send_messages(self, bodies: Sequence[Mapping[str, Any]]) -> None:
+        # sqs accepts batches of 10 messages
+        for start in range(0, len(bodies), 10):
+            entries = [
+                {"Id": str(i), "MessageBody": json.dumps(body)}
+                for i, body in enumerate(bodies[start : start + 10])
+            ]
+            response = self.client.send_message_batch(
+                QueueUrl=self.queue_url, Entries=entries
+            )
+            if response.get("Failed"):
+                raise Exception(f"Could not enqueue messages: {response['Failed']}")
+
+    def receive_messages(
+        self, max_messages: int = 1, visibility_timeout: int | None = None
+    ) -> list[QueueMessage]:
+        params: dict[str, Any] = {
+            "QueueUrl": self.queue_url,
+            "MaxNumberOfMessages": min(max_messages, 10),
+            "AttributeNames": ["ApproximateReceiveCount"],
+        }
+        if visibility_timeout is not None:
+            params["VisibilityTimeout"] = visibility_timeout
+        response = self.client.receive_message(**params)
+        return [
+            {
+                "id": message["MessageId"],
+                "receipt": message["ReceiptHandle"],
+                "body": json.loads(message["Body"]),
+                "receive_count": int(
+                    message["Attributes"]["ApproximateReceiveCount"]
+                ),
+            }
+            for message in response.get("Messages", [])
+        ]
+
+    def delete_message(self, message: QueueMessage) -> None:
+        self.client.delete_message(
+            QueueUrl=self.queue_url, ReceiptHandle=message["receipt"]
+        )
+
+    def approximate_count(self) -> int:
+        response = self.client.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=[
+                "ApproximateNumberOfMessages",
+                "ApproximateNumberOfMessagesNotVisible",
+            ],
+        )
+        return sum(int(count) for count in response["Attributes"].values())
+
+
+class LocalWorkQueue:
+    """
+    In process stand-in for SQS, used for tests and benchmarks. Pass a path
+    to keep the queue in a json file, so it survives the process.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: int = 30,
+        max_receive_count: int = 3,
+        path: str | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.visibility_timeout = visibility_timeout
+        self.max_receive_count = max_receive_count
+        self.path = path
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.messages: list[dict[str, Any]] = []
+        self.dead_letters: list[dict[str, Any]] = []
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.messages = state["messages"]
+            self.dead_letters = state["dead_letters"]
+
+    def send_messages(self, bodies: Sequence[Mapping[str, Any]]) -> None:
+        with self.lock:
+            for body in bodies:
+                self.messages.append(
+                    {
+                        "id": str(uuid.uuid4()),
+                        "receipt": "",
+                        "body": dict(body),
+                        "receive_count": 0,
+                        "visible_at": 0,
+                    }
+                )
+            self._persist()
+
+    def receive_messages(
+        self, max_messages: int = 1, visibility_timeout: int | None = None
+    ) -> list[QueueMessage]:
+        if visibility_timeout is None:
+            visibility_timeout = self.visibility_timeout
+
+        received: list[QueueMessage] = []
+        with self.lock:
+            now = self.clock()
+            for message in list(self.messages):
+                if len(received) >= max_messages:
+                    break
+                if message["visible_at"] > now:
+                    continue
+                # failed too often, move to dead letter queue
+                if message["receive_count"] >= self.max_receive_count:
+                    self.messages.remove(message)
+                    self.dead_letters.append(message)
+                    continue
+
+                message["receive_count"] += 1
+                message["receipt"] = str(uuid.uuid4())
+                message["visible_at"] = now + visibility_timeout
+                received.append(
+                    {
+                        "id": message["id"],
+                        "receipt": message["receipt"],
+                        "body": message["body"],
+                        "receive_count": message["receive_count"],
+                    }
+                )
+            self._persist()
+
+        return received
+
+    def delete_message(self, message: QueueMessage) -> None:
+        with self.lock:
+            self.messages = [
+                m for m in self.messages if m["receipt"] != message["receipt"]
+            ]
+            self._persist()
+
+    def approximate_count(self) -> int:
+        with self.lock:
+            return len(self.messages)
+
+    def _persist(self) -> None:
+        if self.path is None:
+            return
+        with open(self.path, "w") as f:
+            json.dump({"messages": self.messages, "dead_letters": self.dead_letters}, f)
+
+
+def run_workers(
+    queue: WorkQueue,
+    worker: Callable[[dict[str, Any]], Any],
+    concurrency: int = 4,
+    poll_interval: float = 0.1,
+) -> WorkerStats:
+    """
+    Consumes the queue with parallel workers until it is empty, like the
+    lambda event source mapping does for the import queue. Failed messages
+    stay in the queue and are retried after their visibility timeout.
+    """
+    stats: WorkerStats = {"processed": 0, "failed": 0}
+    stats_lock = threading.Lock()
+
+    def consume():
+        while queue.approximate_count() > 0:
+            messages = queue.receive_messages()
+            if not len(messages):
+                # remaining messages are in flight or waiting for a retry
+                time.sleep(poll_interval)
+                continue
+
+            for message in messages:
+                try:
+                    worker(message["body"])
+                    queue.delete_message(message)
+                    with stats_lock:
+                        stats["processed"] += 1
+                except Exception as e:
+                    print("Error processing message:", message["body"], e)
+                    with stats_lock:
+                        stats["failed"] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(consume) for _ in range(concurrency)]:
+            future.result()
+
+    return stats
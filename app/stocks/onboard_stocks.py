@@ -0,0 +1,49 @@
+"""
+Adds the stocks of a file with one ISIN per line and searches their
+finanzen.net urls and tradingview symbol ahead of the first import:
+
+python -m stocks.onboard_stocks <file of ISINs> [--workers 4] [--no-prefetch]
+
+Known stocks are kept, a second run searches only the identifiers which are
+still missing. The searches are bound by the provider rates, the search
+engine allows one stock every five seconds. The rates are kept by this
+process alone, imports running meanwhile search the same providers.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from .lib.onboarding import add_stocks, parse_isins, prefetch_identifiers
+
+PREFETCH_WORKERS = 4
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("isins", type=Path, help="file with one ISIN per line")
+    parser.add_argument("--workers", type=int, default=PREFETCH_WORKERS)
+    parser.add_argument(
+        "--no-prefetch", action="store_true", help="add the stocks only"
+    )
+    args = parser.parse_args()
+
+    isins, invalid = parse_isins(args.isins.read_text().splitlines())
+    if invalid:
+        print(f"Skipped {len(invalid)} invalid ISINs:", invalid)
+
+    start = time.perf_counter()
+    metas, added = add_stocks(isins)
+    print(f"Added {added} of {len(isins)} stocks")
+    if args.no_prefetch:
+        return
+
+    stats = prefetch_identifiers(metas, args.workers)
+    seconds = time.perf_counter() - start
+    print(f"Searched identifiers in {seconds:.1f} s:", stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+from .lib.ranks import update_all_ranks
+from .lib.metrics import count, instrumented, span
+from .lib.profiling import profiled
+
+
+@instrumented
+@profiled
+def handler(event, context):
+    # scheduled after the imports of the night
+    with span("rank"):
+        updated = update_all_ranks()
+    count("updated_ranks", updated)
@@ -0,0 +1,293 @@
+"""
+Extracts the stock data of stored pages again, to apply changes of the
+synonyms or the normalization without fetching every page through Scrappey:
+
+python -m stocks.reextract_pages <directory or .zip> [--workers 8] [--dry-run]
+
+Pages are named <source>_<ISIN>.html, like the recorded benchmark pages.
+Currencies are read by page name from --currencies, other pages ask the LLM
+like the import, the workers share its rate. Pages are extracted in a
+process pool, the changed values of each batch of pages are written while
+the next batch is extracted. Stocks which are being imported are skipped.
+"""
+
+import argparse
+import json
+import os
+import time
+import traceback
+import zipfile
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+from .import_stocks_data import (
+    create_stock_df,
+    fetch_currencies,
+    ordered_stock_items,
+    parse_page,
+    read_page_tables,
+    tables_from_dfs,
+    titles_from_html,
+)
+from .lib.constants import ImportSource, PageCurrencies, StockMetaFields
+from .lib.data import (
+    UnknownStockException,
+    fetch_stock_data,
+    mark_stock_changed,
+    update_stock_data,
+)
+from .lib.data_helper import dataframe_to_items, diff_stock_item, merge_stock_items
+from .lib.lease import import_lease
+from .lib.screener import update_stock_screen
+from .lib.stock_rows import complete_stock_rows
+from .lib.table_helper import LayoutCache
+
+# pages of a pool batch, two batches are held in memory, the pages of a
+# stock stay in one batch
+BATCH_SIZE = 64
+# sources in the order of the import, later sources overwrite values
+SOURCES = [source.name for source in ImportSource]
+
+# layouts of a worker process, not shared with the import
+worker_layouts = LayoutCache(persistent=False)
+
+
+class StoredPage(NamedTuple):
+    name: str
+    stock_isin: str
+    html: bytes
+    currencies: PageCurrencies | None
+
+
+class ExtractedPage(NamedTuple):
+    name: str
+    stock_isin: str
+    items: dict[int, dict]
+    # stage which failed, None if extracted
+    failed_stage: str | None = None
+
+
+def page_source(name: str) -> tuple[str, str] | None:
+    # boerse_de_DE0007164600.html -> (boerse_de, DE0007164600)
+    for source in SOURCES:
+        prefix = f"{source}_"
+        if name.startswith(prefix) and name.endswith(".html"):
+            return source, name[len(prefix) : -len(".html")]
+    return None
+
+
+def page_order(name: str) -> tuple[str, int]:
+    # pages of a stock together, in the order of the import sources
+    source, stock_isin = page_source(name) or ("", "")
+    return stock_isin, SOURCES.index(source) if source in SOURCES else 0
+
+
+def stored_pages(
+    path: Path, currencies: dict[str, PageCurrencies]
+) -> Iterator[StoredPage]:
+    # pages of a directory or zip archive, read one at a time
+    archive = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+    if archive is not None:
+        names = [Path(name).name for name in archive.namelist()]
+        paths = dict(zip(names, archive.namelist()))
+    else:
+        paths = {file.name: str(file) for file in path.glob("*.html")}
+        names = list(paths)
+
+    for name in sorted((name for name in names if page_source(name)), key=page_order):
+        if archive is not None:
+            html = archive.read(paths[name])
+        else:
+            html = Path(paths[name]).read_bytes()
+        _, stock_isin = page_source(name) or ("", "")
+        yield StoredPage(name, stock_isin, html, currencies.get(name))
+
+
+def extract_page(page: StoredPage) -> ExtractedPage:
+    # the steps of process_html without persisting
+    stage = "parse"
+    try:
+        page_tree = parse_page(page.html)
+        stock_dfs = read_page_tables(page_tree)
+        currencies = page.currencies
+        if currencies is None:
+            stage = "currencies"
+            currencies = fetch_currencies(
+                os.environ.get("OPENAI_API_KEY", ""),
+                tables_from_dfs(stock_dfs),
+                titles_from_html(page_tree),
+            )
+        stage = "match"
+        tables_metadata = worker_layouts.table_entries(stock_dfs)
+        stage = "normalize"
+        stock_df = create_stock_df(currencies, tables_metadata, stock_dfs)
+        stage = "items"
+        items = {year: item for item, year in dataframe_to_items(stock_df)}
+    except Exception as e:
+        print(f"Error extracting {page.name} at {stage}:", e)
+        traceback.print_tb(e.__traceback__)
+        return ExtractedPage(page.name, page.stock_isin, {}, stage)
+    return ExtractedPage(page.name, page.stock_isin, items)
+
+
+def store_stock_pages(
+    stock_isin: str, stock_pages: list[ExtractedPage]
+) -> tuple[int, int]:
+    # the values of the stock are read and written while holding its lease
+    stored_items = {int(item["Year"]): item for item in fetch_stock_data(stock_isin)}
+    initial_items = {year: dict(item) for year, item in stored_items.items()}
+    changed = 0
+    for page in stock_pages:
+        merged, page_changed = merge_stock_items(stored_items, page.items)
+        stored_items.update(merged)
+        changed += page_changed
+    changed_items = {
+        year: diff_stock_item(initial_items.get(year, {}), item)
+        for year, item in stored_items.items()
+    }
+    changed_items = {year: item for year, item in changed_items.items() if item}
+    if not changed_items:
+        return changed, 0
+
+    # only the changed values, like the import
+    for year, changed_item in changed_items.items():
+        update_stock_data(stock_isin, year, changed_item)
+    years, columns = complete_stock_rows(ordered_stock_items(stored_items))
+    update_stock_screen(stock_isin, years, columns)
+    mark_stock_changed(stock_isin, StockMetaFields.data_changed_at.name)
+    return changed, len(changed_items)
+
+
+def store_pages(pages: list[ExtractedPage]) -> tuple[int, int, int]:
+    """
+    Writes the changed values of the extracted pages and the screen items of
+    the changed stocks, returns the changed values, written items and the
+    pages skipped because their stock is being imported or is not known.
+    """
+    by_isin: dict[str, list[ExtractedPage]] = {}
+    for page in pages:
+        if page.failed_stage is None:
+            by_isin.setdefault(page.stock_isin, []).append(page)
+
+    changed = 0
+    written = 0
+    skipped = 0
+    for stock_isin, stock_pages in by_isin.items():
+        try:
+            with import_lease(stock_isin) as meta_item:
+                if meta_item is None:
+                    print("Stock is imported by another worker:", stock_isin)
+                    skipped += len(stock_pages)
+                    continue
+                stock_changed, stock_written = store_stock_pages(
+                    stock_isin, stock_pages
+                )
+        except UnknownStockException:
+            print("Stock is not known:", stock_isin)
+            skipped += len(stock_pages)
+            continue
+        changed += stock_changed
+        written += stock_written
+    return changed, written, skipped
+
+
+def batches(pages: Iterator[StoredPage], size: int) -> Iterator[list[StoredPage]]:
+    # pages are ordered by ISIN, a batch ends between two stocks
+    batch: list[StoredPage] = []
+    for page in pages:
+        if len(batch) >= size and page.stock_isin != batch[-1].stock_isin:
+            yield batch
+            batch = []
+        batch.append(page)
+    if batch:
+        yield batch
+
+
+class Progress:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.pages = 0
+        self.changed = 0
+        self.written = 0
+        # failed pages by stage
+        self.failures: dict[str, int] = {}
+
+    def fail(self, stage: str, pages: int = 1):
+        self.failures[stage] = self.failures.get(stage, 0) + pages
+
+    def print(self):
+        seconds = time.perf_counter() - self.start
+        print(
+            f"{self.pages} pages in {seconds:.1f} s, {self.pages / seconds:.1f} pages/s,"
+            f" {self.changed} changed values, {self.written} written stock years,"
+            f" failures by stage: {self.failures}"
+        )
+
+
+def store_batch(pages: list[ExtractedPage], progress: Progress, dry_run: bool):
+    progress.pages += len(pages)
+    for page in pages:
+        if page.failed_stage is not None:
+            progress.fail(page.failed_stage)
+    if dry_run:
+        return
+
+    try:
+        changed, written, skipped = store_pages(pages)
+    except Exception as e:
+        print("Error storing pages:", [page.name for page in pages])
+        print(e)
+        traceback.print_tb(e.__traceback__)
+        progress.fail("store", len(pages))
+        return
+    progress.changed += changed
+    progress.written += written
+    if skipped:
+        # leased or unknown stocks, run again for the imported ones
+        progress.fail("lease", skipped)
+
+
+def init_worker(workers: int):
+    # the workers share the provider rates, like concurrent import workers
+    os.environ["IMPORT_WORKER_CONCURRENCY"] = str(workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("pages", type=Path, help="directory or zip archive of pages")
+    parser.add_argument(
+        "--currencies",
+        type=Path,
+        help="json of page names to their currencies, the LLM is asked if not set",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="extract only, nothing is written"
+    )
+    args = parser.parse_args()
+
+    currencies = {}
+    if args.currencies is not None:
+        currencies = json.loads(args.currencies.read_text())
+
+    progress = Progress()
+    with Pool(args.workers, init_worker, (args.workers,)) as pool:
+        pending = None
+        for batch in batches(stored_pages(args.pages, currencies), args.batch):
+            # the next batch is extracted while the last one is written
+            result = pool.map_async(extract_page, batch)
+            if pending is not None:
+                store_batch(pending.get(), progress, args.dry_run)
+                progress.print()
+            pending = result
+        if pending is not None:
+            store_batch(pending.get(), progress, args.dry_run)
+    progress.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,54 @@ variable "HUGGINGFACEHUB_API_TOKEN" {
   sensitive = true
 }
 
+variable "import_worker_concurrency" {
+  type = number
+  default = 2
+  description = "Maximum concurrent import workers consuming the import queue"
+}
+
+variable "import_queue_visibility_timeout" {
+  type = number
+  default = 300
+  description = "Seconds an import job is hidden while a worker runs it, at least the import lambda timeout"
+}
+
+variable "import_max_receive_count" {
+  type = number
+  default = 3
+  description = "Failed attempts before an import job moves to the dead letter queue"
+}
+
+variable "import_dispatch_count" {
+  type = number
+  default = 4
+  description = "Due stocks enqueued per dispatcher run"
+}
+
+variable "story_hot_days" {
+  type = number
+  default = 90
+  description = "Days a story keeps its body in the story table"
+}
+
+variable "story_retention_days" {
+  type = number
+  default = 730
+  description = "Days after publication an archived story and its archive file expire"
+}
+
+variable "profile_handlers" {
+  type = bool
+  default = false
+  description = "Log a cProfile and tracemalloc summary of every handler invocation"
+}
+
+variable "profile_bucket" {
+  type = string
+  default = ""
+  description = "Bucket for the raw profiles of profiled handlers, only the summary is logged if empty"
+}
+
 resource "aws_dynamodb_table" "stocks_table" {
   name           = "stocks-table"
   billing_mode   = "PAY_PER_REQUEST"
@@ -59,6 +107,25 @@ resource "aws_dynamodb_table" "stocks_meta_table" {
     type = "S"
   }
 
+  attribute {
+    name = "change_feed"
+    type = "S"
+  }
+
+  attribute {
+    name = "changed_at"
+    type = "N"
+  }
+
+  # stocks by their last change, only changed stocks have a change_feed
+  global_secondary_index {
+    name               = "change-feed-index"
+    hash_key           = "change_feed"
+    range_key          = "changed_at"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["data_changed_at", "stories_changed_at"]
+  }
+
   tags = {
     Environment = "production"
   }
@@ -81,11 +148,127 @@ resource "aws_dynamodb_table" "stocks_story_table" {
     type = "S"
   }
 
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
   tags = {
     Environment = "production"
   }
 }
 
+resource "aws_dynamodb_table" "stocks_sentiment_table" {
+  name           = "stocks-sentiment-table"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "ISIN"
+  range_key      = "Day"
+  table_class    = "STANDARD_INFREQUENT_ACCESS" 
+
+  attribute {
+    name = "ISIN"
+    type = "S"
+  }
+
+  attribute {
+    name = "Day"
+    type = "S"
+  }
+
+  tags = {
+    Environment = "production"
+  }
+}
+
+resource "aws_dynamodb_table" "stocks_screen_table" {
+  name           = "stocks-screen-table"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "ISIN"
+  range_key      = "Year"
+
+  attribute {
+    name = "ISIN"
+    type = "S"
+  }
+
+  attribute {
+    name = "Year"
+    type = "N"
+  }
+
+  attribute {
+    name = "screen_updates"
+    type = "S"
+  }
+
+  attribute {
+    name = "updated_at"
+    type = "N"
+  }
+
+  # screen items by their last write, read by warm screener containers
+  global_secondary_index {
+    name               = "screen-updates-index"
+    hash_key           = "screen_updates"
+    range_key          = "updated_at"
+    projection_type    = "ALL"
+  }
+
+  tags = {
+    Environment = "production"
+  }
+}
+
+resource "aws_dynamodb_table" "stocks_layout_table" {
+  name           = "stocks-layout-table"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "Fingerprint"
+
+  attribute {
+    name = "Fingerprint"
+    type = "S"
+  }
+
+  tags = {
+    Environment = "production"
+  }
+}
+
+resource "aws_s3_bucket" "story_archive" {
+  tags = {
+    Description        = "Bucket for archived story bodies"
+  }
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "story_archive" {
+  bucket = aws_s3_bucket.story_archive.id
+
+  rule {
+    id     = "expire-archived-stories"
+    status = "Enabled"
+
+    filter {}
+
+    expiration {
+      days = var.story_retention_days
+    }
+  }
+}
+
+resource "aws_sqs_queue" "import_stocks_dead_letter_queue" {
+  name                      = "import-stocks-dead-letter-queue"
+  message_retention_seconds = 1209600
+}
+
+resource "aws_sqs_queue" "import_stocks_queue" {
+  name                       = "import-stocks-queue"
+  visibility_timeout_seconds = var.import_queue_visibility_timeout
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.import_stocks_dead_letter_queue.arn
+    maxReceiveCount     = var.import_max_receive_count
+  })
+}
+
 resource "aws_s3_bucket" "lambda_layer_source" {
   tags = {
     Description        = "Bucket for lambda layers"
@@ -147,11 +330,51 @@ resource "aws_iam_role_policy" "lambda_role_policy" {
            "Action" : ["dynamodb:*"],
            "Resource" : "${aws_dynamodb_table.stocks_meta_table.arn}"
         },
+        {
+           "Effect" : "Allow",
+           "Action" : ["dynamodb:Query"],
+           "Resource" : "${aws_dynamodb_table.stocks_meta_table.arn}/index/*"
+        },
         {
            "Effect" : "Allow",
            "Action" : ["dynamodb:*"],
            "Resource" : "${aws_dynamodb_table.stocks_story_table.arn}"
         },
+        {
+           "Effect" : "Allow",
+           "Action" : ["dynamodb:*"],
+           "Resource" : "${aws_dynamodb_table.stocks_sentiment_table.arn}"
+        },
+        {
+           "Effect" : "Allow",
+           "Action" : ["dynamodb:*"],
+           "Resource" : "${aws_dynamodb_table.stocks_screen_table.arn}"
+        },
+        {
+           "Effect" : "Allow",
+           "Action" : ["dynamodb:Query"],
+           "Resource" : "${aws_dynamodb_table.stocks_screen_table.arn}/index/*"
+        },
+        {
+           "Effect" : "Allow",
+           "Action" : ["dynamodb:*"],
+           "Resource" : "${aws_dynamodb_table.stocks_layout_table.arn}"
+        },
+        {
+           "Effect" : "Allow",
+           "Action" : ["s3:PutObject", "s3:GetObject"],
+           "Resource" : "${aws_s3_bucket.story_archive.arn}/*"
+        },
+        {
+           "Effect" : "Allow",
+           "Action" : [
+             "sqs:SendMessage",
+             "sqs:ReceiveMessage",
+             "sqs:DeleteMessage",
+             "sqs:GetQueueAttributes"
+           ],
+           "Resource" : "${aws_sqs_queue.import_stocks_queue.arn}"
+        },
         {
           "Sid": "InvokeImportStocksLambdaPermission",
           "Effect": "Allow",
@@ -168,10 +391,26 @@ resource "aws_iam_role_policy" "lambda_role_policy" {
    })
 }
 
+resource "aws_iam_role_policy" "lambda_profile_policy" {
+   count = var.profile_bucket == "" ? 0 : 1
+   name = "lambda_profile_policy"
+   role = aws_iam_role.iam_for_lambda.id
+   policy = jsonencode({
+      "Version" : "2012-10-17",
+      "Statement" : [
+        {
+           "Effect" : "Allow",
+           "Action" : ["s3:PutObject"],
+           "Resource" : "arn:aws:s3:::${var.profile_bucket}/profiles/*"
+        }
+      ]
+   })
+}
+
 data "archive_file" "lambdas_data_archive" {
  source_dir = "${path.module}/../app"
  excludes   = [
-  "requirements.txt", ".mypy.ini", ".mypy_cache"
+  "requirements.txt", ".mypy.ini", ".mypy_cache", "benchmarks"
  ]
  output_path = "${path.module}/../app.zip"
  type = "zip"
@@ -180,6 +419,8 @@ data "archive_file" "lambdas_data_archive" {
 resource "aws_lambda_function" "get_stocks_data" {
  environment {
    variables = {
+     PROFILE = var.profile_handlers
+     PROFILE_OUTPUT = var.profile_bucket == "" ? "" : "s3://${var.profile_bucket}/profiles"
      STOCKS_TABLE = aws_dynamodb_table.stocks_table.name
      STOCKS_META_TABLE = aws_dynamodb_table.stocks_meta_table.name
      IMPORT_STOCKS_FUNCTION = aws_lambda_function.import_stocks_data.arn
@@ -188,9 +429,9 @@ resource "aws_lambda_function" "get_stocks_data" {
  memory_size = "128"
  runtime = "python3.12"
  architectures = ["arm64"]
+ # pandas-free read path, no pandas layer
  layers = [
-  aws_lambda_layer_version.lambda_python_layer.arn,
-  "arn:aws:lambda:eu-west-3:336392948345:layer:AWSSDKPandas-Python312-Arm64:6"
+  aws_lambda_layer_version.lambda_python_layer.arn
  ]
  handler = "stocks.get_stocks_data.handler"
  function_name = "get_stocks_data"
@@ -209,17 +450,20 @@ resource "aws_cloudwatch_log_group" "stocks_data_log" {
 resource "aws_lambda_function" "get_stocks_story" {
  environment {
    variables = {
+     PROFILE = var.profile_handlers
+     PROFILE_OUTPUT = var.profile_bucket == "" ? "" : "s3://${var.profile_bucket}/profiles"
      STOCKS_STORY_TABLE = aws_dynamodb_table.stocks_story_table.name
      STOCKS_META_TABLE = aws_dynamodb_table.stocks_meta_table.name
+     STOCKS_SENTIMENT_TABLE = aws_dynamodb_table.stocks_sentiment_table.name
      IMPORT_STOCKS_STORY_FUNCTION = aws_lambda_function.import_stocks_story.arn
    }
  }
  memory_size = "128"
  runtime = "python3.12"
  architectures = ["arm64"]
+ # pandas-free read path, no pandas layer
  layers = [
-  aws_lambda_layer_version.lambda_python_layer.arn,
-  "arn:aws:lambda:eu-west-3:336392948345:layer:AWSSDKPandas-Python312-Arm64:6"
+  aws_lambda_layer_version.lambda_python_layer.arn
  ]
  handler = "stocks.get_stocks_story.handler"
  function_name = "get_stocks_story"
@@ -235,13 +479,106 @@ resource "aws_cloudwatch_log_group" "stocks_story_log" {
   retention_in_days = 30
 }
 
+resource "aws_lambda_function" "get_stocks_screen" {
+ environment {
+   variables = {
+     PROFILE = var.profile_handlers
+     PROFILE_OUTPUT = var.profile_bucket == "" ? "" : "s3://${var.profile_bucket}/profiles"
+     STOCKS_SCREEN_TABLE = aws_dynamodb_table.stocks_screen_table.name
+   }
+ }
+ # index of all stocks is kept in memory
+ memory_size = "512"
+ runtime = "python3.12"
+ architectures = ["arm64"]
+ # numpy for the columnar index
+ layers = [
+  aws_lambda_layer_version.lambda_python_layer.arn,
+  "arn:aws:lambda:eu-west-3:336392948345:layer:AWSSDKPandas-Python312-Arm64:6"
+ ]
+ handler = "stocks.get_stocks_screen.handler"
+ function_name = "get_stocks_screen"
+ timeout = 60
+ role = aws_iam_role.iam_for_lambda.arn
+ filename = data.archive_file.lambdas_data_archive.output_path
+ source_code_hash = data.archive_file.lambdas_data_archive.output_base64sha256
+}
+
+resource "aws_cloudwatch_log_group" "stocks_screen_log" {
+  name = "/aws/lambda/${aws_lambda_function.get_stocks_screen.function_name}"
+
+  retention_in_days = 30
+}
+
+resource "aws_lambda_function" "get_stocks_changes" {
+ environment {
+   variables = {
+     PROFILE = var.profile_handlers
+     PROFILE_OUTPUT = var.profile_bucket == "" ? "" : "s3://${var.profile_bucket}/profiles"
+     STOCKS_META_TABLE = aws_dynamodb_table.stocks_meta_table.name
+   }
+ }
+ memory_size = "128"
+ runtime = "python3.12"
+ architectures = ["arm64"]
+ layers = [aws_lambda_layer_version.lambda_python_layer.arn]
+ handler = "stocks.get_stocks_changes.handler"
+ function_name = "get_stocks_changes"
+ timeout = 30
+ role = aws_iam_role.iam_for_lambda.arn
+ filename = data.archive_file.lambdas_data_archive.output_path
+ source_code_hash = data.archive_file.lambdas_data_archive.output_base64sha256
+}
+
+resource "aws_cloudwatch_log_group" "stocks_changes_log" {
+  name = "/aws/lambda/${aws_lambda_function.get_stocks_changes.function_name}"
+
+  retention_in_days = 30
+}
+
+resource "aws_lambda_function" "rank_stocks" {
+ environment {
+   variables = {
+     PROFILE = var.profile_handlers
+     PROFILE_OUTPUT = var.profile_bucket == "" ? "" : "s3://${var.profile_bucket}/profiles"
+     STOCKS_TABLE = aws_dynamodb_table.stocks_table.name
+     STOCKS_SCREEN_TABLE = aws_dynamodb_table.stocks_screen_table.name
+   }
+ }
+ memory_size = "512"
+ runtime = "python3.12"
+ architectures = ["arm64"]
+ # numpy for the ranks
+ layers = [
+  aws_lambda_layer_version.lambda_python_layer.arn,
+  "arn:aws:lambda:eu-west-3:336392948345:layer:AWSSDKPandas-Python312-Arm64:6"
+ ]
+ handler = "stocks.rank_stocks.handler"
+ function_name = "rank_stocks"
+ timeout = 900
+ role = aws_iam_role.iam_for_lambda.arn
+ filename = data.archive_file.lambdas_data_archive.output_path
+ source_code_hash = data.archive_file.lambdas_data_archive.output_base64sha256
+}
+
+resource "aws_cloudwatch_log_group" "rank_stocks_log" {
+  name = "/aws/lambda/${aws_lambda_function.rank_stocks.function_name}"
+
+  retention_in_days = 30
+}
+
 resource "aws_lambda_function" "import_stocks_data" {
  environment {
    variables = {
+     PROFILE = var.profile_handlers
+     PROFILE_OUTPUT = var.profile_bucket == "" ? "" : "s3://${var.profile_bucket}/profiles"
      STOCKS_TABLE = aws_dynamodb_table.stocks_table.name
      STOCKS_META_TABLE = aws_dynamodb_table.stocks_meta_table.name
+     STOCKS_SCREEN_TABLE = aws_dynamodb_table.stocks_screen_table.name
+     STOCKS_LAYOUT_TABLE = aws_dynamodb_table.stocks_layout_table.name
      SCRAPPEY_API_KEY = var.SCRAPPEY_API_KEY
      OPENAI_API_KEY = var.OPENAI_API_KEY
+     IMPORT_WORKER_CONCURRENCY = var.import_worker_concurrency
    }
  }
  memory_size = "256"
@@ -265,12 +602,59 @@ resource "aws_cloudwatch_log_group" "import_stocks_data_log" {
   retention_in_days = 30
 }
 
+resource "aws_lambda_event_source_mapping" "import_stocks_queue_workers" {
+  event_source_arn        = aws_sqs_queue.import_stocks_queue.arn
+  function_name           = aws_lambda_function.import_stocks_data.arn
+  batch_size              = 1
+  function_response_types = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = var.import_worker_concurrency
+  }
+}
+
+resource "aws_lambda_function" "dispatch_imports" {
+ environment {
+   variables = {
+     PROFILE = var.profile_handlers
+     PROFILE_OUTPUT = var.profile_bucket == "" ? "" : "s3://${var.profile_bucket}/profiles"
+     STOCKS_META_TABLE = aws_dynamodb_table.stocks_meta_table.name
+     IMPORT_QUEUE_URL = aws_sqs_queue.import_stocks_queue.url
+     IMPORT_DISPATCH_COUNT = var.import_dispatch_count
+   }
+ }
+ memory_size = "128"
+ runtime = "python3.12"
+ architectures = ["arm64"]
+ layers = [
+  aws_lambda_layer_version.lambda_python_layer.arn
+ ]
+ handler = "stocks.dispatch_imports.handler"
+ function_name = "dispatch_imports"
+ timeout = 60
+ role = aws_iam_role.iam_for_lambda.arn
+ filename = data.archive_file.lambdas_data_archive.output_path
+ source_code_hash = data.archive_file.lambdas_data_archive.output_base64sha256
+}
+
+resource "aws_cloudwatch_log_group" "dispatch_imports_log" {
+  name = "/aws/lambda/${aws_lambda_function.dispatch_imports.function_name}"
+
+  retention_in_days = 30
+}
+
 resource "aws_lambda_function" "import_stocks_story" {
  environment {
    variables = {
+     PROFILE = var.profile_handlers
+     PROFILE_OUTPUT = var.profile_bucket == "" ? "" : "s3://${var.profile_bucket}/profiles"
      STOCKS_TABLE = aws_dynamodb_table.stocks_table.name
      STOCKS_META_TABLE = aws_dynamodb_table.stocks_meta_table.name
      STOCKS_STORY_TABLE = aws_dynamodb_table.stocks_story_table.name
+     STOCKS_SENTIMENT_TABLE = aws_dynamodb_table.stocks_sentiment_table.name
+     STORY_ARCHIVE_BUCKET = aws_s3_bucket.story_archive.id
+     STORY_HOT_DAYS = var.story_hot_days
+     STORY_RETENTION_DAYS = var.story_retention_days
      HUGGINGFACEHUB_API_TOKEN = var.HUGGINGFACEHUB_API_TOKEN
    }
  }
@@ -355,6 +739,36 @@ resource "aws_apigatewayv2_route" "stocks_story" {
   target    = "integrations/${aws_apigatewayv2_integration.stocks_story.id}"
 }
 
+resource "aws_apigatewayv2_integration" "stocks_screen" {
+  api_id = aws_apigatewayv2_api.lambda_stocks.id
+
+  integration_uri    = aws_lambda_function.get_stocks_screen.invoke_arn
+  integration_type   = "AWS_PROXY"
+  integration_method = "POST"
+}
+
+resource "aws_apigatewayv2_route" "stocks_screen" {
+  api_id = aws_apigatewayv2_api.lambda_stocks.id
+
+  route_key = "GET /stocks-screen"
+  target    = "integrations/${aws_apigatewayv2_integration.stocks_screen.id}"
+}
+
+resource "aws_apigatewayv2_integration" "stocks_changes" {
+  api_id = aws_apigatewayv2_api.lambda_stocks.id
+
+  integration_uri    = aws_lambda_function.get_stocks_changes.invoke_arn
+  integration_type   = "AWS_PROXY"
+  integration_method = "POST"
+}
+
+resource "aws_apigatewayv2_route" "stocks_changes" {
+  api_id = aws_apigatewayv2_api.lambda_stocks.id
+
+  route_key = "GET /stocks-changes"
+  target    = "integrations/${aws_apigatewayv2_integration.stocks_changes.id}"
+}
+
 resource "aws_cloudwatch_log_group" "api_gw" {
   name = "/aws/api_gw/${aws_apigatewayv2_api.lambda_stocks.name}"
 
@@ -379,6 +793,24 @@ resource "aws_lambda_permission" "api_gw_allow_get_stocks_story" {
   source_arn = "${aws_apigatewayv2_api.lambda_stocks.execution_arn}/*/*"
 }
 
+resource "aws_lambda_permission" "api_gw_allow_get_stocks_screen" {
+  statement_id  = "AllowExecutionFromAPIGateway"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.get_stocks_screen.function_name
+  principal     = "apigateway.amazonaws.com"
+
+  source_arn = "${aws_apigatewayv2_api.lambda_stocks.execution_arn}/*/*"
+}
+
+resource "aws_lambda_permission" "api_gw_allow_get_stocks_changes" {
+  statement_id  = "AllowExecutionFromAPIGateway"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.get_stocks_changes.function_name
+  principal     = "apigateway.amazonaws.com"
+
+  source_arn = "${aws_apigatewayv2_api.lambda_stocks.execution_arn}/*/*"
+}
+
 resource "aws_cloudwatch_event_rule" "import_stock_lambda_schedule" {
   name                = "import-stock-lambda-schedule"
   schedule_expression = "cron(34 0/1 * * ? *)"
@@ -387,13 +819,13 @@ resource "aws_cloudwatch_event_rule" "import_stock_lambda_schedule" {
 resource "aws_cloudwatch_event_target" "trigger_import_stock_lambda_on_schedule" {
   rule      = aws_cloudwatch_event_rule.import_stock_lambda_schedule.name
   target_id = "lambda"
-  arn       = aws_lambda_function.import_stocks_data.arn
+  arn       = aws_lambda_function.dispatch_imports.arn
 }
 
 resource "aws_lambda_permission" "allow_cloudwatch_to_call_import_stock_lambda" {
   statement_id  = "AllowExecutionFromCloudWatch"
   action        = "lambda:InvokeFunction"
-  function_name = aws_lambda_function.import_stocks_data.function_name
+  function_name = aws_lambda_function.dispatch_imports.function_name
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.import_stock_lambda_schedule.arn
 }
@@ -415,4 +847,23 @@ resource "aws_lambda_permission" "allow_cloudwatch_to_call_import_stock_story_la
   function_name = aws_lambda_function.import_stocks_story.function_name
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.import_stock_story_lambda_schedule.arn
-}
\ No newline at end of file
+}
+
+resource "aws_cloudwatch_event_rule" "rank_stocks_lambda_schedule" {
+  name                = "rank-stocks-lambda-schedule"
+  schedule_expression = "cron(50 3 * * ? *)"
+}
+
+resource "aws_cloudwatch_event_target" "trigger_rank_stocks_lambda_on_schedule" {
+  rule      = aws_cloudwatch_event_rule.rank_stocks_lambda_schedule.name
+  target_id = "lambda"
+  arn       = aws_lambda_function.rank_stocks.arn
+}
+
+resource "aws_lambda_permission" "allow_cloudwatch_to_call_rank_stocks_lambda" {
+  statement_id  = "AllowExecutionFromCloudWatch"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.rank_stocks.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.rank_stocks_lambda_schedule.arn
+}